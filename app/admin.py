@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Job,SavedJob,RecentJob,Profile,Education,WorkExperience
+from .models import Job,SavedJob,RecentJob,Profile,Education,WorkExperience,CurrencyRate,ResumeFile,ResumeText,Task,TaskStat
 
 admin.site.register(Job)
 admin.site.register(SavedJob)
@@ -7,3 +7,8 @@ admin.site.register(RecentJob)
 admin.site.register(Profile)
 admin.site.register(Education)
 admin.site.register(WorkExperience)
+admin.site.register(CurrencyRate)
+admin.site.register(ResumeFile)
+admin.site.register(ResumeText)
+admin.site.register(Task)
+admin.site.register(TaskStat)
@@ -1,6 +1,31 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def ensure_job_search_index(sender, using='default', **kwargs):
+    from .search import ensure_search_index
+    ensure_search_index(using)
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Table rebuilds during migrate drop the FTS triggers on app_job
+        post_migrate.connect(ensure_job_search_index, sender=self)
+
+        from .db import apply_pragmas, check_replica_cache
+        connection_created.connect(apply_pragmas)
+
+        from .metrics import install_query_counter, metrics_enabled
+        if metrics_enabled():
+            connection_created.connect(install_query_counter)
+
+        from .cache import check_shared_cache
+        checks.register(check_shared_cache)
+        checks.register(check_replica_cache)
@@ -0,0 +1,205 @@
+"""Native async versions of the hot read endpoints, for running under ASGI.
+
+Each view takes the same query parameters and returns the same JSON as its
+sync twin in ``views.py``: filtering, pagination classes and the fast read
+serializers are shared, only the database access goes through the async
+ORM (``acount``, ``aget``, async iteration). They are mounted under
+``/api/async/``.
+"""
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .auth import CachedJWTAuthentication, aload_user, build_user, user_cache
+from .login import alogin
+from .cache import JOBS_NAMESPACE, cache_enabled, lookup, profile_namespace, store
+from .conditional import add_validators, aprofile_state, job_list_validators, not_modified, profile_validators
+from .models import Job, Profile, RecentJob, SavedJob
+from .pagination import get_limit_offset
+from .recent import flush as flush_recent_views
+from .serializers import JobReadSerializer, LoginSerializer, ProfileSerializer, RecentJobReadSerializer, SavedJobReadSerializer
+from .streaming import STREAM_FORMATS, streaming_response
+from .views import JobListView, filter_jobs, profile_queryset
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """CachedJWTAuthentication whose cache misses use the async ORM."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        cached = self.cached(user_id)
+        if cached is None:
+            generation = user_cache.generation
+            cached = self.remember(user_id, await aload_user(user_id), generation)
+        return self.check_user(build_user(*cached), validated_token)
+
+
+authenticator = AsyncJWTAuthentication()
+renderer = JSONRenderer()
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    # Same renderer (and so the same bytes) as the DRF views
+    response = HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def async_api_view(authenticated=False, methods=('GET',)):
+    """Wrap an async view: DRF Request, optional JWT auth and DRF-style errors."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(http_request, *args, **kwargs):
+            if http_request.method not in methods:
+                return render({'detail': f'Method "{http_request.method}" not allowed.'},
+                              status.HTTP_405_METHOD_NOT_ALLOWED, {'Allow': ', '.join(methods)})
+            request = Request(http_request, parsers=[JSONParser(), FormParser()])
+            try:
+                if authenticated:
+                    result = await authenticator.aauthenticate(request)
+                    if result is None:
+                        raise exceptions.NotAuthenticated()
+                    request.user = result[0]
+                return await func(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                headers = {}
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    headers['WWW-Authenticate'] = authenticator.authenticate_header(request)
+                    exc.status_code = status.HTTP_401_UNAUTHORIZED
+                data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+                return render(data, exc.status_code, headers)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def cached(request, view_name, build_data, namespace=JOBS_NAMESPACE):
+    """Async counterpart of cache.cached_response (the cache itself is in-memory or on local disk)."""
+    if not cache_enabled(namespace):
+        return render(await build_data())
+    key, data = lookup(request, view_name, namespace)
+    if data is not None:
+        return render(data, headers={'X-Cache': 'HIT'})
+    data = await build_data()
+    store(key, data)
+    return render(data, headers={'X-Cache': 'MISS'})
+
+
+async def aconditional_response(request, validators, build_response, private=False):
+    """conditional.conditional_response for an async ``build_response``."""
+    response = not_modified(request, validators)
+    if response is None:
+        response = await build_response()
+    return add_validators(response, validators, private)
+
+
+@async_api_view()
+async def job_list_filtered(request):
+    """Async JobListView.get."""
+    view = JobListView(request=request, format_kwarg=None, args=(), kwargs={})
+
+    async def build_data():
+        queryset = JobReadSerializer.values(view.filter_queryset(view.get_queryset()))
+        paginator = view.paginator
+        page = await paginator.apaginate_queryset(queryset, request)
+        serializer = JobReadSerializer(page, context=view.get_serializer_context())
+        return paginator.get_paginated_response({
+            'count': paginator.get_count(),
+            'results': serializer.data,
+        }).data
+
+    return await aconditional_response(
+        request, job_list_validators(request, 'jobsf'), lambda: cached(request, 'jobsf', build_data),
+    )
+
+
+@async_api_view()
+async def job_list(request):
+    """Async job_list, including ?stream=ndjson|json."""
+    stream_format = request.query_params.get('stream')
+    if stream_format:
+        if stream_format not in STREAM_FORMATS:
+            return render(
+                {"detail": f"Unsupported stream format. Use one of: {', '.join(STREAM_FORMATS)}."},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        jobs = filter_jobs(request, Job.objects.order_by('-created_at', '-id'))
+        return streaming_response(jobs, stream_format, use_async=True)
+
+    async def build_data():
+        rows = [row async for row in JobReadSerializer.values(Job.objects.all())]
+        return JobReadSerializer(rows).data
+
+    return await cached(request, 'jobs', build_data)
+
+
+@async_api_view(authenticated=True)
+async def saved_jobs(request):
+    """Async SavedJobView.get."""
+    saved = SavedJob.objects.filter(user=request.user).order_by('-saved_at', '-id')
+    limit, offset = get_limit_offset(request, settings.SAVED_JOBS_PAGE_SIZE, settings.SAVED_JOBS_MAX_PAGE_SIZE)
+    rows = [row async for row in SavedJobReadSerializer.values(saved)[offset:offset + limit]]
+    return render({
+        "count": await saved.acount(),
+        "jobs": SavedJobReadSerializer(rows).data,
+    })
+
+
+@async_api_view(authenticated=True)
+async def recent_jobs(request):
+    """Async RecentJobView.get."""
+    await sync_to_async(flush_recent_views)(request.user.pk)
+    recent = RecentJob.objects.filter(user=request.user)
+    limit, offset = get_limit_offset(request, settings.RECENT_JOBS_PAGE_SIZE, settings.RECENT_JOBS_MAX_PAGE_SIZE)
+    rows = [row async for row in RecentJobReadSerializer.values(recent)[offset:offset + limit]]
+    return render(RecentJobReadSerializer(rows).data)
+
+
+@async_api_view(authenticated=True)
+async def get_profile(request):
+    """Async get_profile."""
+    state = await aprofile_state(request.user)
+
+    async def build_data():
+        profile = await profile_queryset().aget(user=request.user)
+        return ProfileSerializer(profile).data
+
+    async def build_response():
+        if state is None:
+            return render({"detail": "Profile not found."}, status.HTTP_404_NOT_FOUND)
+        try:
+            return await cached(request, f'profile:{date.today()}', build_data, namespace=profile_namespace(state['id']))
+        except Profile.DoesNotExist:
+            return render({"detail": "Profile not found."}, status.HTTP_404_NOT_FOUND)
+
+    validators = profile_validators(request, 'profile', state)
+    return await aconditional_response(request, validators, build_response, private=True)
+
+
+@async_api_view(methods=('POST',))
+async def login(request):
+    """Async CustomTokenObtainPairView: hashing and token minting run on a bounded pool (app/login.py)."""
+    serializer = LoginSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    tokens = await alogin(serializer.validated_data['email'], serializer.validated_data['password'])
+    if tokens is None:
+        return render({'non_field_errors': ['Invalid credentials.']}, status.HTTP_400_BAD_REQUEST)
+    return render(tokens)
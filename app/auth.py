@@ -0,0 +1,159 @@
+"""JWT authentication with a per-process cache of the authenticated users.
+
+simplejwt's JWTAuthentication loads the ``User`` row on every request.
+``CachedJWTAuthentication`` keeps each user's row, plus the id of their
+``Profile``, in a bounded LRU for ``AUTH_USER_CACHE_TTL`` seconds. It is
+keyed by the token's user id and filled with a single query (user LEFT JOIN
+profile). On a hit the request is authenticated without touching the
+database. ``request.user`` is a fresh ``User`` instance built from the
+cached row, and ``get_profile_id(request.user)`` needs no query either.
+
+Saving or deleting a user or profile evicts the entry in this process (see
+``app/signals.py``). Other worker processes notice within the TTL, which
+also bounds how long a deactivated user or a changed password keeps
+working there.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Profile
+
+
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+# Set on users built by CachedJWTAuthentication: their profile id, None without a profile
+PROFILE_ID_ATTR = '_cached_profile_id'
+
+
+class UserCache:
+    """Bounded LRU of user id -> (expires at, user row values, profile id)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        # Bumped by every forget(), so a row loaded before an eviction isn't stored after it
+        self.generation = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1:]
+
+    def set(self, user_id, values, profile_id, generation):
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+        size = getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000)
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[user_id] = (time.monotonic() + ttl, values, profile_id)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def forget(self, user_id):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+def cache_enabled():
+    return getattr(settings, 'AUTH_USER_CACHE_ENABLED', True)
+
+
+def forget_user(user_id):
+    # Entries are keyed like the token claim, a string.
+    # Again after commit: a request may have cached the old row in between
+    user_id = str(user_id)
+    user_cache.forget(user_id)
+    transaction.on_commit(lambda: user_cache.forget(user_id))
+
+
+def _user_rows(user_id):
+    return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*USER_FIELDS, F('profile__id'))
+
+
+def _split(row):
+    return None if row is None else (row[:-1], row[-1])
+
+
+def load_user(user_id):
+    """(user row values, profile id) in one query, or None."""
+    return _split(_user_rows(user_id).first())
+
+
+async def aload_user(user_id):
+    return _split(await _user_rows(user_id).afirst())
+
+
+def build_user(values, profile_id):
+    user = User.from_db('default', USER_FIELDS, values)
+    setattr(user, PROFILE_ID_ATTR, profile_id)
+    return user
+
+
+def get_profile_id(user):
+    """Id of ``user``'s Profile or None; free for users authenticated by CachedJWTAuthentication."""
+    if hasattr(user, PROFILE_ID_ATTR):
+        return getattr(user, PROFILE_ID_ATTR)
+    # Users from elsewhere (sessions, force_authenticate) may outlive the request: don't memoize
+    return Profile.objects.filter(user=user).values_list('id', flat=True).first()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        cached = self.cached(user_id)
+        if cached is None:
+            generation = user_cache.generation
+            cached = self.remember(user_id, load_user(user_id), generation)
+        return self.check_user(build_user(*cached), validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+    def cached(self, user_id):
+        return user_cache.get(user_id) if cache_enabled() else None
+
+    def remember(self, user_id, loaded, generation):
+        if loaded is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if cache_enabled():
+            user_cache.set(user_id, *loaded, generation)
+        return loaded
+
+    def check_user(self, user, validated_token):
+        # Same checks as JWTAuthentication.get_user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
@@ -0,0 +1,19 @@
+"""Run slow side effects (image resizing and the like) off the request thread.
+
+``run_in_background`` queues the call on the database task queue (see
+``app/tasks.py``), inside the caller's transaction, and a
+``manage.py run_tasks`` worker runs it. A call with the same arguments that
+is still waiting isn't queued twice. With ``BACKGROUND_TASKS_EAGER = True``
+(handy in tests and management commands) it runs inline once the
+transaction commits instead.
+
+Arguments must be JSON serializable: pass ids and model labels, not
+instances or classes.
+"""
+from .tasks import default_key, enqueue, task_name
+
+
+def run_in_background(func, *args, **kwargs):
+    """Queue ``func(*args, **kwargs)``; ``func`` must be a module-level function."""
+    name = task_name(func)
+    return enqueue(name, args, kwargs, key=default_key(name, list(args), kwargs))
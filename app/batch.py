@@ -0,0 +1,77 @@
+"""All-or-nothing batch writes for a profile's work experience and education entries.
+
+A batch is a list of items (with ``id`` to update an entry, without to
+create one) plus ids to delete. Every referenced row is loaded with one
+``in_bulk``, every item is validated before anything is written, and the
+writes are one ``bulk_update``, one ``bulk_create`` and one delete inside a
+single transaction, so the query count doesn't grow with the batch.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .cache import bump_version, profile_namespace
+
+
+def apply_profile_batch(model, profile, items, delete_ids, serializer_class, label):
+    """Apply a batch to ``model`` rows of ``profile``.
+
+    Returns (updated instances, created instances, deleted count). Raises
+    NotFound for ids that aren't the profile's and ValidationError (with the
+    first invalid item's errors) before anything is written.
+    """
+    pk_field = model._meta.pk
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValidationError({"detail": f"Each {label.lower()} item must be an object."})
+        if 'id' in item:
+            # "5" and 5 address the same row, as they did with objects.get(id=...)
+            try:
+                item['id'] = pk_field.to_python(item['id'])
+            except DjangoValidationError:
+                raise NotFound(f"{label} with ID {item['id']} not found.")
+
+    with transaction.atomic():
+        ids = [item['id'] for item in items if 'id' in item]
+        existing = model.objects.select_for_update().filter(profile=profile).in_bulk(ids) if ids else {}
+
+        updates, creates = [], []
+        for item in items:
+            data = {key: value for key, value in item.items() if key not in ('id', 'profile')}
+            if 'id' in item:
+                instance = existing.get(item['id'])
+                if instance is None:
+                    raise NotFound(f"{label} with ID {item['id']} not found.")
+                serializer = serializer_class(instance, data=data, partial=True)
+            else:
+                instance = None
+                serializer = serializer_class(data=data)
+            if not serializer.is_valid():
+                raise ValidationError({"detail": serializer.errors})
+            if instance is None:
+                creates.append(model(profile=profile, **serializer.validated_data))
+            else:
+                updates.append((instance, serializer.validated_data))
+
+        # Same row sent twice: later items win, like sequential saves would
+        updated, fields = [], {'updated_at'}
+        now = timezone.now()
+        for instance, validated_data in updates:
+            for name, value in validated_data.items():
+                setattr(instance, name, value)
+            instance.updated_at = now  # bulk_update skips auto_now
+            fields.update(validated_data)
+            updated.append(instance)
+
+        if updated:
+            model.objects.bulk_update({id(instance): instance for instance in updated}.values(), sorted(fields))
+        created = model.objects.bulk_create(creates) if creates else []
+        deleted_count = 0
+        if delete_ids:
+            deleted_count, _ = model.objects.filter(id__in=delete_ids, profile=profile).delete()
+
+        # Bulk writes send no post_save, so drop the cached profile here
+        bump_version(profile_namespace(profile.pk))
+
+    return updated, created, deleted_count
@@ -0,0 +1,160 @@
+"""Response cache for the job list endpoints and profile reads.
+
+Entries are keyed on a canonical form of the query string and on a
+namespace version. Any write to Job replaces the version of the jobs
+namespace (see ``app/signals.py``), so every entry built before the write
+becomes unreachable at once instead of being deleted key by key. Each
+profile has a namespace of its own, bumped when the profile, its user or
+any of its entries change.
+
+Versions start with the time they were made, which the job list ETags
+and Last-Modified dates are built from (``app/conditional.py``).
+
+Versions are bumped by the run_tasks workers too (salary recomputes, image
+variants), so the cache must be shared by every process: a per-process
+locmem cache is only accepted with ``BACKGROUND_TASKS_EAGER`` (see
+:func:`check_shared_cache`).
+"""
+import hashlib
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+
+CACHE_ALIAS = 'job_lists'
+JOBS_NAMESPACE = 'jobs'
+PROFILE_NAMESPACE = 'profile'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def cache_enabled(namespace=JOBS_NAMESPACE):
+    if namespace.startswith(PROFILE_NAMESPACE):
+        return getattr(settings, 'PROFILE_CACHE_ENABLED', True)
+    return getattr(settings, 'JOB_LIST_CACHE_ENABLED', True)
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    """System check: background workers can't invalidate a per-process cache."""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False) or not isinstance(get_cache(), LocMemCache):
+        return []
+    return [checks.Error(
+        f'The {CACHE_ALIAS!r} cache is per-process (locmem), but background tasks run in run_tasks workers.',
+        hint="Use JOB_LIST_CACHE_BACKEND='file' (or another shared backend), or BACKGROUND_TASKS_EAGER.",
+        id='app.E001',
+    )]
+
+
+def profile_namespace(profile_id):
+    return f'{PROFILE_NAMESPACE}:{profile_id}'
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _new_version():
+    # A fresh random token instead of incr(): no lost updates between workers
+    return f'{time.time():.6f}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """When ``version`` was made, as an aware datetime."""
+    return datetime.fromtimestamp(float(version.partition('-')[0]), tz=dt_timezone.utc)
+
+
+def get_version(namespace=JOBS_NAMESPACE):
+    cache = get_cache()
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), _new_version(), timeout=None)
+        version = cache.get(_version_key(namespace))
+    return version
+
+
+def _set_new_version(namespace):
+    get_cache().set(_version_key(namespace), _new_version(), timeout=None)
+
+
+def bump_version(namespace=JOBS_NAMESPACE):
+    """Invalidate every cached entry of ``namespace``.
+
+    The version changes right away and again once the current transaction
+    commits, so a reader that filled the cache between the write and the
+    commit cannot leave a stale entry behind.
+    """
+    _set_new_version(namespace)
+    transaction.on_commit(lambda: _set_new_version(namespace))
+
+
+def canonical_query(query_params):
+    """Stable representation of a QueryDict: sorted keys, sorted values, blanks dropped."""
+    items = []
+    for key in sorted(query_params.keys()):
+        values = sorted(value.strip() for value in query_params.getlist(key) if value.strip())
+        if values:
+            items.append((key, values))
+    return repr(items)
+
+
+def make_key(request, view_name, namespace=JOBS_NAMESPACE):
+    # Pagination links are absolute, so the host and path are part of the key too
+    raw = f'{request.scheme}://{request.get_host()}{request.path}|{canonical_query(request.query_params)}'
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{view_name}:{digest}'
+
+
+def record(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def lookup(request, view_name, namespace=JOBS_NAMESPACE):
+    """Return (key, cached data or None) for this request, counting the hit or miss."""
+    key = make_key(request, view_name, namespace)
+    data = get_cache().get(key)
+    record(hit=data is not None)
+    return key, data
+
+
+def store(key, data):
+    get_cache().set(key, data, timeout=getattr(settings, 'JOB_LIST_CACHE_TIMEOUT', 300))
+
+
+def cached_response(request, view_name, build_response, namespace=JOBS_NAMESPACE):
+    """Return a cached copy of ``build_response()``'s data for this query string.
+
+    Only 200 responses are stored. The ``X-Cache`` header reports HIT or MISS.
+    """
+    if not cache_enabled(namespace):
+        return build_response()
+
+    key, data = lookup(request, view_name, namespace)
+    if data is not None:
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    response = build_response()
+    if response.status_code == 200:
+        store(key, response.data)
+    response['X-Cache'] = 'MISS'
+    return response
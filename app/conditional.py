@@ -0,0 +1,148 @@
+"""Conditional GET (ETag / Last-Modified) for the polled read endpoints.
+
+Job lists are validated against the version of the jobs cache namespace
+(``app/cache.py``), which every job write replaces: the ETag hashes it with
+the URL, and Last-Modified is when it was made. Checking them costs a cache
+read and no SQL. Profile reads use one aggregate query over the rows the
+response is built from (``MAX(updated_at)`` plus a row count, so deletes
+show up too). When the client's ``If-None-Match`` / ``If-Modified-Since``
+still match, the view answers 304 without loading or serializing anything.
+
+Responses also depend on the clock (``relative_created_at`` on jobs, the
+"Current" duration of profile entries), so the validators include a time
+bucket: ``JOB_LIST_ETAG_WINDOW`` seconds for job lists, the current day for
+profiles.
+"""
+import hashlib
+import math
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .auth import get_profile_id
+from .cache import JOBS_NAMESPACE, canonical_query, get_version, version_time
+from .models import Profile, WorkExperience
+
+
+def get_window():
+    return getattr(settings, 'JOB_LIST_ETAG_WINDOW', 300)
+
+
+def _profile_state_queryset(user):
+    return Profile.objects.filter(user=user).values(
+        'id', 'updated_at', 'user__first_name', 'user__last_name',
+    ).annotate(
+        work_updated=Max('work_experiences__updated_at'),
+        work_count=Count('work_experiences', distinct=True),
+        education_updated=Max('educations__updated_at'),
+        education_count=Count('educations', distinct=True),
+    )
+
+
+def profile_state(user):
+    """Change markers of the user's profile and its entries, or None without a profile."""
+    if get_profile_id(user) is None:
+        return None
+    return _profile_state_queryset(user).first()
+
+
+async def aprofile_state(user):
+    return await _profile_state_queryset(user).afirst()
+
+
+def work_experience_state(user):
+    profile_id = get_profile_id(user)
+    # Without a profile the view answers 404, so don't validate at all
+    if profile_id is None:
+        return None
+    return WorkExperience.objects.filter(profile_id=profile_id).aggregate(
+        last_modified=Max('updated_at'), count=Count('id'),
+    )
+
+
+def make_etag(request, view_name, *parts):
+    # Pagination links are absolute and depend on the path and query string
+    raw = '|'.join([
+        view_name, f'{request.scheme}://{request.get_host()}{request.path}', canonical_query(request.GET),
+        *(str(part) for part in parts),
+    ])
+    return quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def job_list_validators(request, view_name):
+    version = get_version(JOBS_NAMESPACE)
+    window = get_window()
+    bucket = int(timezone.now().timestamp()) // window
+    # relative_created_at changes every window even when no row does
+    window_start = datetime.fromtimestamp(bucket * window, tz=timezone.get_current_timezone())
+    # HTTP dates have whole seconds: round up, so a write later in the same second isn't missed
+    changed = datetime.fromtimestamp(math.ceil(version_time(version).timestamp()), tz=window_start.tzinfo)
+    etag = make_etag(request, view_name, version, bucket)
+    return etag, max(changed, window_start)
+
+
+def _start_of_day(today):
+    # Open-ended durations ("Current") are computed against today's date
+    return timezone.make_aware(datetime.combine(today, time.min), timezone.get_default_timezone())
+
+
+def profile_validators(request, view_name, state):
+    if state is None:
+        return None, None
+    today = date.today()
+    markers = [state['updated_at'], state['work_updated'], state['education_updated']]
+    last_modified = max(filter(None, markers + [_start_of_day(today)]))
+    etag = make_etag(request, view_name, request.user.pk, *[value for _, value in sorted(state.items())], today)
+    return etag, last_modified
+
+
+def work_experience_validators(request, view_name, state):
+    if state is None:
+        return None, None
+    today = date.today()
+    last_modified = max(filter(None, [state['last_modified'], _start_of_day(today)]))
+    etag = make_etag(request, view_name, request.user.pk, state['last_modified'], state['count'], today)
+    return etag, last_modified
+
+
+def not_modified(request, validators):
+    """The 304 response if the client's copy is still current, otherwise None."""
+    etag, last_modified = validators
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+
+
+def add_validators(response, validators, private=False):
+    etag, last_modified = validators
+    if etag is None or response.status_code not in (200, 304):
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    # Cacheable, but always revalidated with the validators above
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+        patch_vary_headers(response, ['Authorization'])
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value is not None else None
+
+
+def conditional_response(request, validators, build_response, private=False):
+    """Return 304 if the request's validators match, otherwise ``build_response()`` with ETag/Last-Modified.
+
+    ``validators`` is an (etag, last_modified) pair; (None, None) skips the check.
+    """
+    response = not_modified(request, validators)
+    if response is None:
+        response = build_response()
+    return add_validators(response, validators, private)
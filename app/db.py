@@ -0,0 +1,157 @@
+"""Database connection tuning and read replica routing.
+
+**SQLite pragmas.** Every new SQLite connection gets ``SQLITE_PRAGMAS``
+(see the settings). WAL lets readers run while a writer commits, and
+``synchronous = NORMAL`` is the usual durable-enough pairing for it. The
+journal mode is a property of the file, not the connection, so it is only
+set with ``DB_WAL=1``: a plain ``manage.py check`` must not convert the
+checked-in development database. ``busy_timeout`` makes a writer wait
+for the lock instead of failing with "database is locked". Replica connections are also opened
+``query_only``, so a write routed there by mistake fails loudly.
+Connections are kept between requests (``CONN_MAX_AGE``), so this
+runs once per connection, not once per request.
+
+**Replica routing.** With ``READ_REPLICA_ALIAS`` set to a configured
+alias, ``ReadReplicaMiddleware`` marks GET/HEAD requests for the views
+in ``READ_REPLICA_VIEWS``, and ``ReadReplicaRouter`` sends their reads
+there. The replica can be another SQLite file kept in sync from the
+primary, or another backend. Everything else reads from the primary, and
+all writes go to the primary. That includes per-user lists (saved and
+recent jobs, the profile), where a lagging replica would hide the user's
+own changes.
+
+The response caches are versioned by writes on the primary, and a list
+read from a lagging replica right after a write would be cached under the
+new version, stale until the next write. So for ``READ_REPLICA_LAG``
+seconds after the jobs version changed (its commit, see ``app/cache.py``)
+these views read the primary too. Set it above the replica's worst lag.
+The version is kept in the job_lists cache, which every web process and
+task worker shares, so a write made by any of them counts; a system check
+rejects a per-process (locmem) cache when a replica is configured.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .cache import CACHE_ALIAS, get_cache, get_version, version_time
+
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+DEFAULT_PRAGMAS = {
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+}
+
+
+def get_replica_alias():
+    """The replica's alias, or None when none is configured."""
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', None)
+    return alias if alias and alias in connections.settings else None
+
+
+def check_replica_cache(app_configs=None, **kwargs):
+    """System check: the last write must be seen by every process reading the replica."""
+    if get_replica_alias() is None or not isinstance(get_cache(), LocMemCache):
+        return []
+    return [checks.Error(
+        f'A read replica is configured, but the {CACHE_ALIAS!r} cache holding the last write time is per-process.',
+        hint="Use JOB_LIST_CACHE_BACKEND='file' (or another shared backend).",
+        id='app.E002',
+    )]
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: tune each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS))
+    if connection.alias == get_replica_alias():
+        pragmas['query_only'] = 'on'
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def use_replica(request):
+    match = getattr(request, 'resolver_match', None)
+    return (
+        request.method in ('GET', 'HEAD')
+        and match is not None
+        and match.url_name in getattr(settings, 'READ_REPLICA_VIEWS', ())
+    )
+
+
+def recently_written():
+    """True within READ_REPLICA_LAG seconds of the last job write (or of a cold version cache)."""
+    lag = getattr(settings, 'READ_REPLICA_LAG', 5)
+    return time.time() - version_time(get_version()).timestamp() < lag
+
+
+def route_reads(request):
+    alias = get_replica_alias()
+    if alias is not None and use_replica(request) and not recently_written():
+        _read_alias.set(alias)
+
+
+class ReadReplicaMiddleware:
+    """Route the reads of the read-only list views to READ_REPLICA_ALIAS."""
+
+    # Under ASGI it stays async, so it doesn't push the rest of the chain onto a thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The handler runs sync hooks of an async chain in a thread
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_alias.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+    async def __acall__(self, request):
+        token = _read_alias.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route_reads(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        route_reads(request)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        # Inside a transaction on the primary, read what it is about to commit
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both copies hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema and rows from the primary
+        return db != get_replica_alias()
@@ -0,0 +1,92 @@
+"""Facet counts for the job list filters.
+
+For every facet the jobs are filtered by everything in the query string
+*except* that facet's own parameters, then counted with one grouped
+aggregate. That is what a filter UI needs: with ``?job_type=remote`` the
+job_type facet still shows how many hybrid or office jobs there are, while
+the currency, location and salary facets count remote jobs only.
+"""
+import copy
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+from rest_framework.request import Request
+
+from .models import Job
+
+
+# facet -> query parameters it ignores while being counted
+FACET_PARAMS = {
+    'job_type': ['job_type'],
+    'currency': ['currency'],
+    'location': ['location'],
+    'salary': ['salary', 'min_salary', 'max_salary'],
+}
+
+# In the base currency (see app/salary.py)
+DEFAULT_SALARY_BUCKETS = [250_000, 500_000, 750_000, 1_000_000, 1_500_000, 2_500_000]
+
+
+def get_salary_buckets():
+    return getattr(settings, 'JOB_FACET_SALARY_BUCKETS', DEFAULT_SALARY_BUCKETS)
+
+
+def without_params(request, names):
+    """A copy of ``request`` whose query string lacks ``names``."""
+    params = request.query_params.copy()
+    for name in names:
+        params.pop(name, None)
+    http_request = copy.copy(request._request)
+    http_request.GET = params
+    return Request(http_request)
+
+
+def count_by(queryset, field, choices=()):
+    counts = dict(queryset.order_by().values_list(field).annotate(count=Count('id')))
+    # Every known choice is listed, with 0 if nothing matches
+    for value in choices:
+        counts.setdefault(value, 0)
+    counts.pop(None, None)
+    return [
+        {'value': value, 'count': count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def salary_buckets(queryset):
+    bounds = get_salary_buckets()
+    lows = [0] + list(bounds)
+    cases = [When(salary_base__lt=high, then=Value(position)) for position, high in enumerate(bounds)]
+    bucket = Case(*cases, default=Value(len(bounds)), output_field=IntegerField())
+    counts = dict(
+        queryset.order_by().filter(salary_base__isnull=False)
+        .annotate(bucket=bucket).values_list('bucket').annotate(count=Count('id'))
+    )
+    return [
+        {'min': low, 'max': bounds[position] if position < len(bounds) else None, 'count': counts.get(position, 0)}
+        for position, low in enumerate(lows)
+    ]
+
+
+def compute_facets(request, filter_queryset):
+    """{"count": ..., "facets": {...}} for this request's filters.
+
+    ``filter_queryset(request)`` must return the filtered jobs for a request,
+    as JobListView would list them.
+    """
+    facets = {}
+    total = None
+    for facet, names in FACET_PARAMS.items():
+        active = any(name in request.query_params for name in names)
+        queryset = filter_queryset(without_params(request, names) if active else request)
+        if facet == 'salary':
+            facets[facet] = salary_buckets(queryset)
+            continue
+        choices = [value for value, _ in Job._meta.get_field(facet).choices or ()]
+        facets[facet] = count_by(queryset, facet, choices)
+        if total is None and not active:
+            # This facet saw every filter, so its counts add up to the total
+            total = sum(item['count'] for item in facets[facet])
+    if total is None:
+        total = filter_queryset(request).order_by().count()
+    return {'count': total, 'facets': facets}
@@ -0,0 +1,143 @@
+"""Resized and WebP derivatives of uploaded images (Job.logo, Profile.avatar).
+
+Each size in ``IMAGE_VARIANT_SIZES`` becomes two files: a WebP and a JPEG
+(PNG when the source has transparency). File names carry a hash of the
+source bytes and the target size, so a URL never changes content and can be
+served with a far-future ``Cache-Control: immutable``.
+
+What was generated is stored on the row itself, e.g. ``Job.logo_variants``::
+
+    {"source": "job_logos/acme.png",
+     "sizes": {"thumb": {"src": "job_logos/variants/<hash>.thumb-96.jpg",
+                         "webp": "job_logos/variants/<hash>.thumb-96.webp",
+                         "width": 96, "height": 54}, ...}}
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import bump_version, profile_namespace
+from .models import Job, Profile
+
+
+logger = logging.getLogger(__name__)
+
+# model -> (image field, field holding its variants)
+IMAGE_FIELDS = {
+    Job: ('logo', 'logo_variants'),
+    Profile: ('avatar', 'avatar_variants'),
+}
+
+DEFAULT_SIZES = {'thumb': 96, 'card': 320}
+
+
+def get_sizes():
+    return getattr(settings, 'IMAGE_VARIANT_SIZES', DEFAULT_SIZES)
+
+
+def variants_are_current(file_name, variants, sizes=None):
+    """True when ``variants`` were built from ``file_name`` with the configured sizes."""
+    if not file_name:
+        return variants is None
+    if not variants or variants.get('source') != file_name:
+        return False
+    sizes = sizes or get_sizes()
+    built = variants.get('sizes', {})
+    return all(label in built and built[label].get('size') == size for label, size in sizes.items())
+
+
+def build_variants(field_file, sizes=None):
+    """Write every variant of ``field_file`` to its storage and return the description to store."""
+    sizes = sizes or get_sizes()
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback_ext, fallback_format = ('png', 'PNG') if has_alpha else ('jpg', 'JPEG')
+    quality = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+    directory = posixpath.join(posixpath.dirname(field_file.name), 'variants')
+
+    built = {}
+    for label, size in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)  # never upscales
+        entry = {'size': size, 'width': resized.width, 'height': resized.height}
+        for key, ext, image_format in (('webp', 'webp', 'WEBP'), ('src', fallback_ext, fallback_format)):
+            name = posixpath.join(directory, f'{digest}.{label}-{size}.{ext}')
+            # Same bytes and size -> same name, so an existing file is already right
+            if not storage.exists(name):
+                buffer = BytesIO()
+                resized.save(buffer, image_format, quality=quality, optimize=True)
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            entry[key] = name
+        built[label] = entry
+    return {'source': field_file.name, 'sizes': built}
+
+
+def generate_image_variants(model, pk, force=False):
+    """(Re)build the variants of one row (``model`` may be its label) and store them. Returns what happened."""
+    if isinstance(model, str):
+        model = apps.get_model(model)
+    field_name, variants_field = IMAGE_FIELDS[model]
+    instance = model.objects.filter(pk=pk).only(field_name, variants_field).first()
+    if instance is None:
+        return 'missing'
+    field_file = getattr(instance, field_name)
+    current = getattr(instance, variants_field)
+
+    if not field_file:
+        variants = None
+        if current is None:
+            return 'current'
+    elif not force and variants_are_current(field_file.name, current):
+        return 'current'
+    else:
+        try:
+            variants = build_variants(field_file)
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            logger.warning('Could not build variants of %s: %s', field_file.name, exc)
+            return 'failed'
+
+    # Only store them if the image wasn't replaced in the meantime. update()
+    # skips post_save, so nothing schedules this row again, and auto_now, so
+    # updated_at (the conditional GET marker) is set by hand.
+    if field_file:
+        unchanged = Q(**{field_name: field_file.name})
+    else:
+        unchanged = Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True})
+    updated = model.objects.filter(unchanged, pk=pk).update(**{variants_field: variants, 'updated_at': timezone.now()})
+    if not updated:
+        return 'current'
+    if model is Job:
+        bump_version()
+    else:
+        bump_version(profile_namespace(pk))
+    return 'generated' if variants else 'cleared'
+
+
+def variant_urls(variants, storage, request=None):
+    """Serialized form of a ``*_variants`` value: the stored names turned into URLs."""
+    if not variants:
+        return None
+
+    def url(name):
+        value = storage.url(name)
+        return request.build_absolute_uri(value) if request is not None else value
+
+    return {
+        label: {'src': url(entry['src']), 'webp': url(entry['webp']), 'width': entry['width'], 'height': entry['height']}
+        for label, entry in variants.get('sizes', {}).items()
+    }
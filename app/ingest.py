@@ -0,0 +1,156 @@
+"""Bulk job ingestion from NDJSON or CSV feeds.
+
+Rows are validated with JobImportSerializer a batch at a time and the valid
+ones are inserted with one bulk_create per batch, each in its own
+transaction. A bad row only ends up in the error report; it never fails
+the rest of its batch or the feed. The report keeps the first
+``JOB_IMPORT_MAX_ERRORS`` row errors, ``failed`` counts all of them.
+"""
+import codecs
+import csv
+import json
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Job
+from .salary import fill_salary_base, get_rates
+from .serializers import JobImportSerializer
+from .signals import jobs_imported
+
+
+FORMATS = ('ndjson', 'csv')
+
+# Columns that are JSON-encoded in CSV feeds
+CSV_JSON_COLUMNS = ('jdata',)
+
+
+def detect_format(content_type='', filename=''):
+    if 'csv' in (content_type or '') or (filename or '').lower().endswith('.csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+def decode_lines(byte_lines):
+    # utf-8-sig drops the BOM spreadsheet exports like to start with
+    return codecs.iterdecode(byte_lines, 'utf-8-sig')
+
+
+def parse_ndjson(lines):
+    """Yield (row_number, data, error) for every non-blank line."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(data, dict):
+            yield number, None, {'non_field_errors': ['Expected a JSON object.']}
+            continue
+        yield number, data, None
+
+
+def parse_csv(lines):
+    """Yield (row_number, data, error) for every CSV record after the header."""
+    reader = csv.DictReader(lines)
+    for number, record in enumerate(reader, start=1):
+        data = {key: value for key, value in record.items() if key is not None}
+        error = None
+        for column in CSV_JSON_COLUMNS:
+            value = data.get(column)
+            if value in ('', None):
+                data[column] = None
+                continue
+            try:
+                data[column] = json.loads(value)
+            except ValueError as exc:
+                error = {column: [f'Invalid JSON: {exc}']}
+        # Empty cells mean "not set", not an empty string
+        if data.get('salary') == '':
+            data['salary'] = None
+        yield number, (None if error else data), error
+
+
+def parse_rows(byte_lines, data_format):
+    lines = decode_lines(byte_lines)
+    if data_format == 'csv':
+        return parse_csv(lines)
+    return parse_ndjson(lines)
+
+
+def import_jobs(rows, batch_size=1000, using='default', max_errors=None):
+    """Validate and insert parsed rows, returning a report with per-row errors.
+
+    ``rows`` is an iterable of (row_number, data, error) as produced by
+    parse_rows(). Only the first ``max_errors`` errors are listed, so a
+    feed of nothing but bad rows can't fill memory with them.
+    """
+    if max_errors is None:
+        max_errors = getattr(settings, 'JOB_IMPORT_MAX_ERRORS', 1000)
+    started = time.perf_counter()
+    report = {'total': 0, 'created': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    created_ids = []
+
+    def fail(number, errors):
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': number, 'errors': errors})
+        else:
+            report['errors_truncated'] = True
+
+    # One serializer validates every row, so its fields are only built once
+    serializer = JobImportSerializer()
+    # bulk_create skips pre_save, so salary_base is converted here with rates read once
+    rates = get_rates(using)
+    batch = []
+    for number, data, error in rows:
+        report['total'] += 1
+        if error:
+            fail(number, error)
+            continue
+        try:
+            validated_data = serializer.run_validation(data)
+        except ValidationError as exc:
+            fail(number, exc.detail)
+            continue
+        batch.append((number, fill_salary_base([Job(**validated_data)], rates=rates)[0]))
+        if len(batch) >= batch_size:
+            created_ids += insert_batch(batch, using, fail)
+            batch = []
+    if batch:
+        created_ids += insert_batch(batch, using, fail)
+
+    report['created'] = len(created_ids)
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['total'] / elapsed, 1) if elapsed else None
+
+    if created_ids:
+        # bulk_create sends no post_save, tell the caches and indexes ourselves
+        jobs_imported.send(sender=Job, job_ids=created_ids, using=using)
+    return report
+
+
+def insert_batch(batch, using, fail):
+    jobs = [job for _, job in batch]
+    try:
+        with transaction.atomic(using=using):
+            Job.objects.using(using).bulk_create(jobs)
+        return [job.pk for job in jobs]
+    except DatabaseError:
+        pass
+
+    # Something in the batch broke the insert, find it row by row
+    created = []
+    for number, job in batch:
+        try:
+            with transaction.atomic(using=using):
+                Job.objects.using(using).bulk_create([job])
+            created.append(job.pk)
+        except DatabaseError as exc:
+            fail(number, {'non_field_errors': [f'Database error: {exc}']})
+    return created
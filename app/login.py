@@ -0,0 +1,84 @@
+"""Email + password login.
+
+Emails are stored normalized (stripped, lower-cased; see ``app/signals.py``)
+and ``auth_user.email`` has a unique index on non-blank values plus a plain
+one for lookups (migration 0018), so finding the account is an index probe
+instead of a table scan.
+
+Checking the password is PBKDF2 with hundreds of thousands of iterations:
+tens to hundreds of milliseconds of CPU. ``alogin`` (the ASGI view) runs it,
+together with minting the tokens, on a bounded thread pool
+(``LOGIN_HASH_WORKERS``) so the event loop keeps serving other requests.
+hashlib releases the GIL while hashing, so those threads hash in parallel.
+Unknown emails hash a dummy password, so response times don't reveal
+which addresses have an account.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def find_user(email):
+    return User.objects.filter(email=normalize_email(email)).first()
+
+
+async def afind_user(email):
+    return await User.objects.filter(email=normalize_email(email)).afirst()
+
+
+def check_credentials(user, password):
+    """True if ``password`` is ``user``'s. Costs one password hash either way."""
+    if user is None:
+        # Same work as a real check, like Django's ModelBackend
+        User().set_password(password)
+        return False
+    return user.check_password(password)
+
+
+def issue_tokens(user):
+    refresh = RefreshToken.for_user(user)
+    return {
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+    }
+
+
+def verify_and_issue(user, password):
+    """Tokens for ``user`` if the password matches, else None (the CPU-heavy part of a login)."""
+    if not check_credentials(user, password):
+        return None
+    return issue_tokens(user)
+
+
+def login(email, password):
+    return verify_and_issue(find_user(email), password)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'LOGIN_HASH_WORKERS', None) or os.cpu_count() or 2,
+                thread_name_prefix='login',
+            )
+        return _executor
+
+
+async def alogin(email, password):
+    """``login`` for async views: the lookup on the async ORM, hashing and tokens on the pool."""
+    user = await afind_user(email)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), verify_and_issue, user, password)
@@ -0,0 +1,167 @@
+import json
+import random
+import statistics
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Job
+from app.seed import SEED_PASSWORD, create_jobs, create_users, scratch_database
+
+
+# name -> (method, path template, authenticated); {page} is filled in per request
+SCENARIOS = {
+    'jobsf': ('GET', '/api/jobsf/?page={page}', False),
+    'jobsf-filtered': ('GET', '/api/jobsf/?job_type=remote&min_salary=300000&page={page}', False),
+    'jobsf-search': ('GET', '/api/jobsf/?search=python', False),
+    'saved-jobs': ('GET', '/api/saved-jobs/', True),
+    'recent-jobs': ('GET', '/api/recent-jobs/', True),
+    'profile': ('GET', '/api/profile/', True),
+    'login': ('POST', '/api/login/', False),
+}
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'api_baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main API endpoints in-process and report p50/p95/p99 latency, throughput '
+        'and SQL queries per request, compared with a stored baseline. Uses the data seeded by '
+        'seed_scale, or a small scratch database with --scratch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per scenario first.')
+        parser.add_argument('--users', type=int, default=50, help='Seeded users the authenticated requests rotate through.')
+        parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='Only these (repeatable).')
+        parser.add_argument('--with-cache', action='store_true', help='Keep the response caches on.')
+        parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 slowdown against the baseline (0.2 = 20%%).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--scratch', action='store_true', help='Seed and use a throwaway database.')
+        parser.add_argument('--scratch-jobs', type=int, default=20_000)
+        parser.add_argument('--scratch-users', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            if not options['with_cache']:
+                stack.enter_context(override_settings(JOB_LIST_CACHE_ENABLED=False, PROFILE_CACHE_ENABLED=False))
+            if options['scratch']:
+                stack.enter_context(scratch_database())
+                rng = random.Random(options['seed'])
+                create_jobs(options['scratch_jobs'], rng)
+                create_users(options['scratch_users'], rng, list(Job.objects.values_list('id', flat=True)))
+            results = self.run(options)
+
+        baseline = self.load_baseline(options['baseline'])
+        regressions = self.report(results, baseline, options['tolerance'])
+        if options['save_baseline']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Saved the baseline to {options["baseline"]}.')
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Slower than the baseline: {", ".join(regressions)}')
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        seeded = list(User.objects.filter(email__startswith='user', email__endswith='@example.com').values_list('id', flat=True))
+        users = list(User.objects.filter(id__in=rng.sample(seeded, min(len(seeded), options['users']))))
+        if not users:
+            raise CommandError('No seeded users found: run seed_scale first, or pass --scratch.')
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+        client = Client()
+
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            method, template, authenticated = SCENARIOS[name]
+            latencies, query_counts, errors = [], [], 0
+            total = options['warmup'] + options['requests']
+            started = None
+            for i in range(total):
+                if i == options['warmup']:
+                    started = time.perf_counter()
+                path = template.format(page=rng.randint(1, 50))
+                user = users[i % len(users)]
+                headers = {'HTTP_AUTHORIZATION': f'Bearer {tokens[i % len(tokens)]}'} if authenticated else {}
+                queries = 0
+                request_started = time.perf_counter()
+                with connection.execute_wrapper(count):
+                    if method == 'POST':
+                        response = client.post(path, {'email': user.email, 'password': SEED_PASSWORD},
+                                               content_type='application/json')
+                    else:
+                        response = client.get(path, **headers)
+                elapsed = time.perf_counter() - request_started
+                if i < options['warmup']:
+                    continue
+                latencies.append(elapsed)
+                query_counts.append(queries)
+                # Deep pages of a small filtered list are 404s, which are still real work
+                if response.status_code >= 500 or response.status_code in (401, 403):
+                    errors += 1
+            wall = time.perf_counter() - started if started is not None else sum(latencies)
+            results[name] = self.summarize(latencies, query_counts, errors, wall)
+        return results
+
+    @staticmethod
+    def summarize(latencies, query_counts, errors, wall):
+        ordered = sorted(latencies)
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2) if ordered else None
+
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'rps': round(len(latencies) / wall, 1) if wall else None,
+            'queries': round(statistics.mean(query_counts), 2) if query_counts else None,
+        }
+
+    @staticmethod
+    def load_baseline(path):
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def report(self, results, baseline, tolerance):
+        regressions = []
+        self.stdout.write(f'{"scenario":<16}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"queries":>9}  vs baseline')
+        for name, result in results.items():
+            line = (f'{name:<16}{result["p50_ms"]:>9}{result["p95_ms"]:>9}{result["p99_ms"]:>9}'
+                    f'{result["rps"]:>9}{result["queries"]:>9}')
+            if result['errors']:
+                line += f'  ({result["errors"]} errors)'
+            base = baseline.get(name)
+            if base:
+                slower = result['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                more_queries = result['queries'] > base['queries']
+                change = (result['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0
+                verdict = self.style.ERROR('REGRESSION') if slower or more_queries else self.style.SUCCESS('ok')
+                line += f'  p95 {change:+.0f}%, queries {base["queries"]} -> {result["queries"]} {verdict}'
+                if slower or more_queries:
+                    regressions.append(name)
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,222 @@
+import asyncio
+import random
+import statistics
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+from urllib.parse import urlsplit
+
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Job, Profile, SavedJob
+from app.seed import create_jobs, scratch_database
+
+
+# (sync path, async path) pairs that return the same response
+ENDPOINTS = [
+    ('/api/jobsf/?page=3', '/api/async/jobsf/?page=3'),
+    ('/api/jobsf/?job_type=remote&pagination=cursor', '/api/async/jobsf/?job_type=remote&pagination=cursor'),
+    ('/api/saved-jobs/', '/api/async/saved-jobs/'),
+    ('/api/profile/', '/api/async/profile/'),
+]
+
+
+def sync_only_middleware():
+    return [path for path in settings.MIDDLEWARE if not getattr(import_string(path), 'async_capable', False)]
+
+
+def check_async_chain(app):
+    """Fail if the ASGI middleware chain runs in a thread, which would make every async view sync."""
+    if isinstance(app._middleware_chain, SyncToAsync):
+        raise CommandError(f'The ASGI middleware chain is wrapped in SyncToAsync; sync-only middleware: '
+                           f'{", ".join(sync_only_middleware()) or "none found, check the handler"}')
+
+
+class ThreadUsage:
+    """Caps the threads running sync_to_async code at once, like a server's thread pool, and times them."""
+
+    def __init__(self, threads):
+        self.slots = threading.BoundedSemaphore(threads)
+        self.held = threading.local()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.busy_seconds = 0.0
+        self.in_use = self.peak = 0
+
+    def run(self, thread_handler, *args, **kwargs):
+        # A sync view calling the async ORM re-enters on its own thread: it already holds a slot
+        if getattr(self.held, 'depth', 0):
+            return thread_handler(*args, **kwargs)
+        with self.slots:
+            with self.lock:
+                self.in_use += 1
+                self.peak = max(self.peak, self.in_use)
+            self.held.depth = 1
+            started = time.perf_counter()
+            try:
+                return thread_handler(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.held.depth = 0
+                with self.lock:
+                    self.in_use -= 1
+                    self.busy_seconds += elapsed
+
+
+@contextmanager
+def thread_limit(threads):
+    usage = ThreadUsage(threads)
+    thread_handler = SyncToAsync.thread_handler
+
+    def limited(self, *args, **kwargs):
+        return usage.run(thread_handler, self, *args, **kwargs)
+
+    with mock.patch.object(SyncToAsync, 'thread_handler', limited):
+        yield usage
+
+
+@contextmanager
+def query_latency(seconds):
+    """Add ``seconds`` to every query, like a database across the network."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for connection in connections.all(initialized_only=True):
+            if wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(wrapper)
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the ASGI application in-process with many slow concurrent clients and '
+        'compare the sync read endpoints with their /api/async/ twins. A sync view holds '
+        'one of --threads worker threads for the whole view, an async view only while '
+        'a query runs; --query-latency makes the queries take as long as over a network. '
+        'Reports the thread time each request used next to throughput and latency. '
+        'Fails if the middleware chain would run async views in a thread. '
+        'Runs against a scratch copy of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=5, help='Requests per client.')
+        parser.add_argument('--delay', type=float, default=0.05,
+                            help='Seconds a slow client takes to send its request and to read each response chunk.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Threads that may run sync code (sync views, ORM calls) at once.')
+        parser.add_argument('--query-latency', type=float, default=0.005, help='Seconds added to every query.')
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(JOB_LIST_CACHE_ENABLED=False):
+            token = self.seed(options['jobs'], options['seed'])
+            app = get_asgi_application()
+            check_async_chain(app)
+            with ExitStack() as stack:
+                usage = stack.enter_context(thread_limit(options['threads']))
+                stack.enter_context(query_latency(options['query_latency']))
+                self.compare(app, token, usage, options)
+
+    def compare(self, app, token, usage, options):
+        self.stdout.write(f'{options["clients"]} clients, {options["threads"]} threads, '
+                          f'{options["query_latency"] * 1000:.1f} ms per query')
+        for mode, index in (('sync', 0), ('async', 1)):
+            paths = [pair[index] for pair in ENDPOINTS]
+            usage.reset()
+            result = asyncio.run(self.drive(app, paths, token, options))
+            self.report(mode, result, usage)
+
+    def seed(self, jobs, seed):
+        rng = random.Random(seed)
+        create_jobs(jobs, rng)
+        user = User.objects.create_user(username='bench@example.com', email='bench@example.com', first_name='Bench')
+        Profile.objects.create(user=user, skills=['python', 'django'])
+        job_ids = list(Job.objects.values_list('id', flat=True)[:30])
+        SavedJob.objects.bulk_create(SavedJob(user=user, job_id=job_id) for job_id in job_ids)
+        return str(RefreshToken.for_user(user).access_token)
+
+    async def drive(self, app, paths, token, options):
+        latencies = []
+        statuses = {}
+
+        async def client(number):
+            for i in range(options['requests']):
+                path = paths[(number + i) % len(paths)]
+                started = time.perf_counter()
+                status_code = await self.request(app, path, token, options['delay'])
+                latencies.append(time.perf_counter() - started)
+                statuses[status_code] = statuses.get(status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(number) for number in range(options['clients'])))
+        return latencies, statuses, time.perf_counter() - started
+
+    async def request(self, app, path, token, delay):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(),
+            'query_string': url.query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        request_sent = False
+        status_code = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                await asyncio.sleep(delay)  # slow upload of the request
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Future()  # stay connected until the app is done
+
+        async def send(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                await asyncio.sleep(delay)  # slow download of each chunk
+
+        await app(scope, receive, send)
+        return status_code
+
+    def report(self, mode, result, usage):
+        latencies, statuses, elapsed = result
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f'{mode:>5}: {len(latencies)} requests in {elapsed:.2f}s '
+            f'({len(latencies) / elapsed:.1f} req/s), '
+            f'p50 {percentile(0.5):.0f} ms, p95 {percentile(0.95):.0f} ms, p99 {percentile(0.99):.0f} ms, '
+            f'mean {statistics.mean(latencies) * 1000:.0f} ms, statuses {statuses}; '
+            f'threads held {usage.busy_seconds / len(latencies) * 1000:.1f} ms per request, peak {usage.peak}'
+        )
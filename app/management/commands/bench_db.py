@@ -0,0 +1,159 @@
+import random
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.db import DEFAULT_PRAGMAS
+from app.models import Job
+from app.seed import create_jobs, create_users, scratch_database
+
+
+REPLICA = 'replica'
+
+# name -> (journal mode, CONN_MAX_AGE, connection OPTIONS, pragmas, read replica);
+# None means the settings' own. 'before' is the original setup: Django's default
+# OPTIONS (deferred transactions, 5 s timeout) and no ReadReplicaMiddleware
+SETUPS = {
+    'before': ('delete', 0, {}, {}, False),
+    'after': ('wal', 60, None, None, True),
+}
+
+REPLICA_MIDDLEWARE = 'app.db.ReadReplicaMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Run reader threads (GET /api/jobsf/) and writer threads (save and unsave jobs) against '
+        'a scratch SQLite file at the same time, first with the old connection setup (rollback '
+        'journal, default connection options, a connection per request, no replica middleware), '
+        'then with WAL, the configured connection options, the SQLITE_PRAGMAS, '
+        'persistent connections and the list reads routed to a read-only replica alias '
+        '(the same file, opened query_only). Reports throughput, p95 latency and lock errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10, help='Length of each run.')
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--jobs', type=int, default=5000, help='Seeded jobs.')
+        parser.add_argument('--users', type=int, default=50, help='Seeded users the writers act as.')
+        parser.add_argument('--setup', action='append', choices=list(SETUPS), help='Only these (repeatable).')
+        parser.add_argument('--path', type=Path, help='Scratch database file (default: a temporary directory).')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        path = options['path'] or Path(tempfile.mkdtemp()) / 'bench_db.sqlite3'
+        # Threads can't share an in-memory database, so the scratch one is a file
+        connection.settings_dict['TEST']['NAME'] = str(path)
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(JOB_LIST_CACHE_ENABLED=False, PROFILE_CACHE_ENABLED=False))
+            stack.enter_context(scratch_database())
+            rng = random.Random(options['seed'])
+            self.stdout.write(f'Seeding {options["jobs"]} jobs and {options["users"]} users in {path}...')
+            create_jobs(options['jobs'], rng)
+            job_ids = list(Job.objects.values_list('id', flat=True))
+            create_users(options['users'], rng, job_ids, saved_per_user=0, recent_per_user=0)
+            users = list(User.objects.filter(email__endswith='@example.com'))
+            tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+
+            results = {}
+            for name in options['setup'] or SETUPS:
+                with self.configured(*SETUPS[name]):
+                    results[name] = self.run(options, job_ids, tokens)
+        self.report(results)
+
+    def configured(self, journal_mode, conn_max_age, options, pragmas, replica):
+        stack = ExitStack()
+        connections.close_all()
+        default = connections.settings['default']
+        stack.enter_context(override_settings(SQLITE_PRAGMAS=DEFAULT_PRAGMAS if pragmas is None else pragmas))
+        saved_max_age = default['CONN_MAX_AGE']
+        default['CONN_MAX_AGE'] = conn_max_age
+        stack.callback(default.__setitem__, 'CONN_MAX_AGE', saved_max_age)
+        if options is not None:
+            saved_options = default['OPTIONS']
+            default['OPTIONS'] = options
+            stack.callback(default.__setitem__, 'OPTIONS', saved_options)
+        # The journal mode is stored in the file, so set it outright
+        connections['default'].cursor().execute(f'PRAGMA journal_mode = {journal_mode}')
+        connections['default'].close()
+        if replica:
+            connections.settings[REPLICA] = {**default, 'TEST': {**default['TEST'], 'MIRROR': 'default'}}
+            stack.enter_context(override_settings(READ_REPLICA_ALIAS=REPLICA))
+            stack.callback(connections.settings.pop, REPLICA)
+        else:
+            stack.enter_context(override_settings(
+                MIDDLEWARE=[path for path in settings.MIDDLEWARE if path != REPLICA_MIDDLEWARE]))
+        stack.callback(connections.close_all)
+        return stack
+
+    def run(self, options, job_ids, tokens):
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        stats = {kind: {'latencies': [], 'errors': 0} for kind in ('reads', 'writes')}
+
+        def measure(kind, request):
+            started = time.perf_counter()
+            response = request()
+            elapsed = time.perf_counter() - started
+            with lock:
+                stats[kind]['latencies'].append(elapsed)
+                # "database is locked" surfaces as a 500
+                if response.status_code >= 500:
+                    stats[kind]['errors'] += 1
+
+        def reader(number):
+            rng = random.Random(options['seed'] + number)
+            client = Client(raise_request_exception=False)
+            while time.monotonic() < deadline:
+                measure('reads', lambda: client.get(f'/api/jobsf/?page={rng.randint(1, 50)}'))
+
+        def writer(number):
+            rng = random.Random(options['seed'] + 1000 + number)
+            client = Client(raise_request_exception=False)
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {tokens[number % len(tokens)]}'}
+            while time.monotonic() < deadline:
+                job_id = rng.choice(job_ids)
+                measure('writes', lambda: client.post('/api/saved-jobs/', {'job_id': job_id},
+                                                      content_type='application/json', **headers))
+                measure('writes', lambda: client.delete(f'/api/saved-jobs/{job_id}/', **headers))
+
+        def thread_main(target, number):
+            try:
+                target(number)
+            finally:
+                connections.close_all()
+
+        threads = ([threading.Thread(target=thread_main, args=(reader, i)) for i in range(options['readers'])]
+                   + [threading.Thread(target=thread_main, args=(writer, i)) for i in range(options['writers'])])
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        return {kind: self.summarize(values['latencies'], values['errors'], wall) for kind, values in stats.items()}
+
+    @staticmethod
+    def summarize(latencies, errors, wall):
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000 if ordered else 0
+        return {'requests': len(latencies), 'per_second': len(latencies) / wall, 'p95_ms': p95, 'errors': errors}
+
+    def report(self, results):
+        self.stdout.write(f'{"setup":<8}{"kind":<8}{"requests":>10}{"req/s":>9}{"p95 ms":>9}{"errors":>8}')
+        for name, kinds in results.items():
+            for kind, result in kinds.items():
+                self.stdout.write(f'{name:<8}{kind:<8}{result["requests"]:>10}{result["per_second"]:>9.1f}'
+                                  f'{result["p95_ms"]:>9.1f}{result["errors"]:>8}')
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from app.seed import SEED_PASSWORD, create_users, scratch_database, seed_email
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare login throughput of the sync /api/login/ (one request at a time) with many '
+        'concurrent clients on /api/async/login/ through the ASGI application. '
+        'Runs against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Seeded accounts.')
+        parser.add_argument('--requests', type=int, default=100, help='Logins per mode.')
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent async clients.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            rng = random.Random(options['seed'])
+            create_users(options['users'], rng, [], saved_per_user=0, recent_per_user=0)
+            # Mixed case on the wire: the lookup has to normalize
+            emails = [seed_email(rng.randrange(options['users'])).upper() for _ in range(options['requests'])]
+            self.report('sync', self.drive_sync(emails))
+            self.report('async', asyncio.run(self.drive_async(get_asgi_application(), emails, options['clients'])))
+
+    def drive_sync(self, emails):
+        client = Client()
+        latencies, statuses = [], {}
+        started = time.perf_counter()
+        for email in emails:
+            request_started = time.perf_counter()
+            response = client.post('/api/login/', {'email': email, 'password': SEED_PASSWORD},
+                                   content_type='application/json')
+            latencies.append(time.perf_counter() - request_started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return latencies, statuses, time.perf_counter() - started
+
+    async def drive_async(self, app, emails, clients):
+        latencies, statuses = [], {}
+        queue = list(emails)
+
+        async def client():
+            while queue:
+                email = queue.pop()
+                started = time.perf_counter()
+                status_code = await self.request(app, email)
+                latencies.append(time.perf_counter() - started)
+                statuses[status_code] = statuses.get(status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return latencies, statuses, time.perf_counter() - started
+
+    async def request(self, app, email):
+        body = json.dumps({'email': email, 'password': SEED_PASSWORD}).encode()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'POST', 'scheme': 'http', 'path': '/api/async/login/', 'raw_path': b'/api/async/login/',
+            'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        request_sent = False
+        status_code = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await asyncio.Future()  # stay connected until the app is done
+
+        async def send(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+
+        await app(scope, receive, send)
+        return status_code
+
+    def report(self, mode, result):
+        latencies, statuses, elapsed = result
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f'{mode:>5}: {len(latencies)} logins in {elapsed:.2f}s '
+            f'({len(latencies) / elapsed:.1f} logins/s), '
+            f'p50 {percentile(0.5):.0f} ms, p95 {percentile(0.95):.0f} ms, '
+            f'mean {statistics.mean(latencies) * 1000:.0f} ms, statuses {statuses}'
+        )
@@ -0,0 +1,84 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app.recommend import SkillIndex, job_skills, normalize_skills
+from app.seed import SKILLS, make_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the recommendation engine on synthetic jobs held in memory: index build, '
+        'scoring one profile against every job, and merging a batch of new jobs into many users\' lists. '
+        'A plain Python loop over the same jobs is timed for comparison.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=100_000)
+        parser.add_argument('--profiles', type=int, default=200, help='Profiles scored against the full index.')
+        parser.add_argument('--new-jobs', type=int, default=1000, help='Jobs merged into existing lists.')
+        parser.add_argument('--users', type=int, default=1000, help='Stored lists the new jobs are merged into.')
+        parser.add_argument('--top-k', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        total = options['jobs'] + options['new_jobs']
+        skill_lists = [job_skills(make_job(rng).jdata) for _ in range(total)]
+        job_ids = list(range(1, total + 1))
+        profiles = [normalize_skills(rng.sample(SKILLS, rng.randint(2, 8))) for _ in range(max(options['profiles'], options['users']))]
+        k = options['top_k']
+
+        started = time.perf_counter()
+        index = SkillIndex(job_ids, skill_lists)
+        self.report(f"build index over {total} jobs", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for skills in profiles[:options['profiles']]:
+            index.top_k(skills, k)
+        per_profile = (time.perf_counter() - started) / options['profiles']
+        self.report(f"score + top-{k}, one profile vs {total} jobs", per_profile)
+
+        # Reference: the obvious per-job loop, on a few profiles only
+        sample = profiles[:5]
+        idf = index.idf
+        started = time.perf_counter()
+        for skills in sample:
+            wanted = set(skills)
+            scores = [sum(idf[skill] ** 2 for skill in wanted.intersection(job)) for job in skill_lists]
+            sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+        naive = (time.perf_counter() - started) / len(sample)
+        self.report("same with a Python loop over every job", naive)
+        self.stdout.write(f"  vectorized speedup: {naive / per_profile:.0f}x")
+
+        rows = np.arange(options['jobs'], total, dtype=np.int64)
+        started = time.perf_counter()
+        for skills in profiles[:options['users']]:
+            scores = index.score_rows(skills, rows)
+            SkillIndex.best(scores, index.job_ids[rows], k)
+        self.report(
+            f"merge {options['new_jobs']} new jobs into {options['users']} lists",
+            time.perf_counter() - started,
+        )
+
+        # Incremental updates: edit existing jobs in place, then score with them patched in
+        edited = rng.sample(range(options['jobs']), min(options['new_jobs'], options['jobs']))
+        started = time.perf_counter()
+        for row in edited:
+            index.update(job_ids[row], skill_lists[total - 1 - row % options['new_jobs']])
+        self.report(f"patch {len(edited)} edited jobs into the index", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for skills in profiles[:options['profiles']]:
+            index.top_k(skills, k)
+        self.report(f"score + top-{k} with {len(index.extra)} patched jobs",
+                    (time.perf_counter() - started) / options['profiles'])
+
+        started = time.perf_counter()
+        index.rebuilt()
+        self.report("rebuild the patched index from memory", time.perf_counter() - started)
+
+    def report(self, label, seconds):
+        self.stdout.write(f"{label:<55} {seconds * 1000:>10.2f} ms")
@@ -0,0 +1,66 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from app.models import Job
+from app.seed import create_jobs
+from app.serializers import JobReadSerializer, JobSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare JobSerializer with the JobReadSerializer fast path on pages of jobs. '
+        'Synthetic jobs are seeded in a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000', help='Comma separated page sizes.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per page size.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        request = RequestFactory().get('/api/jobsf/')
+        context = {'request': request}
+
+        with transaction.atomic():
+            # Ages from today, so relative_created_at costs what it does on live data
+            create_jobs(max(sizes), random.Random(options['seed']), now=timezone.now())
+            queryset = Job.objects.order_by('-created_at', '-id')
+
+            self.stdout.write(f"{'rows':>6} {'JobSerializer':>15} {'JobReadSerializer':>18} {'speedup':>8}")
+            for size in sizes:
+                def slow():
+                    return JobSerializer(list(queryset[:size]), many=True, context=context).data
+
+                def fast():
+                    return JobReadSerializer(list(JobReadSerializer.values(queryset)[:size]), context=context).data
+
+                self.check_same_output(slow(), fast())
+                slow_ms = self.best_of(slow, options['repeat'])
+                fast_ms = self.best_of(fast, options['repeat'])
+                self.stdout.write(f'{size:>6} {slow_ms:>12.2f} ms {fast_ms:>15.2f} ms {slow_ms / fast_ms:>7.1f}x')
+
+            transaction.set_rollback(True)
+
+    def best_of(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
+
+    def check_same_output(self, expected, actual):
+        # relative_created_at may tick over between the two runs, compare the rest
+        encoder = JSONEncoder()
+        for row in expected + actual:
+            row.pop('relative_created_at')
+        if json.loads(encoder.encode(expected)) != json.loads(encoder.encode(actual)):
+            raise CommandError('JobReadSerializer output differs from JobSerializer.')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from app.images import IMAGE_FIELDS, generate_image_variants, variants_are_current
+from app.models import Job, Profile
+
+
+MODELS = {'job': Job, 'profile': Profile}
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the thumbnail and WebP variants of existing job logos and profile avatars. '
+        'Rows whose variants are already up to date are skipped unless --force is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append',
+                            help='Only process this model (repeatable). Default: all.')
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that look current.')
+
+    def handle(self, *args, **options):
+        for name in options['model'] or sorted(MODELS):
+            model = MODELS[name]
+            field_name, variants_field = IMAGE_FIELDS[model]
+            counts = {}
+            rows = model.objects.values_list('pk', field_name, variants_field).order_by('pk')
+            for pk, file_name, variants in rows.iterator():
+                if not options['force'] and variants_are_current(file_name, variants):
+                    outcome = 'current'
+                else:
+                    outcome = generate_image_variants(model, pk, force=options['force'])
+                counts[outcome] = counts.get(outcome, 0) + 1
+                if outcome == 'failed':
+                    self.stderr.write(f'{name} {pk}: could not read {file_name}')
+            summary = ', '.join(f'{outcome} {count}' for outcome, count in sorted(counts.items())) or 'no rows'
+            self.stdout.write(f'{name}: {summary}')
@@ -0,0 +1,189 @@
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Job, Profile, RecentJob, ResumeText, SavedJob
+from app.seed import create_jobs
+
+
+# (label, url, needs_auth) for every list endpoint and the filter shapes clients send
+ENDPOINT_SHAPES = [
+    ('jobsf', '/api/jobsf/', False),
+    ('jobsf deep page', '/api/jobsf/?page=50', False),
+    ('jobsf job_type', '/api/jobsf/?job_type=remote', False),
+    ('jobsf job_type multi', '/api/jobsf/?job_type=remote&job_type=hybrid', False),
+    ('jobsf currency', '/api/jobsf/?currency=Доллар', False),
+    ('jobsf location', '/api/jobsf/?location=Almaty', False),
+    ('jobsf salary', '/api/jobsf/?salary=1000', False),
+    ('jobsf min_salary', '/api/jobsf/?min_salary=500000', False),
+    ('jobsf salary range', '/api/jobsf/?min_salary=300000&max_salary=600000', False),
+    ('jobsf salary ordering', '/api/jobsf/?ordering=-salary&page=5', False),
+    ('jobsf salary ordering range', '/api/jobsf/?ordering=salary&min_salary=1000000', False),
+    ('jobsf publish_time', '/api/jobsf/?publish_time=week}', False),
+    ('jobsf combined', '/api/jobsf/?job_type=office&currency=Теңге&min_salary=300000&publish_time=month}', False),
+    ('jobsf search', '/api/jobsf/?search=python', False),
+    ('jobsf cursor', '/api/jobsf/?pagination=cursor&with_count=true', False),
+    ('jobsf cursor job_type', '/api/jobsf/?pagination=cursor&job_type=remote', False),
+    ('jobsf facets job_type', '/api/jobsf/facets/?job_type=remote', False),
+    ('jobsf facets combined', '/api/jobsf/facets/?job_type=office&currency=Теңге&min_salary=300000', False),
+    ('jobs stream', '/api/jobs/?stream=ndjson&currency=Евро', False),
+    ('saved-jobs', '/api/saved-jobs/', True),
+    ('recent-jobs', '/api/recent-jobs/', True),
+    ('candidates', '/api/candidates/', True),
+    ('candidates search', '/api/candidates/?search=python', True),
+]
+
+CANDIDATES = 2000
+
+# (label, start of the statement) -> why that statement reads a whole table or index on purpose
+FULL_SCAN_ALLOWED = {
+    ('jobs', 'SELECT'): 'unpaginated export of every job',
+    ('jobsf', 'SELECT COUNT(*)'): 'page count of the unfiltered list',
+    ('jobsf deep page', 'SELECT COUNT(*)'): 'page count of the unfiltered list',
+    ('jobsf cursor', 'SELECT COUNT(*)'): '?with_count asks for the count of every job',
+    ('jobsf facets job_type', 'SELECT "app_job"."job_type"'): 'facet counts over every job',
+    ('jobsf facets job_type', 'SELECT "app_job"."currency"'): 'facet counts over a third of the jobs',
+    ('jobsf facets job_type', 'SELECT "app_job"."location"'): 'facet counts over a third of the jobs',
+    ('jobsf facets combined', 'SELECT "app_job"."job_type"'): 'facet counts, in index order instead of a sort',
+    ('jobsf facets combined', 'SELECT "app_job"."currency"'): 'facet counts, in index order instead of a sort',
+    ('jobsf facets combined', 'SELECT "app_job"."location"'): 'facet counts, in index order instead of a sort',
+    ('candidates', 'SELECT COUNT(*)'): 'page count of every candidate',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN for the SQL behind every list endpoint on a seeded '
+        'database and fail if any of it reads a whole table or index, unless FULL_SCAN_ALLOWED '
+        'lists that statement. '
+        'The seed data is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=5000, help='Synthetic jobs to seed (0 to use existing data).')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN checks are only implemented for SQLite.')
+
+        failures = []
+        with transaction.atomic(using=using):
+            self.seed(options['jobs'], options['seed'], using)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for label, url, queries in self.capture_queries(connection):
+                seen = set()
+                for sql, params in queries:
+                    # N+1 loops repeat the same statement, explain it once
+                    if sql in seen:
+                        continue
+                    seen.add(sql)
+                    plan = self.explain(connection, sql, params)
+                    scans = [detail for detail in plan if self.is_full_scan(detail, sql, plan)]
+                    allowed = self.allowed(label, sql)
+                    if scans and not allowed:
+                        failures.append((label, sql, scans))
+                        status = self.style.ERROR('FULL SCAN')
+                    elif scans:
+                        status = self.style.WARNING(f'full scan allowed: {allowed}')
+                    else:
+                        status = self.style.SUCCESS('ok')
+                    self.stdout.write(f'[{label}] {status}')
+                    self.stdout.write(f'    {sql}')
+                    for detail in plan:
+                        self.stdout.write(f'      {detail}')
+
+            transaction.set_rollback(True, using=using)
+
+        if failures:
+            raise CommandError(
+                f'{len(failures)} queries fall back to a full scan: '
+                + ', '.join(sorted({label for label, _, _ in failures}))
+            )
+        self.stdout.write(self.style.SUCCESS('No unexpected full scans.'))
+
+    def seed(self, jobs, seed, using):
+        rng = random.Random(seed)
+        if jobs:
+            # Dated back from today, so ?publish_time= matches as much as it would in production
+            create_jobs(jobs, rng, using=using, now=timezone.now())
+
+        # Several users so per-user lookups look as selective as in production
+        users = User.objects.db_manager(using).bulk_create(
+            # The first one is staff, for candidate search
+            User(username=f'query-plan-check-{i}', email=f'query-plan-check-{i}@example.com', is_staff=i == 0)
+            for i in range(20)
+        )
+        self.user = users[0]
+        job_ids = list(Job.objects.using(using).values_list('id', flat=True)[:500])
+        for user in users:
+            SavedJob.objects.using(using).bulk_create(
+                SavedJob(user=user, job_id=job_id) for job_id in rng.sample(job_ids, min(len(job_ids), 25))
+            )
+            RecentJob.objects.using(using).bulk_create(
+                RecentJob(user=user, job_id=job_id) for job_id in rng.sample(job_ids, min(len(job_ids), 100))
+            )
+        # And enough candidates that a search matches a small part of them
+        users += User.objects.db_manager(using).bulk_create(
+            User(username=f'query-plan-candidate-{i}', email=f'query-plan-candidate-{i}@example.com')
+            for i in range(CANDIDATES)
+        )
+        profiles = Profile.objects.db_manager(using).bulk_create(Profile(user=user) for user in users)
+        ResumeText.objects.using(using).bulk_create(
+            ResumeText(profile=profile, sha256=f'{profile.pk:064x}',
+                       text=f'{rng.choice(["Python", "Go", "Java", "Swift", "Kotlin", "SQL"])} developer')
+            for profile in profiles
+        )
+
+    def capture_queries(self, connection):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        client = Client()
+        shapes = ENDPOINT_SHAPES + [('jobs', '/api/jobs/', False)]
+
+        for label, url, needs_auth in shapes:
+            queries = []
+
+            def collect(execute, sql, params, many, context):
+                if sql.lstrip().upper().startswith('SELECT'):
+                    queries.append((sql, params))
+                return execute(sql, params, many, context)
+
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if needs_auth else {}
+            with override_settings(JOB_LIST_CACHE_ENABLED=False), connection.execute_wrapper(collect):
+                response = client.get(url, **headers)
+                # Drain streaming responses so their queries run too
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            yield label, url, queries
+
+    def allowed(self, label, sql):
+        for (allowed_label, start), reason in FULL_SCAN_ALLOWED.items():
+            if label == allowed_label and sql.startswith(start):
+                return reason
+        return None
+
+    def explain(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[3] for row in cursor.fetchall()]
+
+    def is_full_scan(self, detail, sql, plan):
+        """True for a pass over a whole table or index ("SCAN app_job ..."); FTS5 virtual tables are fine."""
+        if not detail.startswith('SCAN ') or 'VIRTUAL TABLE' in detail:
+            return False
+        # Walking an index in ORDER BY order stops after LIMIT rows, unless everything is sorted first
+        bounded = ' LIMIT ' in sql and 'USING ' in detail and 'USE TEMP B-TREE FOR ORDER BY' not in plan
+        return not bounded
@@ -0,0 +1,42 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from app.models import Profile
+from app.resumes import adopt_file, is_stored, recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Move resumes uploaded before content-addressed storage into it (one file per distinct '
+        'content), recount the references and delete stored files no profile uses. '
+        'Old files left in media/resumes/ are listed, and deleted with --delete-orphans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Delete files directly under resumes/ that no profile points at.')
+
+    def handle(self, *args, **options):
+        adopted = failed = 0
+        profiles = Profile.objects.exclude(resume='').exclude(resume__isnull=True).only('resume').order_by('pk')
+        for profile in profiles.iterator():
+            if is_stored(profile.resume.name):
+                continue
+            resume = adopt_file(profile.resume.name)
+            if resume is None:
+                failed += 1
+                self.stderr.write(f'profile {profile.pk}: could not read {profile.resume.name}')
+                continue
+            profile.resume = resume.file.name
+            profile.save(update_fields=['resume', 'updated_at'])
+            adopted += 1
+        deleted = recount()
+        self.stdout.write(f'Adopted {adopted} resumes ({failed} unreadable), deleted {len(deleted)} unused stored files.')
+
+        referenced = set(Profile.objects.exclude(resume__isnull=True).values_list('resume', flat=True))
+        _, files = default_storage.listdir('resumes') if default_storage.exists('resumes') else ([], [])
+        orphans = [f'resumes/{name}' for name in sorted(files) if f'resumes/{name}' not in referenced]
+        for name in orphans:
+            if options['delete_orphans']:
+                default_storage.delete(name)
+            self.stdout.write(f'{"deleted" if options["delete_orphans"] else "orphan"}: {name}')
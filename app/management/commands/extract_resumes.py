@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Profile
+from app.resume_text import extract_profile_resume
+
+
+class Command(BaseCommand):
+    help = (
+        'Extract the text and skills of profile resumes for candidate search. Resumes whose '
+        'content hash matches the stored text are skipped unless --force is given (e.g. after '
+        'new skills appeared in jobs).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Extract again even if the file is unchanged.')
+
+    def handle(self, *args, **options):
+        counts = {}
+        profile_ids = Profile.objects.exclude(resume='').exclude(resume__isnull=True).order_by('pk').values_list('pk', flat=True)
+        for profile_id in profile_ids.iterator():
+            outcome = extract_profile_resume(profile_id, force=options['force'])
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome == 'failed':
+                self.stderr.write(f'profile {profile_id}: could not extract the resume text')
+        self.stdout.write(', '.join(f'{outcome} {count}' for outcome, count in sorted(counts.items())) or 'No resumes.')
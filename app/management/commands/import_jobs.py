@@ -0,0 +1,49 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.ingest import FORMATS, detect_format, import_jobs, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import jobs from an NDJSON or CSV file, reporting rows per second and per-row errors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to csv for *.csv files, ndjson otherwise.')
+        parser.add_argument('--batch-size', type=int, default=settings.JOB_IMPORT_BATCH_SIZE)
+        parser.add_argument('--report', help='Write the full JSON report (including the listed row errors) here.')
+        parser.add_argument('--max-errors', type=int, default=settings.JOB_IMPORT_MAX_ERRORS,
+                            help='Row errors kept in the report; the rest are only counted.')
+        parser.add_argument('--show-errors', type=int, default=20, help='Row errors to print.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or detect_format(filename=path)
+
+        if path == '-':
+            report = import_jobs(parse_rows(sys.stdin.buffer, data_format), batch_size=options['batch_size'],
+                                 max_errors=options['max_errors'])
+        else:
+            try:
+                with open(path, 'rb') as feed:
+                    report = import_jobs(parse_rows(feed, data_format), batch_size=options['batch_size'],
+                                         max_errors=options['max_errors'])
+            except OSError as exc:
+                raise CommandError(exc)
+
+        if options['report']:
+            with open(options['report'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+        for error in report['errors'][:options['show_errors']]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        if report['failed'] > options['show_errors']:
+            self.stderr.write(f"... {report['failed'] - options['show_errors']} more row errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['total']} rows ({report['failed']} failed) "
+            f"in {report['seconds']}s, {report['rows_per_second']} rows/s."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from app.models import Job
+from app.search import ensure_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for jobs from the app_job table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not ensure_search_index(using, rebuild=True):
+            raise CommandError(f"Database '{using}' does not support the FTS5 search index.")
+        count = Job.objects.using(using).count()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {count} jobs.'))
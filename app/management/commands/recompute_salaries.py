@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.models import Job
+from app.salary import recompute_salaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute Job.salary_base from the CurrencyRate table (after editing rates by hand).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--currency', action='append', choices=[currency for currency, _ in Job.CURRENCY],
+                            help='Only this currency (repeatable); all of them by default.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = recompute_salaries(options['currency'])
+        self.stdout.write(f'Recomputed the base salary of {count} jobs in {time.perf_counter() - started:.2f}s.')
@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.tasks import Worker
+
+
+def work(poll_interval, burst):
+    worker = Worker(poll_interval)
+    # Finish the task at hand, then exit
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(burst=burst)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks (app/tasks.py) in a pool of worker processes, '
+        'queueing periodic tasks as they come due. SIGTERM or Ctrl-C stops the workers '
+        'after their current task.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Worker processes (default: TASK_WORKER_PROCESSES); 1 runs in this process.')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to sleep when there is nothing to do (default: TASK_POLL_INTERVAL).')
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due.')
+
+    def handle(self, *args, **options):
+        processes = options['processes'] or getattr(settings, 'TASK_WORKER_PROCESSES', 2)
+        poll_interval = options['poll_interval']
+        if processes == 1:
+            work(poll_interval, options['burst'])
+            return
+
+        # Children must open their own connections
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=work, args=(poll_interval, options['burst']), name=f'run_tasks-{number}')
+            for number in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Started {processes} task workers.')
+
+        def forward(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()  # SIGTERM: they stop after the current task
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for worker in workers:
+            worker.join()
+        failed = [worker.name for worker in workers if worker.exitcode]
+        if failed:
+            self.stderr.write(f'Workers exited with errors: {", ".join(failed)}')
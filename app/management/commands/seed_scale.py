@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app.models import Job
+from app.seed import SEED_EPOCH, SEED_PASSWORD, create_jobs, create_users, seed_email
+
+# Emails of the users a previous run created (seed_email)
+SEEDED_EMAIL = r'^user[0-9]+@example\.com$'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with production-sized synthetic data: jobs in every currency, '
+        'users with profiles, work experience, education, saved and recently viewed jobs. '
+        'The same --seed and --epoch always produce the same rows. Meant for an empty benchmark database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2_000_000)
+        parser.add_argument('--users', type=int, default=200_000)
+        parser.add_argument('--saved-per-user', type=int, default=10)
+        parser.add_argument('--recent-per-user', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--epoch', default=SEED_EPOCH.isoformat(),
+                            help='ISO datetime the generated timestamps count back from, or "now".')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--force', action='store_true',
+                            help='Seed even if the database already has jobs; replaces the users seeded before.')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        now = self.parse_epoch(options['epoch'])
+        if not options['force'] and (
+            Job.objects.using(using).exists() or User.objects.using(using).filter(email=seed_email(0)).exists()
+        ):
+            raise CommandError('The database already has data; use an empty one or pass --force.')
+
+        if options['force']:
+            # Their emails are unique, so the users are replaced rather than added again
+            deleted = User.objects.using(using).filter(email__regex=SEEDED_EMAIL).delete()[1].get('auth.User', 0)
+            if deleted:
+                self.stdout.write(f'Deleted {deleted} users seeded before.')
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+
+        def progress(label, total):
+            def report(done):
+                if done == total or done % (batch_size * 20) == 0:
+                    rate = done / (time.perf_counter() - started)
+                    self.stdout.write(f'  {label}: {done}/{total} ({rate:,.0f}/s)')
+            return report
+
+        create_jobs(options['jobs'], rng, batch_size=batch_size, using=using,
+                    progress=progress('jobs', options['jobs']), now=now)
+        self.stdout.write(f'Created {options["jobs"]} jobs in {time.perf_counter() - started:.1f}s.')
+
+        started = time.perf_counter()
+        job_ids = list(Job.objects.using(using).order_by('id').values_list('id', flat=True))
+        users = options['users']
+        create_users(users, rng, job_ids, options['saved_per_user'], options['recent_per_user'],
+                     batch_size=max(1, batch_size // 10), using=using, progress=progress('users', users), now=now)
+        self.stdout.write(
+            f'Created {users} users with profiles and history in {time.perf_counter() - started:.1f}s. '
+            f'They log in as {seed_email(0)} ... {seed_email(users - 1)} with password "{SEED_PASSWORD}".'
+        )
+        self.stdout.write('Run refresh_recommendations to build their recommended jobs.')
+
+    def parse_epoch(self, value):
+        if value == 'now':
+            return timezone.now()
+        epoch = parse_datetime(value)
+        if epoch is None:
+            raise CommandError(f'--epoch must be an ISO datetime or "now", not {value!r}.')
+        return epoch if timezone.is_aware(epoch) else epoch.replace(tzinfo=dt_timezone.utc)
@@ -0,0 +1,29 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import CurrencyRate, Job
+from app.salary import get_base_currency
+
+
+class Command(BaseCommand):
+    help = 'Set what one unit of a currency is worth in SALARY_BASE_CURRENCY and reconvert its jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('currency', choices=[currency for currency, _ in Job.CURRENCY])
+        parser.add_argument('rate')
+
+    def handle(self, *args, **options):
+        currency = options['currency']
+        if currency == get_base_currency():
+            raise CommandError(f'{currency} is the base currency, its rate is always 1.')
+        try:
+            rate = Decimal(options['rate'])
+        except InvalidOperation:
+            raise CommandError(f'Invalid rate: {options["rate"]}')
+        if not rate.is_finite() or rate <= 0:
+            raise CommandError('The rate must be a positive number.')
+
+        # post_save reconverts the salaries of that currency's jobs (see app/signals.py)
+        CurrencyRate.objects.update_or_create(currency=currency, defaults={'rate': rate})
+        self.stdout.write(f'1 {currency} = {rate} {get_base_currency()}.')
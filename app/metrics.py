@@ -0,0 +1,343 @@
+"""Per-endpoint request metrics in the Prometheus text format.
+
+``RequestMetricsMiddleware`` records for every request, labelled by URL
+route (``api/jobsf/``, ``api/saved-jobs/<int:job_id>/``, ...):
+
+* latency and response size histograms,
+* SQL queries and time spent in them (an execute wrapper on every connection),
+* time spent building response data in serializers (every DRF
+  serializer's ``.data`` and the fast read serializers) and rendering the
+  response.
+
+``/metrics`` serves them to Prometheus from loopback addresses
+(``METRICS_ALLOWED_IPS``), together with the task queue's depth and
+per-task totals (``app/tasks.py``). Those two take a query each against
+the shared Task tables, so a scrape reuses them for
+``METRICS_TASK_STATS_TTL`` seconds. Statements slower than
+``SLOW_QUERY_THRESHOLD_MS`` are logged with their route.
+
+With ``METRICS_ENABLED = False`` the middleware removes itself at startup
+(MiddlewareNotUsed), DRF's serializers are left unwrapped and ``timed()``
+is a shared no-op, so nothing is paid per request. Request numbers are per process: scrape every worker, or sum them.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.serializers import BaseSerializer
+
+from .cache import cache_stats
+from .models import TaskStat
+from .tasks import queue_stats
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_no_timer = nullcontext()
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.responses = {}  # (method, status) -> count
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.render_seconds = 0.0
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.slow_queries = 0
+        self.task_stats = None  # (monotonic time, queue_stats(), TaskStat rows)
+
+    def record(self, route, method, status, stats, elapsed, size):
+        with self.lock:
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics()
+            key = (method, status)
+            metrics.responses[key] = metrics.responses.get(key, 0) + 1
+            metrics.latency.observe(elapsed)
+            if size is not None:
+                metrics.size.observe(size)
+            metrics.queries += stats.queries
+            metrics.query_seconds += stats.query_seconds
+            metrics.serializer_seconds += stats.serializer_seconds
+            metrics.render_seconds += stats.render_seconds
+            self.slow_queries += stats.slow_queries
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.slow_queries = 0
+            self.task_stats = None
+
+    def get_task_stats(self):
+        """The task queue's depth and totals, read at most once per METRICS_TASK_STATS_TTL seconds."""
+        ttl = getattr(settings, 'METRICS_TASK_STATS_TTL', 10)
+        cached = self.task_stats
+        if cached is None or time.monotonic() - cached[0] >= ttl:
+            cached = self.task_stats = (time.monotonic(), queue_stats(), list(TaskStat.objects.order_by('name')))
+        return cached[1], cached[2]
+
+    def render(self):
+        """The registry in the Prometheus text exposition format (0.0.4)."""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+            family('app_http_requests_total', 'counter', 'Responses by route, method and status.')
+            for route, metrics in routes:
+                for (method, status), count in sorted(metrics.responses.items()):
+                    lines.append(f'app_http_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+            for name, attribute, help_text in (
+                ('app_http_request_duration_seconds', 'latency', 'Time from the first middleware to the response.'),
+                ('app_http_response_size_bytes', 'size', 'Response body size (streamed responses are not counted).'),
+            ):
+                family(name, 'histogram', help_text)
+                for route, metrics in routes:
+                    histogram = getattr(metrics, attribute)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{route="{route}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{route="{route}"}} {cumulative}')
+
+            for name, attribute, help_text in (
+                ('app_db_queries_total', 'queries', 'SQL statements executed.'),
+                ('app_db_query_seconds_total', 'query_seconds', 'Time spent executing SQL.'),
+                ('app_serializer_seconds_total', 'serializer_seconds', 'Time spent building response data in serializers.'),
+                ('app_render_seconds_total', 'render_seconds', 'Time spent rendering DRF responses.'),
+            ):
+                family(name, 'counter', help_text)
+                for route, metrics in routes:
+                    lines.append(f'{name}{{route="{route}"}} {getattr(metrics, attribute)}')
+
+            family('app_db_slow_queries_total', 'counter', 'SQL statements above SLOW_QUERY_THRESHOLD_MS.')
+            lines.append(f'app_db_slow_queries_total {self.slow_queries}')
+
+        stats = cache_stats()
+        family('app_response_cache_total', 'counter', 'Response cache lookups by result.')
+        lines.append(f'app_response_cache_total{{result="hit"}} {stats["hits"]}')
+        lines.append(f'app_response_cache_total{{result="miss"}} {stats["misses"]}')
+
+        # The task queue is shared by every process, so these come from the database
+        queue, totals = self.get_task_stats()
+        family('app_task_queue_depth', 'gauge', 'Queued tasks by name and state (ready, scheduled, running).')
+        for name, depth in sorted(queue.items()):
+            for state in ('ready', 'scheduled', 'running'):
+                lines.append(f'app_task_queue_depth{{task="{name}",state="{state}"}} {depth[state]}')
+        family('app_task_oldest_ready_seconds', 'gauge', 'How long the oldest task that is due has waited.')
+        for name, depth in sorted(queue.items()):
+            lines.append(f'app_task_oldest_ready_seconds{{task="{name}"}} {depth["oldest_ready_seconds"]}')
+        family('app_tasks_total', 'counter', 'Task attempts by outcome (succeeded, failed, retried).')
+        for stat in totals:
+            for outcome in ('succeeded', 'failed', 'retried'):
+                lines.append(f'app_tasks_total{{task="{stat.name}",outcome="{outcome}"}} {getattr(stat, outcome)}')
+        for name, attribute, help_text in (
+            ('app_task_wait_seconds_total', 'wait_seconds', 'Time tasks spent due but not started.'),
+            ('app_task_run_seconds_total', 'run_seconds', 'Time spent running tasks.'),
+        ):
+            family(name, 'counter', help_text)
+            for stat in totals:
+                lines.append(f'{name}{{task="{stat.name}"}} {getattr(stat, attribute)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """What one request spent; lives in a context variable while the request runs."""
+
+    def __init__(self, route_getter, slow_threshold):
+        self.route_getter = route_getter
+        self.slow_threshold = slow_threshold
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.render_seconds = 0.0
+        self.slow_queries = 0
+        self.view_done = None
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.query_seconds += elapsed
+            if self.slow_threshold is not None and elapsed * 1000 >= self.slow_threshold:
+                self.slow_queries += 1
+                logger.warning('Slow query (%.1f ms) on %s: %s', elapsed * 1000, self.route_getter(), sql)
+
+
+class _Timer:
+    __slots__ = ('stats', 'started')
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.stats.serializing = True
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.stats.serializer_seconds += time.perf_counter() - self.started
+        self.stats.serializing = False
+
+
+def timed():
+    """Context manager adding its duration to the current request's serializer time.
+
+    Nested uses (a serializer reading another one's ``.data``) are counted once.
+    """
+    stats = _current.get()
+    return _no_timer if stats is None or stats.serializing else _Timer(stats)
+
+
+def time_serializers():
+    """Count the time in every DRF serializer's ``.data`` as serializer time.
+
+    Serializer and ListSerializer both build their data in BaseSerializer.data.
+    """
+    build_data = BaseSerializer.data.fget
+    if getattr(build_data, 'timed', False):
+        return
+
+    def data(self):
+        with timed():
+            return build_data(self)
+    data.timed = True
+    BaseSerializer.data = property(data)
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None and match.route else 'unmatched'
+
+
+def count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.execute(execute, sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver: count the queries of every connection for the request running them.
+
+    Installed on the connections rather than per request: the async ORM
+    runs its queries on a thread's connection, which the request's context
+    (and so its stats) is carried to.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def mark_view_done():
+    stats = _current.get()
+    if stats is not None:
+        stats.view_done = time.perf_counter()
+
+
+class RequestMetricsMiddleware:
+    # Under ASGI it stays async, so it doesn't push the rest of the chain onto a thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        time_serializers()
+        self.get_response = get_response
+        self.slow_threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 200)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The handler runs sync hooks of an async chain in a thread
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats(lambda: route_of(request), self.slow_threshold)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats(lambda: route_of(request), self.slow_threshold)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats, started)
+
+    def record(self, request, response, stats, started):
+        finished = time.perf_counter()
+        if stats.view_done is not None:
+            # DRF responses are rendered between process_template_response and here
+            stats.render_seconds = finished - stats.view_done
+        size = None if response.streaming else len(response.content)
+        registry.record(route_of(request), request.method, response.status_code, stats, finished - started, size)
+        return response
+
+    def process_template_response(self, request, response):
+        mark_view_done()
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        mark_view_done()
+        return response
+
+
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
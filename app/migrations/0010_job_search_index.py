@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from app.search import ensure_search_index
+    ensure_search_index(schema_editor.connection.alias, rebuild=True)
+
+
+def drop_search_index(apps, schema_editor):
+    from app.search import drop_search_index
+    drop_search_index(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_rename_currenct_job_currency'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
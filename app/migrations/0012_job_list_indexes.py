@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_job_created_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['job_type', '-created_at', '-id'], name='job_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['currency', '-created_at', '-id'], name='job_currency_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['location', '-created_at', '-id'], name='job_location_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['salary'], name='job_salary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recentjob',
+            index=models.Index(fields=['user', '-viewed_at', 'job'], name='recentjob_user_viewed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recentjob',
+            index=models.Index(fields=['user', 'job'], name='recentjob_user_job_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedjob',
+            index=models.Index(fields=['user', '-saved_at', 'job'], name='savedjob_user_saved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedjob',
+            index=models.Index(fields=['user', 'job'], name='savedjob_user_job_idx'),
+        ),
+    ]
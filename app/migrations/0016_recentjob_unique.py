@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_recent_jobs(apps, schema_editor):
+    # Keep the newest row of each (user, job) before it becomes unique
+    RecentJob = apps.get_model('app', 'RecentJob')
+    db = schema_editor.connection.alias
+    duplicates = (
+        RecentJob.objects.using(db).values('user_id', 'job_id')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = RecentJob.objects.using(db).filter(user_id=group['user_id'], job_id=group['job_id'])
+        latest = rows.order_by('-viewed_at', '-id').first()
+        rows.exclude(id=latest.id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_recommended_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_recent_jobs, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='recentjob',
+            name='recentjob_user_job_idx',
+        ),
+        migrations.AlterField(
+            model_name='recentjob',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='recentjob',
+            constraint=models.UniqueConstraint(fields=('user', 'job'), name='recentjob_user_job_uniq'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Round
+
+
+def convert_salaries(apps, schema_editor):
+    """Store the SALARY_DEFAULT_RATES and convert the salaries they cover.
+
+    Jobs in a currency without a rate keep a NULL salary_base until one is
+    set with ``manage.py set_currency_rate``.
+    """
+    CurrencyRate = apps.get_model('app', 'CurrencyRate')
+    Job = apps.get_model('app', 'Job')
+    alias = schema_editor.connection.alias
+    base_currency = getattr(settings, 'SALARY_BASE_CURRENCY', 'Теңге')
+    rates = {base_currency: Decimal(1)}
+    for currency, rate in getattr(settings, 'SALARY_DEFAULT_RATES', {}).items():
+        if currency != base_currency:
+            rates[currency] = CurrencyRate.objects.using(alias).get_or_create(
+                currency=currency, defaults={'rate': Decimal(str(rate))},
+            )[0].rate
+    for currency, rate in rates.items():
+        Job.objects.using(alias).filter(currency=currency).update(
+            salary_base=Round(F('salary') * Value(rate, output_field=DecimalField()), 2),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_recentjob_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('Теңге', 'Tenge'), ('Доллар', 'Dollar'), ('Евро', 'Euro')], max_length=10, unique=True)),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_base',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=16, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['salary_base', 'id'], name='job_salary_base_idx'),
+        ),
+        migrations.RunPython(convert_salaries, migrations.RunPython.noop),
+    ]
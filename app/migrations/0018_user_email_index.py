@@ -0,0 +1,54 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def duplicate_placeholder(user_id, email):
+    # Unique (it carries the id), kept within the column, and the old address is still there to restore
+    return f'dup-{user_id}+{email}'[:254]
+
+
+def dedupe_emails(apps, schema_editor):
+    """Lower-case every email; where that makes two accounts share one, only the most recently active keeps it.
+
+    The others get ``dup-<id>+<their email>``, which an admin can find with
+    ``email__startswith='dup-'`` and sort out.
+    """
+    User = apps.get_model('auth', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    owners = set()
+    duplicates, normalized = [], []
+    rows = users.exclude(email='').order_by(F('last_login').desc(nulls_last=True), '-date_joined', '-id')
+    for user_id, email in rows.values_list('id', 'email').iterator(chunk_size=5000):
+        value = email.strip().lower()
+        if value in owners:
+            duplicates.append((user_id, duplicate_placeholder(user_id, email)))
+        else:
+            owners.add(value)
+            if value != email:
+                normalized.append((user_id, value))
+    # Placeholders first, so no normalized address meets the one it duplicated
+    for user_id, value in duplicates + normalized:
+        users.filter(id=user_id).update(email=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_salary_base'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_emails, migrations.RunPython.noop),
+        # auth_user belongs to django.contrib.auth, so the indexes are plain SQL.
+        # Blank emails (e.g. createsuperuser without one) may repeat; a partial
+        # index can't serve "email = ?" on SQLite, hence the separate lookup index.
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_uniq ON auth_user (email) WHERE email <> ''",
+            'DROP INDEX auth_user_email_uniq',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_email_idx ON auth_user (email)',
+            'DROP INDEX auth_user_email_idx',
+        ),
+    ]
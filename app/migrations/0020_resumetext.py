@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_resume_index(apps, schema_editor):
+    from app.search import RESUME_INDEX, ensure_search_index
+    ensure_search_index(schema_editor.connection.alias, rebuild=True, indexes=[RESUME_INDEX])
+
+
+def drop_resume_index(apps, schema_editor):
+    from app.search import RESUME_INDEX, drop_search_index
+    drop_search_index(schema_editor.connection.alias, indexes=[RESUME_INDEX])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_resumefile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeText',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resume_text', serialize=False, to='app.profile')),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('text', models.TextField(blank=True)),
+                ('skills', models.JSONField(default=list)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['extracted_at'], name='resumetext_extracted_idx')],
+            },
+        ),
+        migrations.RunPython(create_resume_index, drop_resume_index),
+    ]
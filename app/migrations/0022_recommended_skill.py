@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_skills(apps, schema_editor):
+    """Skill rows for the lists computed before this migration."""
+    RecommendedJobs = apps.get_model('app', 'RecommendedJobs')
+    RecommendedSkill = apps.get_model('app', 'RecommendedSkill')
+    alias = schema_editor.connection.alias
+    batch = []
+    for recommendation_id, skills in RecommendedJobs.objects.using(alias).values_list('id', 'skills').iterator(chunk_size=1000):
+        batch.extend(RecommendedSkill(recommendation_id=recommendation_id, skill=skill)
+                     for skill in set(skills or []) if len(skill) <= 255)
+        if len(batch) >= 5000:
+            RecommendedSkill.objects.using(alias).bulk_create(batch)
+            batch = []
+    RecommendedSkill.objects.using(alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendedSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill', models.CharField(max_length=255)),
+                ('recommendation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_rows', to='app.recommendedjobs')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('skill', 'recommendation'), name='recommendedskill_skill_uniq')],
+            },
+        ),
+        migrations.RunPython(index_skills, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,47 @@
 from django.db import models
+from django.db.models.fields.files import FieldFile
 from django.contrib.auth.models import User
+from django.utils import timezone
 from datetime import date
 from dateutil.relativedelta import relativedelta  # To calculate the difference in years and months
 from dateutil import relativedelta
 from datetime import datetime
+from functools import lru_cache
+import copy
 
-class Job(models.Model):
+
+class LoadedValuesMixin:
+    """Remembers the ``TRACKED_FIELDS`` values a row was loaded with, so signals can tell what a save changed."""
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_values()
+        return instance
+
+    def remember_values(self):
+        loaded = {}
+        for name in self.TRACKED_FIELDS:
+            # Deferred fields aren't loaded, and stay unknown
+            if name not in self.__dict__:
+                continue
+            value = self.__dict__[name]
+            # File names for files; copies of the rest, so edits made in place (jdata['skills'].append) show
+            loaded[name] = value.name if isinstance(value, FieldFile) else copy.deepcopy(value)
+        self._loaded_values = loaded
+
+    @property
+    def loaded_values(self):
+        """{field name: value when loaded or last saved}; empty for new instances."""
+        return getattr(self, '_loaded_values', {})
+
+    def has_changed(self, name, value):
+        """False only if ``value`` is what ``name`` held when loaded (or last saved)."""
+        return name not in self.loaded_values or self.loaded_values[name] != value
+
+
+class Job(LoadedValuesMixin, models.Model):
     JOB_TYPES = (
         ('hybrid', 'Hybrid'),
         ('remote', 'Remote'),
@@ -25,9 +61,32 @@ class Job(models.Model):
     description = models.TextField()
     salary = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Drives ETag/Last-Modified, see app/conditional.py
     jdata = models.JSONField(null=True, blank=True)  # Use JSONField instead of ArrayField
     logo = models.ImageField(upload_to='job_logos/', null=True, blank=True)  # Field for logo image
+    logo_variants = models.JSONField(null=True, blank=True, editable=False)  # Thumbnails/WebP, see app/images.py
     currency = models.CharField(max_length=10, choices=CURRENCY)
+    # salary converted to settings.SALARY_BASE_CURRENCY with CurrencyRate, see app/salary.py
+    salary_base = models.DecimalField(max_digits=16, decimal_places=2, null=True, blank=True, editable=False)
+
+    TRACKED_FIELDS = ('jdata', 'logo')
+
+    class Meta:
+        indexes = [
+            # Default list ordering and the (created_at, id) cursor keyset
+            models.Index(fields=['-created_at', '-id'], name='job_created_id_idx'),
+            # Equality filters of JobListView, each still served in list order
+            models.Index(fields=['job_type', '-created_at', '-id'], name='job_type_created_idx'),
+            models.Index(fields=['currency', '-created_at', '-id'], name='job_currency_created_idx'),
+            models.Index(fields=['location', '-created_at', '-id'], name='job_location_created_idx'),
+            # salary= exact filter
+            models.Index(fields=['salary'], name='job_salary_idx'),
+            # min_salary/max_salary ranges and ?ordering=salary, across currencies
+            models.Index(fields=['salary_base', 'id'], name='job_salary_base_idx'),
+            # MAX(updated_at) for conditional GETs on the unfiltered list
+            models.Index(fields=['updated_at'], name='job_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -37,6 +96,14 @@ class SavedJob(models.Model):
     job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='saved_by_users')
     saved_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Covers the per-user list (user, newest first) without touching the table
+            models.Index(fields=['user', '-saved_at', 'job'], name='savedjob_user_saved_idx'),
+            # get_or_create / delete by (user, job)
+            models.Index(fields=['user', 'job'], name='savedjob_user_job_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} saved {self.job.title}"
 
@@ -44,25 +111,144 @@ class SavedJob(models.Model):
 class RecentJob(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recent_jobs')
     job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='viewed_by_users')
-    viewed_at = models.DateTimeField(auto_now=True)
+    # Set by the caller: buffered views are written later with their original time (app/recent.py)
+    viewed_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-viewed_at']  # Show most recent jobs first
+        indexes = [
+            # Covers the per-user history in Meta.ordering order
+            models.Index(fields=['user', '-viewed_at', 'job'], name='recentjob_user_viewed_idx'),
+        ]
+        constraints = [
+            # One row per viewed job, the target of the bulk upsert
+            models.UniqueConstraint(fields=['user', 'job'], name='recentjob_user_job_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} viewed {self.job.title}"
 
 
 
-class Profile(models.Model):
+class CurrencyRate(models.Model):
+    """What one unit of ``currency`` is worth in settings.SALARY_BASE_CURRENCY."""
+    currency = models.CharField(max_length=10, choices=Job.CURRENCY, unique=True)
+    rate = models.DecimalField(max_digits=16, decimal_places=6)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"1 {self.currency} = {self.rate}"
+
+
+class ResumeFile(models.Model):
+    """An uploaded resume, stored once under the hash of its bytes (see app/resumes.py)."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='resumes/', max_length=150, unique=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    ref_count = models.PositiveIntegerField(default=0)  # Profiles whose resume this is
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.file.name} ({self.ref_count} refs)"
+
+
+class Task(models.Model):
+    """A call queued for ``manage.py run_tasks`` (see app/tasks.py)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)  # Dotted path of the function
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    priority = models.SmallIntegerField(default=0)  # Higher runs first
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)  # A worker that died lets go after this
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The claim query: pending work in priority order
+            models.Index(fields=['status', '-priority', 'run_at'], name='task_claim_idx'),
+            models.Index(fields=['idempotency_key', 'status'], name='task_key_idx'),
+        ]
+        constraints = [
+            # Enqueueing a key that is already waiting returns the waiting task
+            models.UniqueConstraint(fields=['idempotency_key'], condition=models.Q(status='pending'),
+                                    name='task_pending_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class TaskStat(models.Model):
+    """Running totals per task name, written by the workers and served at /metrics."""
+    name = models.CharField(max_length=200, unique=True)
+    succeeded = models.PositiveBigIntegerField(default=0)
+    failed = models.PositiveBigIntegerField(default=0)
+    retried = models.PositiveBigIntegerField(default=0)
+    wait_seconds = models.FloatField(default=0)  # From run_at to the start of each attempt
+    run_seconds = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class RecommendedJobs(models.Model):
+    """A user's precomputed best-matching jobs, kept current by app/recommend.py."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recommended_jobs')
+    skills = models.JSONField(default=list)  # Normalized profile skills the list was computed for
+    job_ids = models.JSONField(default=list)  # Best match first
+    scores = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{len(self.job_ids)} jobs recommended to {self.user.username}"
+
+
+class RecommendedSkill(models.Model):
+    """The skills of each RecommendedJobs list, indexed: whose lists a job with a given skill can enter."""
+    recommendation = models.ForeignKey(RecommendedJobs, on_delete=models.CASCADE, related_name='skill_rows')
+    skill = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['skill', 'recommendation'], name='recommendedskill_skill_uniq'),
+        ]
+
+    def __str__(self):
+        return self.skill
+
+
+class Profile(LoadedValuesMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     about_me = models.TextField(null=True, blank=True)
     skills = models.JSONField(null=True, blank=True)  # Store as JSON array of skills
     avatar = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    avatar_variants = models.JSONField(null=True, blank=True, editable=False)  # Thumbnails/WebP, see app/images.py
     job_title = models.CharField(max_length=100, null=True, blank=True)
     resume = models.FileField(upload_to='resumes/', null=True, blank=True)  # New resume field
+    updated_at = models.DateTimeField(auto_now=True)
+
+    TRACKED_FIELDS = ('skills', 'avatar', 'resume')
 
-    
     def __str__(self):
         return self.user.username
 
@@ -76,6 +262,44 @@ class Profile(models.Model):
         return None
 
 
+class ResumeText(models.Model):
+    """Text and skills extracted from a profile's resume (app/resume_text.py), indexed for candidate search."""
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, primary_key=True, related_name='resume_text')
+    sha256 = models.CharField(max_length=64, db_index=True)  # Of the file the text was extracted from
+    text = models.TextField(blank=True)
+    skills = models.JSONField(default=list)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Candidate list without a search: latest resumes first
+            models.Index(fields=['extracted_at'], name='resumetext_extracted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Resume text of {self.profile_id} ({len(self.text)} chars)"
+
+
+@lru_cache(maxsize=4096)
+def format_duration(start, end_date, today):
+    """"March 2020 - Current (4 years, 7 months)" for a work experience or education entry.
+
+    Memoized: the text only depends on the two dates and today's date, so a
+    profile read formats each distinct period once per day.
+    """
+    end = end_date or today  # Use current date if end_date is null
+
+    # Format the dates as "Month Year"
+    start_str = start.strftime("%B %Y")
+    end_str = end.strftime("%B %Y") if end_date else "Current"
+
+    # Calculate the difference in years and months
+    delta = relativedelta.relativedelta(end, start)
+    duration_str = f"{delta.years} year{'s' if delta.years != 1 else ''}, {delta.months} month{'s' if delta.months != 1 else ''}"
+
+    return f"{start_str} - {end_str} ({duration_str})"
+
+
 class WorkExperience(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='work_experiences')
     job_title = models.CharField(max_length=100)
@@ -83,23 +307,13 @@ class WorkExperience(models.Model):
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)  # End date can be null for current jobs
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.job_title} at {self.company}"
 
     def get_duration(self):
-        start = self.start_date
-        end = self.end_date or datetime.now().date()  # Use current date if end_date is null
-
-        # Format the dates as "Month Year"
-        start_str = start.strftime("%B %Y")
-        end_str = end.strftime("%B %Y") if self.end_date else "Current"
-
-        # Calculate the difference in years and months
-        delta = relativedelta.relativedelta(end, start)
-        duration_str = f"{delta.years} year{'s' if delta.years != 1 else ''}, {delta.months} month{'s' if delta.months != 1 else ''}"
-
-        return f"{start_str} - {end_str} ({duration_str})"
+        return format_duration(self.start_date, self.end_date, datetime.now().date())
 
 
 class Education(models.Model):
@@ -110,20 +324,10 @@ class Education(models.Model):
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
     description = models.TextField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.level_of_education} in {self.field_of_study} from {self.university_name}"
 
     def get_duration(self):
-        start = self.start_date
-        end = self.end_date or datetime.now().date()  # Use current date if end_date is null
-
-        # Format the dates as "Month Year"
-        start_str = start.strftime("%B %Y")
-        end_str = end.strftime("%B %Y") if self.end_date else "Current"
-
-        # Calculate the difference in years and months
-        delta = relativedelta.relativedelta(end, start)
-        duration_str = f"{delta.years} year{'s' if delta.years != 1 else ''}, {delta.months} month{'s' if delta.months != 1 else ''}"
-
-        return f"{start_str} - {end_str} ({duration_str})"
\ No newline at end of file
+        return format_duration(self.start_date, self.end_date, datetime.now().date())
\ No newline at end of file
@@ -0,0 +1,199 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def get_limit_offset(request, default_limit, max_limit):
+    """Read ``?limit=`` and ``?offset=``, clamping the limit to ``max_limit``."""
+    try:
+        limit = _positive_int(request.query_params['limit'], strict=True, cutoff=max_limit)
+    except (KeyError, ValueError):
+        limit = min(default_limit, max_limit)
+    try:
+        offset = _positive_int(request.query_params['offset'])
+    except (KeyError, ValueError):
+        offset = 0
+    return limit, offset
+
+
+class CountedQuerySet:
+    """Queryset stand-in with a count that was already awaited with acount()."""
+
+    def __init__(self, queryset, count):
+        self.queryset = queryset
+        self.ordered = queryset.ordered
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        return self.queryset[key]
+
+
+class JobPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+
+    def get_count(self):
+        # Django's Paginator caches the COUNT(*) it ran to build the page
+        return self.page.paginator.count
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, using acount() and async iteration."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(CountedQuerySet(queryset, await queryset.acount()), page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        return [row async for row in self.page.object_list]
+
+
+class JobCursorPagination(BasePagination):
+    """Keyset pagination over (created_at, id), newest first.
+
+    Each page is a single indexed range scan no matter how deep it is. The
+    total count costs a full COUNT(*) so it is only computed when asked for
+    with ``?with_count=true``.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'with_count'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get(cls.mode_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare(queryset, request)
+        if self.count_requested:
+            self.count = queryset.count()
+        return self.set_results(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare(queryset, request)
+        if self.count_requested:
+            self.count = await queryset.acount()
+        return self.set_results([row async for row in page_queryset])
+
+    def prepare(self, queryset, request):
+        """Parse the request and return the (lazy) queryset for this page.
+
+        Split from paginate_queryset so the async views can evaluate it with
+        the async ORM and then hand the rows to set_results().
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.count = None
+        self.count_requested = request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+        if self.cursor is None:
+            created_at, pk, self.reverse = None, None, False
+        else:
+            created_at, pk, self.reverse = self.cursor
+
+        if self.reverse:
+            queryset = queryset.order_by('created_at', 'id')
+            if created_at is not None:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+            if created_at is not None:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # One extra row tells us whether there is another page after this one
+        return queryset[:self.page_size + 1]
+
+    def set_results(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_count(self):
+        return self.count
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            direction, created_at, pk = raw.split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or direction not in ('n', 'p'):
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, direction == 'p'
+
+    def encode_cursor(self, item, reverse):
+        if isinstance(item, dict):
+            created_at, pk = item['created_at'], item['id']
+        else:
+            created_at, pk = item.created_at, item.pk
+        raw = f"{'p' if reverse else 'n'}|{created_at.isoformat()}|{pk}"
+        encoded = urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,158 @@
+"""Write-behind buffer for "recently viewed" tracking.
+
+Every job view used to be an ``update_or_create`` of its own: a SELECT plus
+a write transaction, each one taking SQLite's single write lock. Views are
+now collected in memory, de-duplicated per (user, job) keeping the latest
+time, and written every ``RECENT_JOBS_FLUSH_INTERVAL`` seconds (or once
+``RECENT_JOBS_FLUSH_SIZE`` views are pending) as one bulk upsert. After each
+flush the affected users' histories are trimmed to
+``RECENT_JOBS_HISTORY_LIMIT`` rows.
+
+Pending views are flushed at interpreter exit (a graceful worker shutdown),
+and a user's own pending views are flushed before their history is read.
+Views still buffered in *other* worker processes show up within one flush
+interval.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Job, RecentJob
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = {}  # (user_id, job_id) -> viewed_at
+_flusher = None
+_pid = None
+
+
+def buffering_enabled():
+    return getattr(settings, 'RECENT_JOBS_BUFFER_ENABLED', True)
+
+
+def get_history_limit():
+    return getattr(settings, 'RECENT_JOBS_HISTORY_LIMIT', 100)
+
+
+def record_view(user_id, job_id, viewed_at):
+    """Remember that ``user_id`` viewed ``job_id``; written on the next flush."""
+    if not buffering_enabled():
+        write_views({(user_id, job_id): viewed_at})
+        return
+    _ensure_flusher()
+    key = (user_id, job_id)
+    with _lock:
+        if key not in _pending or _pending[key] < viewed_at:
+            _pending[key] = viewed_at
+        full = len(_pending) >= getattr(settings, 'RECENT_JOBS_FLUSH_SIZE', 500)
+    if full:
+        flush()
+
+
+def pending_count():
+    with _lock:
+        return len(_pending)
+
+
+def flush(user_id=None):
+    """Write pending views (only ``user_id``'s if given). Returns the number written."""
+    with _lock:
+        if user_id is None:
+            views = dict(_pending)
+            _pending.clear()
+        else:
+            views = {key: value for key, value in _pending.items() if key[0] == user_id}
+            for key in views:
+                del _pending[key]
+    if not views:
+        return 0
+    try:
+        return write_views(views)
+    except Exception:
+        # Put them back (unless a newer view came in meanwhile) for the next attempt
+        with _lock:
+            for key, viewed_at in views.items():
+                if key not in _pending or _pending[key] < viewed_at:
+                    _pending[key] = viewed_at
+        raise
+
+
+def write_views(views):
+    """Upsert {(user_id, job_id): viewed_at} and trim the affected histories."""
+    user_ids = {user_id for user_id, _ in views}
+    job_ids = {job_id for _, job_id in views}
+    # Jobs or users deleted since the view would fail the foreign keys
+    job_ids &= set(Job.objects.filter(id__in=job_ids).values_list('id', flat=True))
+    user_ids &= set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    rows = [
+        RecentJob(user_id=user_id, job_id=job_id, viewed_at=viewed_at)
+        for (user_id, job_id), viewed_at in views.items()
+        if user_id in user_ids and job_id in job_ids
+    ]
+    if not rows:
+        return 0
+    with transaction.atomic():
+        RecentJob.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['user', 'job'], update_fields=['viewed_at'],
+        )
+        trim_history(user_ids)
+    return len(rows)
+
+
+def trim_history(user_ids, limit=None):
+    """Delete all but the newest ``limit`` rows of each user's history."""
+    limit = limit or get_history_limit()
+    overflow = RecentJob.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(RowNumber(), partition_by=F('user_id'), order_by=[F('viewed_at').desc(), F('id').desc()]),
+    ).filter(position__gt=limit).values_list('id', flat=True)
+    ids = list(overflow)
+    if ids:
+        RecentJob.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def _flush_periodically(interval, stop):
+    while not stop.wait(interval):
+        try:
+            flush()
+        except Exception:
+            logger.exception('Flushing recent job views failed, will retry')
+        finally:
+            connections.close_all()
+
+
+def _ensure_flusher():
+    global _flusher, _pid
+    if _pid == os.getpid():
+        return
+    with _lock:
+        if _pid == os.getpid():
+            return
+        # First view in this process (or in a forked worker): start the timer here
+        _pending.clear()
+        _pid = os.getpid()
+        interval = getattr(settings, 'RECENT_JOBS_FLUSH_INTERVAL', 5)
+        if interval:
+            stop = threading.Event()
+            _flusher = threading.Thread(
+                target=_flush_periodically, args=(interval, stop), name='recent-jobs-flusher', daemon=True,
+            )
+            _flusher.start()
+            atexit.register(stop.set)
+        atexit.register(_flush_at_exit)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not flush %d recent job views at exit', pending_count())
@@ -0,0 +1,457 @@
+"""Skill-based job recommendations.
+
+Jobs list their skills in ``jdata['skills']`` and profiles in
+``Profile.skills``. A :class:`SkillIndex` over all jobs maps every skill to
+the jobs that ask for it (an inverted index of NumPy arrays), so scoring a
+profile against every job only touches the postings of that profile's
+skills. Scores are the cosine of the two idf-weighted skill sets.
+
+Each user's top ``RECOMMENDATION_TOP_K`` is stored in ``RecommendedJobs``
+and kept current incrementally by background tasks (see ``app/signals.py``).
+``RecommendedSkill`` indexes the lists by skill, so the lists a job can
+enter or leave are found with an index lookup on its skills:
+
+* new or edited jobs are scored against the lists sharing a skill with
+  them and merged in,
+* deleted jobs (and edits that drop skills) recompute the lists that
+  contained them,
+* a change to a profile's skills recomputes that user's list.
+
+The in-memory index is patched per job too. Tasks pass the job ids they
+are about to change. Jobs changed by other processes are read by an
+``updated_at`` range over the last ``RECOMMENDATION_SYNC_MARGIN`` seconds.
+Patched jobs are scored in Python until they outnumber
+``RECOMMENDATION_REBUILD_RATIO`` of the index, which is then rebuilt from
+memory. A deleted job another process hasn't seen yet is dropped the first
+time it makes a top-k.
+
+``/api/jobs/recommended/`` only reads the stored list. A user without one
+gets an empty pending answer while a worker computes it.
+"""
+import math
+import threading
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job, Profile, RecommendedJobs, RecommendedSkill
+
+
+# Longest skill RecommendedSkill can hold; longer ones are left out of the skill index
+MAX_SKILL_LENGTH = 255
+
+# Patched jobs scored in Python before the index is rebuilt, at least
+MIN_REBUILD_CHANGES = 1000
+
+
+def get_top_k():
+    return getattr(settings, 'RECOMMENDATION_TOP_K', 50)
+
+
+def normalize_skill(skill):
+    return ' '.join(str(skill).lower().split())
+
+
+def normalize_skills(skills):
+    """Sorted, de-duplicated, case-folded skills from a Profile.skills value."""
+    if not isinstance(skills, list):
+        return []
+    return sorted({normalize_skill(skill) for skill in skills if str(skill).strip()})
+
+
+def job_skills(jdata):
+    """Skills a job asks for, from ``jdata`` ({"skills": [...]}, the old "skills_required" key or a bare list)."""
+    if isinstance(jdata, dict):
+        jdata = jdata.get('skills', jdata.get('skills_required'))
+    return normalize_skills(jdata)
+
+
+class SkillIndex:
+    """Inverted skill index over a set of jobs.
+
+    ``postings[column]`` holds the row positions of the jobs with that skill
+    and their weights (idf / norm of the job's vector); the same weights
+    are also kept row-wise (CSR) to score a subset of rows.
+
+    Jobs added, edited or deleted after the build are patched in with
+    :meth:`update`: the old row is masked out (``dead``) and the job's
+    current skills go to ``extra``, which is scored in Python with the
+    build's idf.
+    """
+
+    def __init__(self, job_ids, skill_lists, idf=None):
+        self.job_ids = np.asarray(job_ids, dtype=np.int64)
+        self.size = len(self.job_ids)
+        if idf is None:
+            document_frequency = Counter(skill for skills in skill_lists for skill in skills)
+            idf = {
+                skill: math.log((1 + self.size) / (1 + frequency)) + 1
+                for skill, frequency in document_frequency.items()
+            }
+        self.idf = idf
+        self.columns = {skill: column for column, skill in enumerate(sorted(idf))}
+        self.skills = sorted(idf)
+        self.position = {job_id: row for row, job_id in enumerate(job_ids)}
+
+        idf_by_column = np.array([idf[skill] for skill in self.skills], dtype=np.float32)
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        indices = []
+        for row, skills in enumerate(skill_lists):
+            columns = [self.columns[skill] for skill in skills if skill in self.columns]
+            indices.extend(columns)
+            indptr[row + 1] = len(indices)
+        self.indptr = indptr
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.rows = np.repeat(np.arange(self.size, dtype=np.int32), np.diff(indptr))
+
+        weights = idf_by_column[self.indices]
+        norms = np.sqrt(np.bincount(self.rows, weights=weights ** 2, minlength=self.size))
+        norms[norms == 0] = 1
+        self.data = (weights / norms[self.rows]).astype(np.float32)
+
+        order = np.argsort(self.indices, kind='stable')
+        starts = np.searchsorted(self.indices[order], np.arange(len(self.skills) + 1))
+        self.postings = [
+            (self.rows[order[starts[column]:starts[column + 1]]], self.data[order[starts[column]:starts[column + 1]]])
+            for column in range(len(self.skills))
+        ]
+
+        self.dead = np.zeros(self.size, dtype=bool)
+        self.extra = {}  # job id -> skills, for jobs patched in since the build
+        self.changes = 0
+        self.synced_at = None  # See sync_index()
+        self.applied = {}
+
+    @classmethod
+    def from_database(cls):
+        started = timezone.now()
+        rows = Job.objects.order_by('id').values_list('id', 'jdata')
+        job_ids, skill_lists = [], []
+        for job_id, jdata in rows.iterator(chunk_size=5000):
+            job_ids.append(job_id)
+            skill_lists.append(job_skills(jdata))
+        index = cls(job_ids, skill_lists)
+        index.synced_at = started
+        return index
+
+    def row_skills(self, row):
+        return [self.skills[column] for column in self.indices[self.indptr[row]:self.indptr[row + 1]]]
+
+    def skills_of(self, job_id):
+        """The job's skills as the index has them, None if it isn't in the index."""
+        if job_id in self.extra:
+            return self.extra[job_id]
+        row = self.position.get(job_id)
+        if row is None or self.dead[row]:
+            return None
+        return self.row_skills(row)
+
+    def update(self, job_id, skills):
+        """Patch ``job_id`` to ``skills`` (None removes it). Returns whether that changed anything."""
+        if self.skills_of(job_id) == skills:
+            return False
+        row = self.position.get(job_id)
+        if row is not None:
+            self.dead[row] = True
+        if skills is None:
+            self.extra.pop(job_id, None)
+        else:
+            self.extra[job_id] = skills
+        self.changes += 1
+        return True
+
+    def needs_rebuild(self):
+        ratio = getattr(settings, 'RECOMMENDATION_REBUILD_RATIO', 0.05)
+        return self.changes > max(MIN_REBUILD_CHANGES, self.size * ratio)
+
+    def rebuilt(self):
+        """A fresh index over the same jobs (idf recomputed, nothing patched), built from memory."""
+        jobs = [(job_id, self.row_skills(row)) for row, job_id in enumerate(self.job_ids.tolist()) if not self.dead[row]]
+        jobs = sorted(jobs + list(self.extra.items()))
+        index = SkillIndex([job_id for job_id, _ in jobs], [skills for _, skills in jobs])
+        index.synced_at, index.applied = self.synced_at, self.applied
+        return index
+
+    @property
+    def vocabulary(self):
+        """Every skill some job in the index asks for."""
+        return set(self.skills).union(*self.extra.values())
+
+    def weight(self, skill):
+        # Skills first seen after the build weigh like one every job has, until the next rebuild
+        return self.idf.get(skill, 1.0)
+
+    def score_skill_lists(self, skills, skill_lists):
+        """Scores of jobs with ``skill_lists`` for a profile with ``skills``, as score() would give them."""
+        query = {skill: self.weight(skill) for skill in skills}
+        norm = math.sqrt(sum(weight * weight for weight in query.values())) or 1
+        scores = np.zeros(len(skill_lists), dtype=np.float32)
+        for position, job in enumerate(skill_lists):
+            dot = sum(query[skill] * self.weight(skill) for skill in job if skill in query)
+            if dot:
+                scores[position] = dot / (norm * math.sqrt(sum(self.weight(skill) ** 2 for skill in job)))
+        return scores
+
+    def score_jobs(self, skills, job_ids):
+        """Scores of ``job_ids`` (0 for jobs not in the index)."""
+        return self.score_skill_lists(skills, [self.skills_of(job_id) or [] for job_id in job_ids])
+
+    def query_vector(self, skills):
+        """(columns, weights) of a profile's skills, normalized; skills no job asks for are dropped."""
+        columns = np.array([self.columns[skill] for skill in skills if skill in self.columns], dtype=np.int64)
+        if not len(columns):
+            return columns, np.zeros(0, dtype=np.float32)
+        weights = np.array([self.idf[self.skills[column]] for column in columns], dtype=np.float32)
+        # The norm covers every skill of the profile, known to the index or not
+        norm = math.sqrt(float(weights @ weights) + (len(skills) - len(columns)))
+        return columns, weights / norm
+
+    def score(self, skills):
+        """Score of every job in the index for a profile with ``skills``."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        columns, weights = self.query_vector(skills)
+        for column, weight in zip(columns, weights):
+            rows, data = self.postings[column]
+            scores[rows] += data * weight
+        scores[self.dead] = 0
+        return scores
+
+    def score_rows(self, skills, rows):
+        """Scores of the jobs at ``rows`` only (for merging newly added jobs)."""
+        columns, weights = self.query_vector(skills)
+        query = np.zeros(len(self.skills), dtype=np.float32)
+        query[columns] = weights
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        flat = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        local = np.repeat(np.arange(len(rows)), lengths)
+        return np.bincount(local, weights=self.data[flat] * query[self.indices[flat]], minlength=len(rows))
+
+    def top_k(self, skills, k=None):
+        """(job ids, scores) of the best ``k`` matches, newest job first on ties."""
+        scores, job_ids = self.score(skills), self.job_ids
+        if self.extra:
+            scores = np.concatenate([scores, self.score_skill_lists(skills, list(self.extra.values()))])
+            job_ids = np.concatenate([job_ids, np.fromiter(self.extra, dtype=np.int64, count=len(self.extra))])
+        return self.best(scores, job_ids, k)
+
+    @staticmethod
+    def best(scores, job_ids, k=None):
+        k = k or get_top_k()
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            # Keep everything tied with the k-th score so the tie-break below sees all of it
+            kth = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[scores[candidates] >= kth]
+        order = np.lexsort((-job_ids[candidates], -scores[candidates]))
+        candidates = candidates[order[:k]]
+        return job_ids[candidates].tolist(), [round(float(score), 6) for score in scores[candidates]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+# Background refreshes read-modify-write RecommendedJobs rows, one at a time per process
+_refresh_lock = threading.RLock()
+
+
+def serialized(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _refresh_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def load_skills(job_ids, batch_size=500):
+    """{job id: skills} of those of ``job_ids`` that exist."""
+    job_ids = list(job_ids)
+    found = {}
+    for start in range(0, len(job_ids), batch_size):
+        rows = Job.objects.filter(id__in=job_ids[start:start + batch_size]).values_list('id', 'jdata')
+        found.update((job_id, job_skills(jdata)) for job_id, jdata in rows)
+    return found
+
+
+def patch_jobs(index, job_ids):
+    """Bring ``job_ids`` up to date in ``index`` from the database; returns {job id: skills} of the existing ones."""
+    found = load_skills(job_ids)
+    for job_id in job_ids:
+        index.update(job_id, found.get(job_id))
+    return found
+
+
+def sync_index(index):
+    """Patch in the jobs saved since the index last looked, by other processes too.
+
+    Reads the ids of the jobs saved in the last RECOMMENDATION_SYNC_MARGIN
+    seconds (a range over job_updated_idx, usually empty), so transactions
+    that commit a little after their updated_at are still seen, and loads
+    the ones not applied yet.
+    """
+    now = timezone.now()
+    margin = timedelta(seconds=getattr(settings, 'RECOMMENDATION_SYNC_MARGIN', 60))
+    recent = dict(Job.objects.filter(updated_at__gte=index.synced_at - margin).values_list('id', 'updated_at'))
+    stale = [job_id for job_id, updated_at in recent.items() if index.applied.get(job_id) != updated_at]
+    if stale:
+        patch_jobs(index, stale)
+    index.applied = recent
+    index.synced_at = now
+
+
+def get_index():
+    """The process-wide SkillIndex, patched with the jobs saved since it was last used."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SkillIndex.from_database()
+        else:
+            sync_index(_index)
+            if _index.needs_rebuild():
+                _index = _index.rebuilt()
+        return _index
+
+
+def reset_index():
+    """Drop the process-wide index; the next get_index() builds it from the database."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def compute(index, skills):
+    """Top-k job ids and scores for ``skills``, without jobs deleted since the index last saw them."""
+    while True:
+        job_ids, scores = index.top_k(skills)
+        missing = set(job_ids) - set(Job.objects.filter(id__in=job_ids).values_list('id', flat=True))
+        if not missing:
+            return job_ids, scores
+        for job_id in missing:
+            index.update(job_id, None)
+
+
+def save_recommendations(user_id, skills, job_ids, scores):
+    with transaction.atomic():
+        stored, _ = RecommendedJobs.objects.update_or_create(
+            user_id=user_id, defaults={'skills': skills, 'job_ids': job_ids, 'scores': scores},
+        )
+        wanted = {skill for skill in skills if len(skill) <= MAX_SKILL_LENGTH}
+        indexed = set(stored.skill_rows.values_list('skill', flat=True))
+        if wanted != indexed:
+            stored.skill_rows.exclude(skill__in=wanted).delete()
+            RecommendedSkill.objects.bulk_create(
+                RecommendedSkill(recommendation=stored, skill=skill) for skill in wanted - indexed
+            )
+
+
+def lists_with_skills(skills):
+    """The stored lists computed for a profile with any of ``skills`` (an index lookup per skill)."""
+    return RecommendedJobs.objects.filter(
+        pk__in=RecommendedSkill.objects.filter(skill__in=list(skills)).values('recommendation_id'),
+    )
+
+
+def refresh(index, user_id, force=False):
+    skills = normalize_skills(Profile.objects.filter(user_id=user_id).values_list('skills', flat=True).first())
+    if not force:
+        current = RecommendedJobs.objects.filter(user_id=user_id).values_list('skills', flat=True).first()
+        if current == skills:
+            return False
+    save_recommendations(user_id, skills, *compute(index, skills))
+    return True
+
+
+@serialized
+def refresh_user(user_id, force=False):
+    """Compute one user's list if there is none or their skills changed (or always with ``force``)."""
+    return refresh(get_index(), user_id, force)
+
+
+@serialized
+def refresh_all(batch_size=500):
+    """Recompute every profile's list from scratch, on a freshly built index; returns the number of users."""
+    global _index
+    index = SkillIndex.from_database()
+    with _index_lock:
+        _index = index
+    count = 0
+    profiles = Profile.objects.order_by('user_id').values_list('user_id', 'skills')
+    for user_id, skills in profiles.iterator(chunk_size=batch_size):
+        skills = normalize_skills(skills)
+        # Just built, so every job in it exists
+        save_recommendations(user_id, skills, *index.top_k(skills))
+        count += 1
+    RecommendedJobs.objects.exclude(user__profile__isnull=False).delete()
+    return count
+
+
+def merge_jobs(index, found, skip=()):
+    """Merge the jobs of ``found`` ({job id: skills}) into the lists sharing a skill with them."""
+    skills = set().union(*found.values())
+    if not skills:
+        return 0
+    new_ids = list(found)
+    k = get_top_k()
+    changed = 0
+    for stored in lists_with_skills(skills).exclude(user_id__in=list(skip)).iterator(chunk_size=500):
+        scores = index.score_jobs(stored.skills, new_ids)
+        if not scores.any():
+            continue
+        # Scores of the stored jobs were computed against an older index: close enough for merging
+        keep = [(job_id, score) for job_id, score in zip(stored.job_ids, stored.scores) if job_id not in found]
+        merged_ids = np.array([job_id for job_id, _ in keep] + new_ids, dtype=np.int64)
+        merged_scores = np.array([score for _, score in keep] + scores.tolist(), dtype=np.float32)
+        top_ids, top_scores = SkillIndex.best(merged_scores, merged_ids, k)
+        if top_ids != stored.job_ids:
+            stored.job_ids, stored.scores = top_ids, top_scores
+            stored.save(update_fields=['job_ids', 'scores', 'updated_at'])
+            changed += 1
+    return changed
+
+
+def recompute_lists_with(index, job_ids, skills):
+    """Recompute the lists holding any of ``job_ids``; only lists sharing one of ``skills`` can. Returns their users."""
+    job_ids = set(job_ids)
+    affected = [
+        user_id for user_id, stored in lists_with_skills(skills).values_list('user_id', 'job_ids').iterator(chunk_size=1000)
+        if not job_ids.isdisjoint(stored)
+    ]
+    for user_id in affected:
+        refresh(index, user_id, force=True)
+    return affected
+
+
+def known_skills(index, job_ids):
+    return set().union(*(index.skills_of(job_id) or [] for job_id in job_ids))
+
+
+@serialized
+def jobs_added(job_ids):
+    """Patch new jobs into the index and merge them into the lists they now belong to."""
+    index = get_index()
+    return merge_jobs(index, patch_jobs(index, job_ids))
+
+
+@serialized
+def jobs_removed(job_ids, skills=None):
+    """Drop deleted jobs and recompute the lists that held them. ``skills``: what the jobs asked for."""
+    index = get_index()
+    skills = set(skills) if skills is not None else known_skills(index, job_ids)
+    for job_id in job_ids:
+        index.update(job_id, None)
+    return len(recompute_lists_with(index, job_ids, skills))
+
+
+@serialized
+def jobs_changed(job_ids, old_skills=None):
+    """An edit may have removed skills (so recompute the lists holding the job) and added others (so merge it in)."""
+    index = get_index()
+    old_skills = set(old_skills) if old_skills is not None else known_skills(index, job_ids)
+    found = patch_jobs(index, job_ids)
+    recomputed = recompute_lists_with(index, job_ids, old_skills | set().union(*found.values()))
+    return merge_jobs(index, found, skip=recomputed)
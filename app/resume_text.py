@@ -0,0 +1,320 @@
+"""Text extraction from uploaded resumes, for candidate search.
+
+After a profile's resume changes, :func:`extract_profile_resume` runs in
+the background (see ``app/signals.py``). It picks an extractor by file type,
+normalizes the text and finds the skills it mentions, then stores both in
+``ResumeText``. The FTS5 index ``app_resumetext_fts`` (``app/search.py``)
+follows that table through triggers.
+
+Extraction is keyed by the file's SHA-256, the same hash the resume store
+uses (``app/resumes.py``). A resume whose hash matches the stored text is
+skipped. Bytes already extracted for another profile are copied rather
+than parsed again.
+
+Extractors take the file's bytes and return text. The built-in ones handle
+PDF (pypdf when installed, else a plain stream parser), DOCX, ODT, RTF and
+plain text. Images need OCR, which isn't built in: plug one in through
+``RESUME_TEXT_EXTRACTORS``, e.g. ``{'jpg': 'myproject.ocr.image_text'}``.
+"""
+import logging
+import posixpath
+import re
+import unicodedata
+import zipfile
+import zlib
+from io import BytesIO
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Profile, ResumeFile, ResumeText
+from .recommend import get_index
+from .resumes import ALIASES, hash_file
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACTORS = {
+    'pdf': 'app.resume_text.extract_pdf',
+    'docx': 'app.resume_text.extract_docx',
+    'odt': 'app.resume_text.extract_odt',
+    'rtf': 'app.resume_text.extract_rtf',
+    'txt': 'app.resume_text.extract_plain',
+}
+
+DEFAULT_MAX_CHARS = 100_000
+
+# Biggest XML part of a DOCX/ODT that is decompressed (zip bombs)
+MAX_XML_SIZE = 20 * 1024 * 1024
+
+# Longest skill, in words, looked for in the text
+MAX_SKILL_WORDS = 3
+
+WORD_RE = re.compile(r'[\w+#]+(?:[.\-/][\w+#]+)*')
+
+
+def get_extractor(ext):
+    extractors = {**DEFAULT_EXTRACTORS, **getattr(settings, 'RESUME_TEXT_EXTRACTORS', {})}
+    path = extractors.get(ALIASES.get(ext, ext))
+    if path is None:
+        return None
+    return import_string(path) if isinstance(path, str) else path
+
+
+def normalize_text(text):
+    """NFKC, no control characters, single spaces, no blank lines; at most RESUME_TEXT_MAX_CHARS."""
+    text = unicodedata.normalize('NFKC', text)
+    lines = []
+    for line in text.splitlines():
+        line = ''.join(ch if ch.isprintable() else ' ' for ch in line)
+        line = ' '.join(line.split())
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)[:getattr(settings, 'RESUME_TEXT_MAX_CHARS', DEFAULT_MAX_CHARS)]
+
+
+def skill_vocabulary():
+    """Skills the jobs ask for, as normalized by app/recommend.py."""
+    return get_index().vocabulary
+
+
+def extract_skills(text, vocabulary):
+    """Sorted skills of ``vocabulary`` mentioned in ``text`` (as whole words)."""
+    words = WORD_RE.findall(text.lower())
+    found = set()
+    for size in range(1, MAX_SKILL_WORDS + 1):
+        for start in range(len(words) - size + 1):
+            phrase = ' '.join(words[start:start + size])
+            if phrase in vocabulary:
+                found.add(phrase)
+    return sorted(found)
+
+
+# Extractors
+
+def extract_plain(data):
+    for encoding in ('utf-8-sig', 'cp1251'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def extract_pdf(data):
+    try:
+        import pypdf
+    except ImportError:
+        pypdf = None
+    if pypdf is not None:
+        reader = pypdf.PdfReader(BytesIO(data))
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+    return '\n'.join(pdf_stream_text(stream) for stream in pdf_streams(data))
+
+
+PDF_STREAM_RE = re.compile(rb'stream\r?\n(.*?)\r?\n?endstream', re.DOTALL)
+PDF_TOKEN_RE = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|-?\d*\.?\d+|\[|\]|BT|ET|T[dDj*J]|\'|"')
+PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def pdf_streams(data):
+    for match in PDF_STREAM_RE.finditer(data):
+        stream = match.group(1)
+        try:
+            yield zlib.decompress(stream)
+        except zlib.error:
+            yield stream
+
+
+def pdf_string(token):
+    """The bytes of a PDF literal (...) or hex <...> string."""
+    if token.startswith(b'<'):
+        digits = re.sub(rb'\s', b'', token[1:-1]).decode()
+        return bytes.fromhex(digits + '0' * (len(digits) % 2))
+    body = token[1:-1]
+    return re.sub(
+        rb'\\([0-7]{1,3}|.)',
+        lambda m: bytes([int(m.group(1), 8) & 0xFF]) if m.group(1)[:1].isdigit() else PDF_ESCAPES.get(m.group(1), m.group(1)),
+        body,
+        flags=re.DOTALL,
+    )
+
+
+def pdf_decode(raw):
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', 'ignore')
+    return raw.decode('latin-1')
+
+
+def pdf_stream_text(stream):
+    """Text shown by the Tj/TJ/'/" operators of one content stream (simple fonts only)."""
+    parts = []
+    in_text = in_array = False
+    operands = []
+    for token in PDF_TOKEN_RE.findall(stream):
+        if token == b'BT':
+            in_text = True
+        elif token == b'ET':
+            in_text = False
+            parts.append('\n')
+        elif not in_text:
+            continue
+        elif token == b'[':
+            in_array, operands = True, []
+        elif token == b']':
+            in_array = False
+        elif token[:1] in (b'(', b'<'):
+            operands.append(pdf_decode(pdf_string(token)))
+        elif in_array:
+            # A big negative kerning inside TJ is how PDFs space words
+            if float(token) < -200:
+                operands.append(' ')
+        elif token in (b'Tj', b'TJ', b"'", b'"'):
+            if token in (b"'", b'"'):
+                parts.append('\n')
+            parts.append(''.join(operands))
+            operands = []
+        elif token in (b'Td', b'TD', b'T*'):
+            parts.append('\n')
+            operands = []
+    return ''.join(parts)
+
+
+def read_zip_xml(data, name):
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        info = archive.getinfo(name)
+        if info.file_size > MAX_XML_SIZE:
+            raise ValueError(f'{name} is too large')
+        return ElementTree.fromstring(archive.read(info))
+
+
+def extract_docx(data):
+    root = read_zip_xml(data, 'word/document.xml')
+    namespace = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    paragraphs = []
+    for paragraph in root.iter(f'{namespace}p'):
+        text = []
+        for node in paragraph.iter():
+            if node.tag == f'{namespace}t':
+                text.append(node.text or '')
+            elif node.tag in (f'{namespace}tab', f'{namespace}br'):
+                text.append(' ')
+        paragraphs.append(''.join(text))
+    return '\n'.join(paragraphs)
+
+
+def extract_odt(data):
+    root = read_zip_xml(data, 'content.xml')
+    namespace = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+    blocks = [element for element in root.iter() if element.tag in (f'{namespace}p', f'{namespace}h')]
+    return '\n'.join(''.join(block.itertext()) for block in blocks)
+
+
+RTF_TOKEN_RE = re.compile(r"\\([a-z]{1,32})(-?\d{1,10})? ?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|([^\\{}\r\n]+)", re.I)
+
+# Groups whose content isn't body text
+RTF_SKIPPED = {'fonttbl', 'colortbl', 'stylesheet', 'info', 'pict', 'header', 'footer', 'object', 'themedata'}
+
+
+def extract_rtf(data):
+    text = data.decode('latin-1')
+    out = []
+    stack = []
+    skipping = False
+    encoding = 'cp1252'
+    fallback = 0
+    for word, argument, hex_byte, symbol, brace, plain in (m.groups() for m in RTF_TOKEN_RE.finditer(text)):
+        if brace == '{':
+            stack.append(skipping)
+        elif brace == '}':
+            skipping = stack.pop() if stack else False
+        elif skipping:
+            continue
+        elif word:
+            if word in RTF_SKIPPED:
+                skipping = True
+            elif word == 'ansicpg' and argument:
+                encoding = f'cp{argument}'
+            elif word in ('par', 'line', 'row'):
+                out.append('\n')
+            elif word in ('tab', 'cell'):
+                out.append(' ')
+            elif word == 'u' and argument:
+                out.append(chr(int(argument) % 65536))
+                fallback = 1  # \u is followed by a replacement character for old readers
+        elif hex_byte:
+            if fallback:
+                fallback = 0
+                continue
+            try:
+                out.append(bytes([int(hex_byte, 16)]).decode(encoding))
+            except (LookupError, UnicodeDecodeError):
+                pass
+        elif symbol == '*':
+            skipping = True
+        elif symbol in ('\\', '{', '}'):
+            out.append(symbol)
+        elif plain:
+            out.append(plain[fallback:])
+            fallback = 0
+    return ''.join(out)
+
+
+# Pipeline
+
+def resume_sha256(name):
+    """Hash of the stored file ``name``: from the resume store, or read for files stored before it."""
+    sha256 = ResumeFile.objects.filter(file=name).values_list('sha256', flat=True).first()
+    return sha256 or hash_file(name)[0]
+
+
+def extract_text(name):
+    """(normalized text, skills) of the stored file ``name``; None when no extractor handles its type."""
+    extractor = get_extractor(posixpath.splitext(name)[1].lower().lstrip('.'))
+    if extractor is None:
+        return None
+    with default_storage.open(name, 'rb') as source:
+        data = source.read()
+    text = normalize_text(extractor(data) or '')
+    return text, extract_skills(text, skill_vocabulary())
+
+
+def extract_profile_resume(profile_id, force=False):
+    """Bring the profile's ResumeText up to date with its resume. Returns what happened."""
+    profile = Profile.objects.filter(pk=profile_id).only('resume').first()
+    if profile is None:
+        return 'missing'
+    name = profile.resume.name if profile.resume else ''
+    if not name:
+        return 'cleared' if ResumeText.objects.filter(profile_id=profile_id).delete()[0] else 'current'
+
+    try:
+        sha256 = resume_sha256(name)
+    except OSError as exc:
+        logger.warning('Could not read resume %s: %s', name, exc)
+        return 'failed'
+    if not force and ResumeText.objects.filter(profile_id=profile_id, sha256=sha256).exists():
+        return 'current'
+
+    same_file = ResumeText.objects.filter(sha256=sha256).exclude(profile_id=profile_id).first()
+    if same_file is not None and not force:
+        text, skills = same_file.text, same_file.skills
+    else:
+        try:
+            extracted = extract_text(name)
+        except Exception as exc:  # Parsers of untrusted files fail in many ways
+            logger.warning('Could not extract text from %s: %s', name, exc)
+            return 'failed'
+        # Unknown types are stored empty, so they aren't retried on every save
+        text, skills = extracted or ('', [])
+
+    with transaction.atomic():
+        # Only if the resume wasn't replaced in the meantime
+        if not Profile.objects.filter(pk=profile_id, resume=name).exists():
+            return 'current'
+        ResumeText.objects.update_or_create(profile_id=profile_id,
+                                            defaults={'sha256': sha256, 'text': text, 'skills': skills})
+    return 'extracted' if text else 'empty'
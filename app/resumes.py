@@ -0,0 +1,283 @@
+"""Content-addressed resume storage.
+
+Uploads are streamed to a temporary file in chunks by
+:class:`ResumeUploadHandler`, which hashes them (SHA-256) and enforces
+``RESUME_MAX_SIZE`` and the allowed types (``RESUME_TYPES``, checked against
+the file's leading bytes, not its name) as the chunks arrive. Nothing is
+buffered in memory, and an oversized upload is dropped without ever being
+written out completely.
+
+Each distinct file is stored once, as ``resumes/<aa>/<sha256>.<ext>``,
+with a ``ResumeFile`` row counting the profiles that point at it. Uploading
+bytes that are already stored skips the disk write and only bumps the
+count. When the last profile lets go of a file, the row and the file are
+deleted after the transaction commits.
+
+``Profile.resume`` keeps holding the file name, so readers are unchanged.
+Changes that bypass :func:`attach_resume` (the admin, shell edits) leave
+the counts stale. ``manage.py compact_resumes`` recounts them and moves
+older, randomly named uploads into the store.
+"""
+import hashlib
+import logging
+import posixpath
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Profile, ResumeFile
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024
+DEFAULT_ORPHAN_GRACE = 3600
+
+# extension -> (content type, possible leading bytes)
+DEFAULT_TYPES = {
+    'pdf': ('application/pdf', (b'%PDF-',)),
+    'docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', (b'PK\x03\x04',)),
+    'odt': ('application/vnd.oasis.opendocument.text', (b'PK\x03\x04',)),
+    'doc': ('application/msword', (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',)),
+    'rtf': ('application/rtf', (b'{\\rtf',)),
+    'jpg': ('image/jpeg', (b'\xff\xd8\xff',)),
+    'png': ('image/png', (b'\x89PNG\r\n\x1a\n',)),
+    'txt': ('text/plain', ()),  # No signature: anything without NUL bytes
+}
+
+ALIASES = {'jpeg': 'jpg'}
+
+STORED_NAME = re.compile(r'^resumes/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+# Enough leading bytes for every signature above
+SNIFF_BYTES = 8
+
+
+class ResumeRejected(Exception):
+    """An upload that isn't stored; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def get_max_size():
+    return getattr(settings, 'RESUME_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def get_types():
+    return getattr(settings, 'RESUME_TYPES', DEFAULT_TYPES)
+
+
+def detect_type(file_name, head):
+    """Extension for a file called ``file_name`` starting with ``head``, or None if it isn't allowed."""
+    ext = posixpath.splitext(file_name or '')[1].lower().lstrip('.')
+    ext = ALIASES.get(ext, ext)
+    allowed = get_types().get(ext)
+    if allowed is None:
+        return None
+    signatures = allowed[1]
+    if signatures:
+        return ext if head.startswith(signatures) else None
+    return None if b'\x00' in head else ext
+
+
+def check_content_length(request):
+    """Reject a request that can't be under the limit before reading any of it."""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return
+    # Leave room for the multipart boundaries and headers
+    if length > get_max_size() + 64 * 1024:
+        raise ResumeRejected(too_large_message(), 413)
+
+
+def too_large_message():
+    return f'Resumes can be at most {get_max_size() // 1024} KB.'
+
+
+def unsupported_type():
+    return ResumeRejected(f'Unsupported file type, upload one of: {", ".join(sorted(get_types()))}.', 415)
+
+
+class ResumeUploadHandler(TemporaryFileUploadHandler):
+    """Streams each file to a temporary file, hashing it and checking its size and type per chunk.
+
+    Rejected files are skipped (they don't show up in ``request.FILES``) and
+    the reason is left in ``self.error``.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.head = b''
+        self.ext = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > get_max_size():
+            self.error = ResumeRejected(too_large_message(), 413)
+            raise SkipFile
+        if self.ext is None:
+            # Chunks can be short, so collect enough bytes to recognize the type
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.sniff()
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.ext is None:
+            # Shorter than SNIFF_BYTES; SkipFile can't be raised from here
+            self.ext = detect_type(self.file_name, self.head)
+            if self.ext is None:
+                self.error = unsupported_type()
+                self.file.close()
+                return None
+        upload = super().file_complete(file_size)
+        upload.sha256 = self.hasher.hexdigest()
+        upload.ext = self.ext
+        return upload
+
+    def sniff(self):
+        self.ext = detect_type(self.file_name, self.head)
+        if self.ext is None:
+            self.error = unsupported_type()
+            raise SkipFile
+
+
+def stored_name(sha256, ext):
+    return f'resumes/{sha256[:2]}/{sha256}.{ext}'
+
+
+def store_resume(upload):
+    """The ResumeFile holding ``upload``'s bytes, writing them only if they aren't stored yet."""
+    existing = ResumeFile.objects.filter(sha256=upload.sha256).first()
+    if existing is not None:
+        return existing
+    name = stored_name(upload.sha256, upload.ext)
+    # The name is the content, so a file already there (an earlier attempt) is right
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, upload)
+        if saved != name:
+            # A concurrent upload of the same bytes got there first
+            default_storage.delete(saved)
+    try:
+        with transaction.atomic():
+            return ResumeFile.objects.create(sha256=upload.sha256, file=name, size=upload.size,
+                                             content_type=get_types()[upload.ext][0])
+    except IntegrityError:
+        return ResumeFile.objects.get(sha256=upload.sha256)
+
+
+def attach_resume(profile, resume):
+    """Point ``profile`` at ``resume``, moving the reference from its previous file."""
+    old_name = profile.resume.name if profile.resume else None
+    if old_name == resume.file.name:
+        return False
+    with transaction.atomic():
+        ResumeFile.objects.filter(pk=resume.pk).update(ref_count=F('ref_count') + 1)
+        profile.resume = resume.file.name
+        profile.save(update_fields=['resume', 'updated_at'])
+        if old_name:
+            release_resume(old_name)
+    return True
+
+
+def release_resume(name):
+    """Drop one reference to the stored file ``name``; the last one deletes it."""
+    ResumeFile.objects.filter(file=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    if ResumeFile.objects.filter(file=name, ref_count=0).delete()[0]:
+        transaction.on_commit(lambda: delete_unless_stored(name))
+
+
+def delete_unless_stored(name):
+    # Someone may have uploaded the same bytes again since
+    if not ResumeFile.objects.filter(file=name).exists():
+        default_storage.delete(name)
+
+
+def upload_resume(profile, upload):
+    """Store ``upload`` (from ResumeUploadHandler) as ``profile``'s resume. Returns (ResumeFile, changed)."""
+    resume = store_resume(upload)
+    return resume, attach_resume(profile, resume)
+
+
+def hash_file(name, chunk_size=64 * 1024):
+    """(sha256, size, first bytes) of a stored file, read in chunks."""
+    hasher = hashlib.sha256()
+    size = 0
+    head = b''
+    with default_storage.open(name, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            if not head:
+                head = chunk[:SNIFF_BYTES]
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size, head
+
+
+def adopt_file(name):
+    """The ResumeFile with the bytes of ``name``, a file stored before this module; None if unreadable."""
+    try:
+        sha256, size, head = hash_file(name)
+    except OSError as exc:
+        logger.warning('Could not read resume %s: %s', name, exc)
+        return None
+    existing = ResumeFile.objects.filter(sha256=sha256).first()
+    if existing is not None:
+        return existing
+    # Old uploads weren't checked; an unknown type is kept as it is, under its hash
+    ext = detect_type(name, head) or posixpath.splitext(name)[1].lower().lstrip('.') or 'bin'
+    target = stored_name(sha256, ext)
+    if not default_storage.exists(target):
+        with default_storage.open(name, 'rb') as source:
+            default_storage.save(target, File(source))
+    content_type = get_types()[ext][0] if ext in get_types() else 'application/octet-stream'
+    return ResumeFile.objects.create(sha256=sha256, file=target, size=size, content_type=content_type)
+
+
+def is_stored(name):
+    return bool(STORED_NAME.match(name))
+
+
+def recount():
+    """Set every ResumeFile's ref_count from the profiles and delete the unused ones. Returns their names.
+
+    A row younger than ``RESUME_ORPHAN_GRACE`` seconds is kept even when no
+    profile uses it yet: store_resume creates it before attach_resume points
+    a profile at it, in a separate transaction.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'RESUME_ORPHAN_GRACE', DEFAULT_ORPHAN_GRACE))
+    counts = {}
+    for name in Profile.objects.exclude(resume='').exclude(resume__isnull=True).values_list('resume', flat=True):
+        counts[name] = counts.get(name, 0) + 1
+    deleted = []
+    for resume in ResumeFile.objects.all():
+        name = resume.file.name
+        refs = counts.get(name, 0)
+        if refs == 0:
+            if resume.created_at >= cutoff:
+                continue
+            with transaction.atomic():
+                # A profile may have been pointed at it since the count
+                refs = Profile.objects.filter(resume=name).count()
+                if refs:
+                    ResumeFile.objects.filter(pk=resume.pk).update(ref_count=refs)
+                elif ResumeFile.objects.filter(pk=resume.pk).delete()[0]:
+                    transaction.on_commit(lambda name=name: delete_unless_stored(name))
+                    deleted.append(name)
+        elif refs != resume.ref_count:
+            ResumeFile.objects.filter(pk=resume.pk).update(ref_count=refs)
+    return deleted
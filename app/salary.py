@@ -0,0 +1,76 @@
+"""Salaries in one base currency.
+
+``Job.salary`` is in the posting's own currency, so comparing it across
+jobs compares tenge with dollars. ``Job.salary_base`` holds the same amount
+in ``SALARY_BASE_CURRENCY``, converted with the ``CurrencyRate`` table, and
+is what the min_salary/max_salary filters, salary sorting and the salary
+facet use.
+
+It is filled in on save (see ``app/signals.py``) and by the bulk paths
+(ingest, seeding) through :func:`fill_salary_base`. When a rate changes,
+:func:`recompute_salaries` rewrites that currency's jobs with one UPDATE.
+A job whose currency has no rate gets no ``salary_base`` and drops out of
+salary filters until the rate is added.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import CurrencyRate, Job
+
+
+CENTS = Decimal('0.01')
+
+
+def get_base_currency():
+    return getattr(settings, 'SALARY_BASE_CURRENCY', 'Теңге')
+
+
+def get_rates(using='default'):
+    """{currency: rate}; the base currency is always there with rate 1."""
+    rates = dict(CurrencyRate.objects.using(using).values_list('currency', 'rate'))
+    rates[get_base_currency()] = Decimal(1)
+    return rates
+
+
+def to_base(amount, currency, rates):
+    if amount is None or currency not in rates:
+        return None
+    return (Decimal(amount) * rates[currency]).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def fill_salary_base(jobs, using='default', rates=None):
+    """Set ``salary_base`` on unsaved Job instances (for bulk_create)."""
+    rates = rates if rates is not None else get_rates(using)
+    for job in jobs:
+        job.salary_base = to_base(job.salary, job.currency, rates)
+    return jobs
+
+
+def recompute_salaries(currencies=None, using='default'):
+    """Rewrite ``salary_base`` of the jobs in ``currencies`` (all by default). Returns the rows updated."""
+    rates = get_rates(using)
+    if currencies is None:
+        currencies = [currency for currency, _ in Job.CURRENCY]
+    updated = 0
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        for currency in currencies:
+            jobs = Job.objects.using(using).filter(currency=currency)
+            if currency in rates:
+                salary_base = Round(
+                    F('salary') * Value(rates[currency], output_field=DecimalField()), 2,
+                    output_field=DecimalField(max_digits=16, decimal_places=2),
+                )
+            else:
+                salary_base = None
+            # update() skips auto_now: set updated_at so ETags of filtered lists change too
+            updated += jobs.update(salary_base=salary_base, updated_at=now)
+        if updated:
+            bump_version()
+    return updated
@@ -0,0 +1,189 @@
+"""Full-text search using SQLite FTS5 shadow tables.
+
+The ``app_job_fts`` table is an external-content FTS5 index over
+``title``, ``description`` and ``company``. Triggers on ``app_job`` keep it
+in sync on insert, update and delete (including bulk_create and
+queryset.update, which never send model signals). ``app_resumetext_fts``
+indexes the text extracted from resumes the same way, for candidate search.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+
+class FtsIndex:
+    """An external-content FTS5 table over ``columns`` of ``source``, kept in sync by triggers."""
+
+    def __init__(self, table, source, rowid, columns, weights):
+        self.table = table
+        self.source = source
+        self.rowid = rowid
+        self.columns = columns
+        # bm25() weights, one per column
+        self.weights = weights
+
+    def create_sql(self):
+        table, columns = self.table, ', '.join(self.columns)
+        new = ', '.join(f'new.{column}' for column in self.columns)
+        old = ', '.join(f'old.{column}' for column in self.columns)
+        return [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                {columns},
+                content='{self.source}', content_rowid='{self.rowid}',
+                tokenize='unicode61 remove_diacritics 2'
+            )""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {self.source} BEGIN
+                INSERT INTO {table}(rowid, {columns}) VALUES (new.{self.rowid}, {new});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {self.source} BEGIN
+                INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.{self.rowid}, {old});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {columns} ON {self.source} BEGIN
+                INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.{self.rowid}, {old});
+                INSERT INTO {table}(rowid, {columns}) VALUES (new.{self.rowid}, {new});
+            END""",
+        ]
+
+    def drop_sql(self):
+        return [
+            f"DROP TRIGGER IF EXISTS {self.table}_ai",
+            f"DROP TRIGGER IF EXISTS {self.table}_ad",
+            f"DROP TRIGGER IF EXISTS {self.table}_au",
+            f"DROP TABLE IF EXISTS {self.table}",
+        ]
+
+    def ensure(self, cursor, rebuild=False):
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            [f'{self.table}_ai', f'{self.table}_ad', f'{self.table}_au'],
+        )
+        triggers_missing = cursor.fetchone()[0] < 3
+        for statement in self.create_sql():
+            cursor.execute(statement)
+        if rebuild or triggers_missing:
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+    def join(self, queryset, match, id_column, select=None):
+        """``queryset`` joined to the rows of this index matching ``match``.
+
+        A join runs the MATCH once. Computing bm25() or snippet() in a
+        correlated subquery instead re-runs it for every candidate row,
+        seconds on a few thousand matches. Only extra() can join a table
+        Django doesn't model; ``select`` adds columns computed from it.
+        """
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {id_column}', f'{self.table} MATCH %s'],
+            params=[match],
+            select=select,
+        )
+
+    def rank(self):
+        """bm25() of the joined row (lower is better)."""
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return RawSQL(f'bm25({self.table}, {weights})', ())
+
+    def snippet(self, column=0, tokens=16):
+        """Text around the matches in ``column`` of the joined row, matched terms in [brackets]."""
+        return f"snippet({self.table}, {column}, '[', ']', '…', {tokens})"
+
+
+JOB_INDEX = FtsIndex('app_job_fts', 'app_job', 'id', ('title', 'description', 'company'), (10.0, 1.0, 5.0))
+
+# Keyed by profile id (ResumeText's primary key), see app/resume_text.py
+RESUME_INDEX = FtsIndex('app_resumetext_fts', 'app_resumetext', 'profile_id', ('text', 'skills'), (1.0, 5.0))
+
+INDEXES = [JOB_INDEX, RESUME_INDEX]
+
+FTS_TABLE = JOB_INDEX.table
+
+
+def search_index_supported(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_search_index(using='default', rebuild=False, indexes=None):
+    """Create the FTS tables and triggers if missing, rebuilding when needed.
+
+    Django rebuilds ``app_job`` from scratch for some schema changes on
+    SQLite, which silently drops its triggers, so this runs after every
+    migrate as well as from the migrations that introduced the indexes.
+    An index whose table doesn't exist yet (an earlier migration) is skipped.
+    """
+    if not search_index_supported(using):
+        return False
+
+    connection = connections[using]
+    tables = set(connection.introspection.table_names())
+    ensured = False
+    with connection.cursor() as cursor:
+        for index in indexes or INDEXES:
+            if index.source in tables:
+                index.ensure(cursor, rebuild)
+                ensured = True
+    return ensured
+
+
+def drop_search_index(using='default', indexes=None):
+    if not search_index_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for index in indexes or INDEXES:
+            for statement in index.drop_sql():
+                cursor.execute(statement)
+
+
+def build_match_expression(terms):
+    """Turn search terms into an FTS5 query: every term must prefix-match."""
+    quoted = []
+    for term in terms:
+        term = term.replace('"', '""')
+        if term:
+            quoted.append(f'"{term}"*')
+    return ' '.join(quoted)
+
+
+class JobSearchFilter(SearchFilter):
+    """``?search=`` backed by the FTS5 index, ordered by bm25 relevance.
+
+    Falls back to the regular icontains SearchFilter on other databases.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or not search_index_supported(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_expression(search_terms)
+        if not match:
+            return queryset
+
+        table = queryset.model._meta.db_table
+        # bm25() is lower for better matches. It only orders the rows, as a
+        # selected column it would end up in the facets' GROUP BY.
+        return (
+            JOB_INDEX.join(queryset, match, f'"{table}"."id"')
+            .order_by(JOB_INDEX.rank().asc(), '-created_at', '-id')
+        )
+
+
+class CandidateSearchFilter(SearchFilter):
+    """``?search=`` over the text extracted from resumes, best match first, with a snippet.
+
+    Filters a Profile queryset; the index is keyed by profile id.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or not search_index_supported(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_expression(search_terms)
+        if not match:
+            return queryset
+
+        id_column = f'"{queryset.model._meta.db_table}"."id"'
+        return (
+            RESUME_INDEX.join(queryset, match, id_column, select={'search_snippet': RESUME_INDEX.snippet()})
+            .order_by(RESUME_INDEX.rank().asc(), '-id')
+        )
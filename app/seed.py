@@ -0,0 +1,202 @@
+"""Deterministic synthetic data for benchmarks and query-plan checks.
+
+Everything here is driven by a ``random.Random`` passed in by the caller
+and timestamps count back from a fixed ``now`` (``SEED_EPOCH`` unless the
+caller picks another), so the same seed always produces the same rows.
+"""
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+
+from .models import Education, Job, Profile, RecentJob, SavedJob, WorkExperience
+from .salary import fill_salary_base, get_rates
+
+
+TITLES = [
+    'Backend Developer', 'Frontend Developer', 'Data Analyst', 'QA Engineer',
+    'DevOps Engineer', 'Product Manager', 'Mobile Developer', 'UX Designer',
+    'Data Scientist', 'System Administrator', 'Project Manager', 'Accountant',
+]
+COMPANIES = ['Kaspi', 'Halyk', 'Kolesa', 'Chocofamily', 'Beeline', 'Air Astana', 'EPAM', 'Apple', 'ABC Corp']
+LOCATIONS = ['Almaty', 'Astana', 'Shymkent', 'Aktobe', 'Karaganda', 'Remote']
+SKILLS = [
+    'python', 'django', 'postgresql', 'sqlite', 'docker', 'kubernetes', 'react',
+    'typescript', 'javascript', 'swift', 'kotlin', 'figma', 'sql', 'excel',
+    'linux', 'git', 'aws', 'pandas', 'communication', 'english', 'go', 'java',
+]
+BENEFITS = ['Health Insurance', 'Remote days', 'Education budget', 'Gym', '401k']
+FIRST_NAMES = ['Aidos', 'Aruzhan', 'Dana', 'Yerlan', 'Madina', 'Timur', 'Aigerim', 'Nursultan', 'Alina', 'Daniyar']
+LAST_NAMES = ['Abenov', 'Sarsenova', 'Kim', 'Ivanova', 'Nurlanov', 'Tokayeva', 'Bekov', 'Akhmetova']
+UNIVERSITIES = ['KBTU', 'Nazarbayev University', 'KazNU', 'AITU', 'SDU', 'Satbayev University']
+FIELDS_OF_STUDY = ['Computer Science', 'Information Systems', 'Finance', 'Mathematics', 'Design', 'Economics']
+DEGREES = ['Bachelor', 'Master', 'PhD']
+JOB_TYPES = [choice for choice, _ in Job.JOB_TYPES]
+CURRENCIES = [choice for choice, _ in Job.CURRENCY]
+
+# Default "now" of the seeded rows; pass the current time instead when filters
+# relative to today (?publish_time=week}) should match a realistic share
+SEED_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# Typical monthly salary range per currency
+SALARY_RANGES = {
+    'Теңге': (150_000, 2_500_000),
+    'Доллар': (500, 6_000),
+    'Евро': (500, 5_500),
+}
+
+
+def make_job(rng, now=None, max_age_days=120):
+    now = now or SEED_EPOCH
+    currency = rng.choices(CURRENCIES, weights=[70, 20, 10])[0]
+    low, high = SALARY_RANGES[currency]
+    salary = Decimal(rng.randrange(low, high, 1000 if high > 100_000 else 50)) if rng.random() > 0.1 else None
+    title = rng.choice(TITLES)
+    skills = rng.sample(SKILLS, rng.randint(2, 6))
+    created_at = now - timedelta(seconds=rng.randrange(max_age_days * 86400))
+    return Job(
+        title=title,
+        company=rng.choice(COMPANIES),
+        location=rng.choice(LOCATIONS),
+        job_type=rng.choice(JOB_TYPES),
+        description=f"{title} position. Requirements: {', '.join(skills)}. " * rng.randint(1, 4),
+        salary=salary,
+        currency=currency,
+        jdata={'skills': skills, 'benefits': rng.sample(BENEFITS, rng.randint(0, 3))},
+        created_at=created_at,
+        updated_at=created_at,
+    )
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """Let bulk_create keep the timestamps we generated instead of auto_now(_add).
+
+    This flips the flags on the shared model fields, so keep the block to
+    the bulk_create call itself: every other save in the process skips
+    auto_now while it runs.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def create_jobs(count, rng, batch_size=1000, using='default', progress=None, now=None):
+    """bulk_create ``count`` synthetic jobs, returning how many were inserted."""
+    now = now or SEED_EPOCH
+    rates = get_rates(using)
+    created = 0
+    while created < count:
+        batch = fill_salary_base([make_job(rng, now) for _ in range(min(batch_size, count - created))], rates=rates)
+        with explicit_timestamps(Job, 'created_at', 'updated_at'):
+            Job.objects.using(using).bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created)
+    return created
+
+
+# Every seeded user logs in with this password (hashed once, not per user)
+SEED_PASSWORD = 'seed-password'
+
+
+def seed_email(number):
+    return f'user{number}@example.com'
+
+
+def make_user_rows(rng, number, password_hash, now):
+    """A user with a profile, 1-3 jobs and 1-2 degrees (the entries still without their profile)."""
+    email = seed_email(number)
+    user = User(username=email, email=email, password=password_hash,
+                first_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                date_joined=now - timedelta(seconds=rng.randrange(365 * 86400)))
+    profile = Profile(about_me='Looking for new challenges.', skills=rng.sample(SKILLS, rng.randint(1, 6)),
+                      job_title=rng.choice(TITLES), updated_at=user.date_joined)
+    experience, year = [], 2024
+    for _ in range(rng.randint(1, 3)):
+        start = date(year - rng.randint(1, 4), rng.randint(1, 12), 1)
+        experience.append(WorkExperience(job_title=rng.choice(TITLES), company=rng.choice(COMPANIES),
+                                         start_date=start, end_date=None if year == 2024 else date(year, 1, 1),
+                                         description='Worked on internal services.', updated_at=user.date_joined))
+        year = start.year
+    education = [
+        Education(level_of_education=degree, university_name=rng.choice(UNIVERSITIES),
+                  field_of_study=rng.choice(FIELDS_OF_STUDY), start_date=date(2010 + 4 * i, 9, 1),
+                  end_date=date(2014 + 4 * i, 6, 1), updated_at=user.date_joined)
+        for i, degree in enumerate(DEGREES[:rng.randint(1, 2)])
+    ]
+    return user, profile, experience, education
+
+
+def create_users(count, rng, job_ids, saved_per_user=10, recent_per_user=20, batch_size=1000,
+                 using='default', start=0, progress=None, now=None):
+    """bulk_create ``count`` users with profiles, CV entries, saved and recently viewed jobs.
+
+    Users are numbered from ``start`` (emails user<n>@example.com, password
+    SEED_PASSWORD). ``progress(created)`` is called after every batch.
+    """
+    now = now or SEED_EPOCH
+    password_hash = make_password(SEED_PASSWORD)
+    created = 0
+    while created < count:
+        rows = [
+            make_user_rows(rng, start + created + i, password_hash, now)
+            for i in range(min(batch_size, count - created))
+        ]
+        with transaction.atomic(using=using):
+            users = User.objects.using(using).bulk_create([user for user, _, _, _ in rows])
+            for user, (_, profile, _, _) in zip(users, rows):
+                profile.user_id = user.pk
+            with explicit_timestamps(Profile, 'updated_at'):
+                profiles = Profile.objects.using(using).bulk_create([profile for _, profile, _, _ in rows])
+            experience, education, saved, recent = [], [], [], []
+            for user, profile, (_, _, jobs, degrees) in zip(users, profiles, rows):
+                for entry in jobs + degrees:
+                    entry.profile_id = profile.pk
+                experience += jobs
+                education += degrees
+                picked = rng.sample(job_ids, min(len(job_ids), saved_per_user + recent_per_user))
+                saved += [
+                    SavedJob(user_id=user.pk, job_id=job_id, saved_at=now - timedelta(seconds=rng.randrange(90 * 86400)))
+                    for job_id in picked[:saved_per_user]
+                ]
+                recent += [
+                    RecentJob(user_id=user.pk, job_id=job_id, viewed_at=now - timedelta(seconds=rng.randrange(30 * 86400)))
+                    for job_id in picked[saved_per_user:]
+                ]
+            with explicit_timestamps(WorkExperience, 'updated_at'):
+                WorkExperience.objects.using(using).bulk_create(experience)
+            with explicit_timestamps(Education, 'updated_at'):
+                Education.objects.using(using).bulk_create(education)
+            with explicit_timestamps(SavedJob, 'saved_at'):
+                SavedJob.objects.using(using).bulk_create(saved)
+            RecentJob.objects.using(using).bulk_create(recent)
+        created += len(rows)
+        if progress:
+            progress(created)
+    return created
+
+
+@contextmanager
+def scratch_database(using='default'):
+    """Run against a throwaway migrated copy of the schema (Django's test database).
+
+    Benchmarks that need the data visible from other threads or processes
+    use this instead of a rolled-back transaction.
+    """
+    connection = connections[using]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
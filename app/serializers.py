@@ -2,16 +2,23 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
-from rest_framework.validators import UniqueValidator
+from rest_framework.settings import api_settings
+from rest_framework import ISO_8601
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import *
 from django.utils.timesince import timesince
+from django.utils import timezone
+from datetime import timedelta
+from .images import variant_urls
+from .metrics import timed
+from .login import login, normalize_email
+from django.db import IntegrityError, transaction
 
 
 class JobSerializer(serializers.ModelSerializer):
     relative_created_at = serializers.SerializerMethodField()
+    logo_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Job
@@ -26,6 +33,7 @@ class JobSerializer(serializers.ModelSerializer):
             'created_at',
             'jdata',
             'logo',
+            'logo_variants',
             'currency',
             'relative_created_at'  # Add the custom field explicitly
         ]
@@ -33,6 +41,144 @@ class JobSerializer(serializers.ModelSerializer):
     def get_relative_created_at(self, obj):
         return f"{timesince(obj.created_at)} ago"
 
+    def get_logo_variants(self, obj):
+        return variant_urls(obj.logo_variants, obj.logo.storage, self.context.get('request'))
+
+
+def datetime_converter():
+    """DateTimeField.to_representation with the timezone lookup done once instead of per value."""
+    field = serializers.DateTimeField()
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601:
+        return field.to_representation
+    field_timezone = field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class JobReadSerializer:
+    """Read-only fast path producing exactly the JSON of JobSerializer.
+
+    Works on ``.values()`` rows instead of model instances and skips DRF's
+    per-field binding and attribute lookup: every field gets a precompiled
+    converter and ``relative_created_at`` is computed against a single
+    ``now`` for the whole request.
+
+        rows = JobReadSerializer.values(queryset)
+        JobReadSerializer(rows, context={'request': request}).data
+    """
+    model_fields = [name for name in JobSerializer.Meta.fields if name != 'relative_created_at']
+
+    def __init__(self, rows=(), many=True, context=None, now=None):
+        self.rows = rows
+        self.context = context or {}
+        self.now = now or timezone.now()
+        self.converters = self.get_converters()
+        self._relative_cache = {}
+
+    @classmethod
+    def values(cls, queryset, prefix=''):
+        return queryset.values(*cls.value_names(prefix))
+
+    @classmethod
+    def value_names(cls, prefix=''):
+        return [prefix + name for name in cls.model_fields]
+
+    def get_converters(self):
+        identity = None
+        converters = {name: identity for name in self.model_fields}
+        converters['salary'] = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+        converters['created_at'] = datetime_converter()
+        converters['logo'] = self.file_url(Job._meta.get_field('logo').storage)
+        converters['logo_variants'] = self.variant_urls(Job._meta.get_field('logo').storage)
+        return list(converters.items())
+
+    def variant_urls(self, storage):
+        request = self.context.get('request')
+        return lambda variants: variant_urls(variants, storage, request)
+
+    def file_url(self, storage):
+        request = self.context.get('request')
+
+        def convert(name):
+            # Same as DRF's FileField: no file -> None, absolute URL when there is a request
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    def to_representation(self, row, prefix=''):
+        ret = {}
+        for name, convert in self.converters:
+            value = row[prefix + name]
+            ret[name] = value if value is None or convert is None else convert(value)
+        ret['relative_created_at'] = self.relative(row[prefix + 'created_at'])
+        return ret
+
+    def relative(self, created_at):
+        # timesince() dominates the cost, so memoize it on everything its
+        # output depends on for a fixed now: whole minutes under a week
+        # (the only range that prints hours/minutes), the calendar date and
+        # time-of-day ordering beyond that.
+        delta = self.now - created_at
+        if delta.days < 7:
+            key = delta // timedelta(minutes=1)
+        else:
+            now_time = self.now.time()
+            key = (created_at.date(), created_at.time() > now_time, created_at.time().replace(microsecond=0) > now_time)
+        text = self._relative_cache.get(key)
+        if text is None:
+            text = self._relative_cache[key] = f"{timesince(created_at, now=self.now)} ago"
+        return text
+
+    @property
+    def data(self):
+        with timed():
+            return [self.to_representation(row) for row in self.rows]
+
+
+class JobActivityReadSerializer:
+    """Fast read path for SavedJobSerializer / RecentJobSerializer from joined ``.values()`` rows."""
+    timestamp_field = None
+
+    def __init__(self, rows=(), many=True, context=None, now=None):
+        self.rows = rows
+        self.job_serializer = JobReadSerializer(context=context, now=now)
+        self.timestamp = datetime_converter()
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values('id', cls.timestamp_field, *JobReadSerializer.value_names('job__'))
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'job': self.job_serializer.to_representation(row, prefix='job__'),
+            self.timestamp_field: self.timestamp(row[self.timestamp_field]),
+        }
+
+    @property
+    def data(self):
+        with timed():
+            return [self.to_representation(row) for row in self.rows]
+
+class JobImportSerializer(serializers.ModelSerializer):
+    """Validates one row of a bulk job feed (no logo upload, server-side timestamps)."""
+
+    class Meta:
+        model = Job
+        fields = ['title', 'company', 'location', 'job_type', 'description', 'salary', 'jdata', 'currency']
+
+
 class SavedJobSerializer(serializers.ModelSerializer):
     job = JobSerializer()
 
@@ -47,11 +193,16 @@ class RecentJobSerializer(serializers.ModelSerializer):
         model = RecentJob
         fields = ['id', 'job', 'viewed_at']
 
+
+class SavedJobReadSerializer(JobActivityReadSerializer):
+    timestamp_field = 'saved_at'
+
+
+class RecentJobReadSerializer(JobActivityReadSerializer):
+    timestamp_field = 'viewed_at'
+
 class RegisterSerializer(serializers.ModelSerializer):
-    email = serializers.EmailField(
-        required=True, 
-        validators=[UniqueValidator(queryset=User.objects.all())]
-    )
+    email = serializers.EmailField(required=True)
     full_name = serializers.CharField(required=True)
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
 
@@ -59,21 +210,35 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = User
         fields = ['email', 'full_name', 'password']
 
+    def validate_email(self, value):
+        # Stored normalized, so this is an index probe on auth_user.email (migration 0018)
+        value = normalize_email(value)
+        if User.objects.filter(email=value).exists():
+            raise serializers.ValidationError('This field must be unique.')
+        return value
+
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['email'],  # Using email as username
-            email=validated_data['email'],
-            password=validated_data['password']
-        )
-        user.first_name = validated_data['full_name']
-        user.save()
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=validated_data['email'],  # Using email as username
+                    email=validated_data['email'],
+                    password=validated_data['password'],
+                    first_name=validated_data['full_name'],
+                )
+        except IntegrityError:
+            # Registered concurrently, the unique index caught it
+            raise serializers.ValidationError({'email': ['This field must be unique.']})
         return user
 
 
-class CustomTokenObtainPairSerializer(serializers.Serializer):
+class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+class CustomTokenObtainPairSerializer(LoginSerializer):
+
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
@@ -81,17 +246,11 @@ class CustomTokenObtainPairSerializer(serializers.Serializer):
         if email is None or password is None:
             raise serializers.ValidationError('Email and password are required.')
 
-        user = get_user_model().objects.filter(email=email).first()
-        if user is None or not user.check_password(password):
+        # Token generation if credentials are valid (see app/login.py)
+        tokens = login(email, password)
+        if tokens is None:
             raise serializers.ValidationError('Invalid credentials.')
-
-        # Token generation if credentials are valid
-        from rest_framework_simplejwt.tokens import RefreshToken
-        refresh = RefreshToken.for_user(user)
-        return {
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
-        }
+        return tokens
 
 
 class WorkExperienceSerializer(serializers.ModelSerializer):
@@ -122,6 +281,14 @@ class WorkExperiencePostWithOutIDSerializer(serializers.ModelSerializer):
         fields = ['id','job_title', 'company', 'start_date', 'end_date', 'description','profile']
 
 
+class WorkExperienceBatchSerializer(serializers.ModelSerializer):
+    """Validates one item of a work experience batch; the profile always comes from the request."""
+
+    class Meta:
+        model = WorkExperience
+        fields = ['job_title', 'company', 'start_date', 'end_date', 'description']
+
+
 class EducationSerializer(serializers.ModelSerializer):
     duration = serializers.SerializerMethodField()
 
@@ -152,6 +319,14 @@ class EducationPostWithoutIdSerializer(serializers.ModelSerializer):
         fields = ['id','level_of_education', 'university_name', 'field_of_study', 'start_date', 'end_date', 'description','profile']
 
 
+class EducationBatchSerializer(serializers.ModelSerializer):
+    """Validates one item of an education batch; the profile always comes from the request."""
+
+    class Meta:
+        model = Education
+        fields = ['level_of_education', 'university_name', 'field_of_study', 'start_date', 'end_date', 'description']
+
+
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -159,10 +334,29 @@ class ProfileSerializer(serializers.ModelSerializer):
     educations = EducationSerializer(many=True, read_only=True)
     full_name = serializers.CharField(source='get_full_name', read_only=True)
     profile_picture_url = serializers.CharField(read_only=True)  # No need to specify source
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['user', 'full_name', 'avatar', 'job_title', 'about_me', 'skills', 'work_experiences', 'educations', 'profile_picture_url','resume']
+        fields = ['user', 'full_name', 'avatar', 'avatar_variants', 'job_title', 'about_me', 'skills', 'work_experiences', 'educations', 'profile_picture_url','resume']
+
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar_variants, obj.avatar.storage, self.context.get('request'))
+
+
+class CandidateSerializer(serializers.ModelSerializer):
+    """A profile found by candidate search, with the skills found in its resume."""
+    full_name = serializers.CharField(source='get_full_name', read_only=True)
+    resume_skills = serializers.JSONField(source='resume_text.skills', read_only=True)
+    snippet = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Profile
+        fields = ['id', 'user', 'full_name', 'job_title', 'skills', 'resume', 'resume_skills', 'snippet']
+
+    def get_snippet(self, obj):
+        # Only set by CandidateSearchFilter, when searching
+        return getattr(obj, 'search_snippet', None)
 
 
 class SkillsSerializer(serializers.Serializer):
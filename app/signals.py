@@ -0,0 +1,150 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import recommend
+from .recommend import job_skills
+from .auth import forget_user
+from .login import normalize_email
+from .background import run_in_background
+from .cache import bump_version, profile_namespace
+from .images import IMAGE_FIELDS, generate_image_variants, variants_are_current
+from .models import CurrencyRate, Education, Job, Profile, WorkExperience
+from .resume_text import extract_profile_resume
+from .resumes import release_resume
+from .salary import fill_salary_base, recompute_salaries
+
+
+# Sent after a bulk import with job_ids and using, since bulk_create skips post_save
+jobs_imported = Signal()
+
+
+@receiver(pre_save, sender=Job)
+def convert_salary(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        fill_salary_base([instance], using)
+
+
+@receiver(post_save, sender=CurrencyRate)
+@receiver(post_delete, sender=CurrencyRate)
+def rate_changed(sender, instance, raw=False, using='default', **kwargs):
+    # One UPDATE over that currency's jobs, after the rate is committed
+    if not raw:
+        run_in_background(recompute_salaries, [instance.currency], using)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(jobs_imported, sender=Job)
+def invalidate_job_lists(sender, **kwargs):
+    # Any job create/edit/delete makes every cached job list stale
+    bump_version()
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    bump_version(profile_namespace(instance.pk))
+
+
+@receiver(post_save, sender=WorkExperience)
+@receiver(post_delete, sender=WorkExperience)
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+def invalidate_profile_entries(sender, instance, **kwargs):
+    bump_version(profile_namespace(instance.profile_id))
+
+
+@receiver(pre_save, sender=User)
+def normalize_user_email(sender, instance, raw=False, **kwargs):
+    # Logins look emails up normalized, whatever created the user (register, admin, createsuperuser)
+    if not raw:
+        instance.email = normalize_email(instance.email)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_authenticated_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def forget_profile_owner(sender, instance, **kwargs):
+    # The cached user carries the profile id
+    forget_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Profile)
+def release_profile_resume(sender, instance, **kwargs):
+    if instance.resume:
+        release_resume(instance.resume.name)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_profile(sender, instance, created=False, update_fields=None, **kwargs):
+    # The profile shows the user's full name; logins only touch last_login
+    if created or update_fields == frozenset(['last_login']):
+        return
+    for profile_id in Profile.objects.filter(user=instance).values_list('id', flat=True):
+        bump_version(profile_namespace(profile_id))
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_save, sender=Profile)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    # Resizing is slow, so new or replaced logos/avatars are processed after the response
+    if raw:
+        return
+    field_name, variants_field = IMAGE_FIELDS[sender]
+    name = getattr(instance, field_name).name
+    if instance.has_changed(field_name, name) and not variants_are_current(name, getattr(instance, variants_field)):
+        run_in_background(generate_image_variants, sender._meta.label, instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def schedule_resume_text(sender, instance, raw=False, **kwargs):
+    # Only when the file changed: a new profile without one has no text to clear
+    if raw:
+        return
+    name = instance.resume.name
+    if (name or 'resume' in instance.loaded_values) and instance.has_changed('resume', name):
+        run_in_background(extract_profile_resume, instance.pk)
+
+
+@receiver(post_save, sender=Job)
+def recommend_saved_job(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        run_in_background(recommend.jobs_added, [instance.pk])
+    elif 'jdata' not in instance.loaded_values:
+        run_in_background(recommend.jobs_changed, [instance.pk])
+    elif job_skills(instance.loaded_values['jdata']) != job_skills(instance.jdata):
+        # The old skills find the lists the job may have to leave
+        run_in_background(recommend.jobs_changed, [instance.pk], job_skills(instance.loaded_values['jdata']))
+
+
+@receiver(post_delete, sender=Job)
+def recommend_deleted_job(sender, instance, **kwargs):
+    run_in_background(recommend.jobs_removed, [instance.pk], job_skills(instance.jdata))
+
+
+@receiver(jobs_imported, sender=Job)
+def recommend_imported_jobs(sender, job_ids=(), **kwargs):
+    if job_ids:
+        run_in_background(recommend.jobs_added, list(job_ids))
+
+
+@receiver(post_save, sender=Profile)
+def recommend_for_profile(sender, instance, raw=False, **kwargs):
+    # New profiles get their first list; others only when the skills changed
+    if not raw and instance.has_changed('skills', instance.skills):
+        run_in_background(recommend.refresh_user, instance.user_id)
+
+
+@receiver(post_save)
+def remember_saved_values(sender, instance, raw=False, **kwargs):
+    # Connected last: the receivers above compare against the values from before this save
+    if not raw and hasattr(instance, 'remember_values'):
+        instance.remember_values()
@@ -0,0 +1,90 @@
+"""Streaming export of job querysets as NDJSON or a chunked JSON array.
+
+Rows are read with ``.iterator(chunk_size=...)`` and serialized one batch at
+a time, so memory stays flat and the first bytes go out as soon as the
+first batch is ready, however many jobs there are.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import JobReadSerializer
+
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def get_chunk_size():
+    return getattr(settings, 'JOB_EXPORT_CHUNK_SIZE', 500)
+
+
+def iter_batches(queryset, chunk_size):
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def aiter_batches(queryset, chunk_size):
+    batch = []
+    async for obj in queryset.aiterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ndjson(queryset, chunk_size, context=None):
+    encoder = JSONEncoder(ensure_ascii=False)
+    serializer = JobReadSerializer(context=context)
+    for batch in iter_batches(JobReadSerializer.values(queryset), chunk_size):
+        yield ''.join(encoder.encode(serializer.to_representation(row)) + '\n' for row in batch).encode('utf-8')
+
+
+def iter_json_array(queryset, chunk_size, context=None):
+    encoder = JSONEncoder(ensure_ascii=False)
+    serializer = JobReadSerializer(context=context)
+    separator = ''
+    yield b'['
+    for batch in iter_batches(JobReadSerializer.values(queryset), chunk_size):
+        yield (separator + ','.join(encoder.encode(serializer.to_representation(row)) for row in batch)).encode('utf-8')
+        separator = ','
+    yield b']'
+
+
+async def aiter_ndjson(queryset, chunk_size, context=None):
+    encoder = JSONEncoder(ensure_ascii=False)
+    serializer = JobReadSerializer(context=context)
+    async for batch in aiter_batches(JobReadSerializer.values(queryset), chunk_size):
+        yield ''.join(encoder.encode(serializer.to_representation(row)) + '\n' for row in batch).encode('utf-8')
+
+
+async def aiter_json_array(queryset, chunk_size, context=None):
+    encoder = JSONEncoder(ensure_ascii=False)
+    serializer = JobReadSerializer(context=context)
+    separator = ''
+    yield b'['
+    async for batch in aiter_batches(JobReadSerializer.values(queryset), chunk_size):
+        yield (separator + ','.join(encoder.encode(serializer.to_representation(row)) for row in batch)).encode('utf-8')
+        separator = ','
+    yield b']'
+
+
+def streaming_response(queryset, stream_format, context=None, use_async=False):
+    """StreamingHttpResponse over ``queryset``; ``use_async`` reads it with the async ORM."""
+    chunk_size = get_chunk_size()
+    if use_async:
+        stream = aiter_ndjson if stream_format == 'ndjson' else aiter_json_array
+    else:
+        stream = iter_ndjson if stream_format == 'ndjson' else iter_json_array
+    content = stream(queryset, chunk_size, context)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
@@ -0,0 +1,239 @@
+"""Database-backed task queue, run by ``manage.py run_tasks``.
+
+:func:`enqueue` inserts a ``Task`` row in the caller's transaction, so work
+queued by a request only becomes visible when its data does. There is no
+broker: workers poll the table and claim the next due task with a
+conditional UPDATE, which is safe with several worker processes (SQLite
+serializes the writes). Each claim holds a lease (``TASK_LEASE_SECONDS``),
+and a task whose worker died is picked up again once its lease expires.
+Tasks must therefore be idempotent, which the existing ones are: they
+recompute state from the database.
+
+* **Priorities:** higher ``priority`` runs first; among equals the earliest
+  ``run_at`` runs first.
+* **Scheduling:** ``run_at`` (or ``delay``) holds a task back.
+  ``PERIODIC_TASKS`` in the settings lists calls the workers re-enqueue
+  every ``every`` seconds.
+* **Retries:** a task that raises is retried up to ``max_attempts`` times,
+  waiting ``TASK_RETRY_BACKOFF * 2 ** (attempt - 1)`` seconds in between.
+* **Idempotency keys:** enqueueing a key that is still pending returns the
+  pending task instead of adding another. Once a task has started, the key
+  can be queued again, so changes made while it runs aren't lost.
+
+Finished tasks are kept for ``TASK_KEEP_FINISHED`` seconds and then
+purged by the ``purge-tasks`` periodic task. Queue depth, the age of the
+oldest ready task and per-task totals (``TaskStat``) are served with the
+other metrics at ``/metrics``.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task, TaskStat
+
+
+logger = logging.getLogger(__name__)
+
+
+def eager():
+    return getattr(settings, 'BACKGROUND_TASKS_EAGER', False)
+
+
+def task_name(func):
+    return func if isinstance(func, str) else f'{func.__module__}.{func.__qualname__}'
+
+
+def default_key(name, args, kwargs):
+    """Key of a call: the same function with the same arguments is the same work."""
+    # Hashed, not cut off: long arguments (a bulk import's job ids) must still tell calls apart
+    arguments = json.dumps([args, kwargs], sort_keys=True, separators=(',', ':'))
+    return f'{name}:{hashlib.sha256(arguments.encode()).hexdigest()}'[:255]
+
+
+def enqueue(func, args=(), kwargs=None, priority=0, run_at=None, delay=None, key=None, max_attempts=None):
+    """Queue ``func(*args, **kwargs)``; ``func`` is a module-level function or its dotted path.
+
+    Returns the Task (the already pending one for a known ``key``), or None
+    when BACKGROUND_TASKS_EAGER runs it inline after the transaction commits.
+    """
+    name = task_name(func)
+    args, kwargs = list(args), dict(kwargs or {})
+    if eager():
+        transaction.on_commit(lambda: import_string(name)(*args, **kwargs))
+        return None
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    if key is not None:
+        pending = Task.objects.filter(idempotency_key=key, status=Task.PENDING).first()
+        if pending is not None:
+            return pending
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                name=name, args=args, kwargs=kwargs, priority=priority, run_at=run_at, idempotency_key=key,
+                max_attempts=max_attempts or getattr(settings, 'TASK_MAX_ATTEMPTS', 3),
+            )
+    except IntegrityError:
+        # Queued by someone else in the meantime
+        return Task.objects.get(idempotency_key=key, status=Task.PENDING)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Mark the next due task as ours and return it, or None if there is nothing to do."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'TASK_LEASE_SECONDS', 600))
+    due = Q(status=Task.PENDING, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    for _ in range(5):
+        candidate = Task.objects.filter(due).order_by('-priority', 'run_at', 'id').values_list('id', 'status').first()
+        if candidate is None:
+            return None
+        task_id, status = candidate
+        # Only one worker's UPDATE still finds the task in the state it saw
+        claimed = Task.objects.filter(id=task_id, status=status).filter(due).update(
+            status=Task.RUNNING, locked_by=worker, locked_until=lease, started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(id=task_id)
+    return None
+
+
+def record(name, **increments):
+    """Add to the TaskStat totals of ``name``."""
+    values = {field: F(field) + value for field, value in increments.items()}
+    if TaskStat.objects.filter(name=name).update(**values):
+        return
+    try:
+        with transaction.atomic():
+            TaskStat.objects.create(name=name, **increments)
+    except IntegrityError:
+        TaskStat.objects.filter(name=name).update(**values)
+
+
+def retry_delay(attempts):
+    return getattr(settings, 'TASK_RETRY_BACKOFF', 10) * 2 ** (attempts - 1)
+
+
+def execute(task):
+    """Run a claimed task and record the outcome. Returns its new status."""
+    started = time.perf_counter()
+    wait = max(0.0, (task.started_at - task.run_at).total_seconds())
+    try:
+        import_string(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        elapsed = time.perf_counter() - started
+        error = traceback.format_exc()
+        logger.exception('Task %s (%s) failed, attempt %d of %d', task.pk, task.name, task.attempts, task.max_attempts)
+        if task.attempts < task.max_attempts:
+            try:
+                with transaction.atomic():
+                    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+                        status=Task.PENDING, last_error=error, locked_by='', locked_until=None,
+                        run_at=timezone.now() + timedelta(seconds=retry_delay(task.attempts)),
+                    )
+                record(task.name, retried=1, wait_seconds=wait, run_seconds=elapsed)
+                return Task.PENDING
+            except IntegrityError:
+                # The same key was queued again while this ran; that task redoes the work
+                error += '\nNot retried: superseded by a newer task with the same key.'
+        Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+            status=Task.FAILED, last_error=error, locked_until=None, finished_at=timezone.now(),
+        )
+        record(task.name, failed=1, wait_seconds=wait, run_seconds=elapsed)
+        return Task.FAILED
+    elapsed = time.perf_counter() - started
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        status=Task.DONE, locked_until=None, finished_at=timezone.now(),
+    )
+    record(task.name, succeeded=1, wait_seconds=wait, run_seconds=elapsed)
+    return Task.DONE
+
+
+def get_periodic_tasks():
+    return getattr(settings, 'PERIODIC_TASKS', {})
+
+
+def schedule_periodic():
+    """Queue the next run of every periodic task that has none waiting. Returns how many were queued."""
+    queued = 0
+    for label, entry in get_periodic_tasks().items():
+        key = f'periodic:{label}'
+        if Task.objects.filter(idempotency_key=key, status__in=[Task.PENDING, Task.RUNNING]).exists():
+            continue
+        last = (Task.objects.filter(idempotency_key=key).exclude(finished_at=None)
+                .order_by('-finished_at').values_list('finished_at', flat=True).first())
+        run_at = last + timedelta(seconds=entry['every']) if last else timezone.now()
+        enqueue(entry['task'], entry.get('args', ()), entry.get('kwargs'), priority=entry.get('priority', 0),
+                run_at=run_at, key=key)
+        queued += 1
+    return queued
+
+
+def purge_finished():
+    """Delete done and failed tasks older than TASK_KEEP_FINISHED (a periodic task)."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'TASK_KEEP_FINISHED', 86400))
+    return Task.objects.filter(status__in=[Task.DONE, Task.FAILED], finished_at__lt=cutoff).delete()[0]
+
+
+class Worker:
+    """Claims and runs tasks one at a time until stopped (one per run_tasks process)."""
+
+    def __init__(self, poll_interval=None, name=None):
+        self.poll_interval = poll_interval if poll_interval is not None else getattr(settings, 'TASK_POLL_INTERVAL', 1.0)
+        self.name = name or worker_id()
+        self.stopping = False
+        self.next_schedule = 0
+
+    def run_once(self):
+        """Run one due task if there is one; returns its new status or None."""
+        close_old_connections()
+        if time.monotonic() >= self.next_schedule:
+            schedule_periodic()
+            self.next_schedule = time.monotonic() + self.poll_interval
+        task = claim(self.name)
+        if task is None:
+            return None
+        return execute(task)
+
+    def run(self, burst=False):
+        """Work until ``stop()``; with ``burst``, only until the queue has nothing due."""
+        while not self.stopping:
+            if self.run_once() is None:
+                if burst:
+                    return
+                time.sleep(self.poll_interval)
+
+    def stop(self, *args):
+        self.stopping = True
+
+
+def queue_stats():
+    """{name: {'ready', 'scheduled', 'running', 'oldest_ready_seconds'}} over the tasks not finished yet."""
+    now = timezone.now()
+    ready = Q(status=Task.PENDING, run_at__lte=now)
+    rows = (Task.objects.filter(status__in=[Task.PENDING, Task.RUNNING]).values('name')
+            .annotate(ready=Count('id', filter=ready),
+                      scheduled=Count('id', filter=Q(status=Task.PENDING, run_at__gt=now)),
+                      running=Count('id', filter=Q(status=Task.RUNNING)),
+                      oldest=Min('run_at', filter=ready)))
+    return {
+        row['name']: {
+            'ready': row['ready'], 'scheduled': row['scheduled'], 'running': row['running'],
+            'oldest_ready_seconds': (now - row['oldest']).total_seconds() if row['oldest'] else 0,
+        }
+        for row in rows
+    }
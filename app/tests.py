@@ -1,3 +1,1852 @@
-from django.test import TestCase
+import json
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from importlib import import_module
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections
+from django.db.models.query import QuerySet
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import db, metrics, recent, recommend, resume_text, resumes, seed, tasks
+from .background import run_in_background
+from .auth import user_cache
+from .cache import check_shared_cache, get_cache, get_version
+from .ingest import import_jobs
+from .management.commands.bench_async import check_async_chain
+from .models import (CurrencyRate, Education, Job, Profile, RecentJob, RecommendedJobs, RecommendedSkill, ResumeFile,
+                     ResumeText, SavedJob, Task, TaskStat, WorkExperience)
+from .serializers import JobReadSerializer, JobSerializer, SavedJobReadSerializer, SavedJobSerializer
+from .signals import jobs_imported
+from .streaming import STREAM_FORMATS
+
+
+def make_job(**kwargs):
+    fields = dict(title='Python developer', company='Acme', location='Almaty', job_type='remote',
+                  description='Django and DRF', salary=1000, currency='Доллар')
+    fields.update(kwargs)
+    return Job.objects.create(**fields)
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=False, PROFILE_CACHE_ENABLED=False)
+class ConditionalGetTests(TestCase):
+    """Polling clients get 304s from the cache version (job lists) or one aggregate query (profiles)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(30):
+            make_job(title=f'Job {i}')
+        cls.user = User.objects.create_user(username='ann@example.com', email='ann@example.com', first_name='Ann')
+        cls.profile = Profile.objects.create(user=cls.user, skills=['python'])
+        WorkExperience.objects.create(profile=cls.profile, job_title='Dev', company='Acme',
+                                      start_date=date(2020, 1, 1), description='Backend')
+        Education.objects.create(profile=cls.profile, level_of_education='BSc', university_name='KBTU',
+                                 field_of_study='CS', start_date=date(2016, 9, 1), end_date=date(2020, 6, 1))
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.client.get('/api/saved-jobs/')  # Warm the authenticated user cache, counts below are per request
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        return response, len(queries)
+
+    def assert_revalidates(self, url):
+        """Full GET, then a conditional GET with its ETag; returns both query counts."""
+        full, full_queries = self.get(url)
+        self.assertEqual(full.status_code, 200)
+        self.assertTrue(full.content)
+        self.assertIn('no-cache', full['Cache-Control'])
+
+        cached, cached_queries = self.get(url, **{'If-None-Match': full['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], full['ETag'])
+        self.assertLess(cached_queries, full_queries)
+        return full, full_queries, cached_queries
+
+    def test_job_list_not_modified(self):
+        full, full_queries, cached_queries = self.assert_revalidates('/api/jobsf/?job_type=remote&page=2')
+        # COUNT + page vs. no SQL at all, and no body
+        self.assertEqual((full_queries, cached_queries), (2, 0))
+        self.assertGreater(len(full.content), 1000)
+
+    @override_settings(JOB_LIST_CACHE_ENABLED=True)
+    def test_job_list_cache_hit_runs_no_sql(self):
+        get_cache().clear()
+        self.get('/api/jobsf/?page=2')
+        response, queries = self.get('/api/jobsf/?page=2')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(queries, 0)
+
+    @override_settings(JOB_LIST_CACHE_ENABLED=True)
+    def test_sync_and_async_lists_are_cached_apart(self):
+        get_cache().clear()
+        etags = {}
+        for attempt, expected in enumerate(['MISS', 'HIT']):
+            for path in ('/api/jobsf/', '/api/async/jobsf/'):
+                response, _ = self.get(f'{path}?page=1')
+                self.assertEqual(response['X-Cache'], expected, path)
+                self.assertEqual(response.json()['next'], f'http://testserver{path}?page=2')
+                etags.setdefault(path, response['ETag'])
+        self.assertNotEqual(etags['/api/jobsf/'], etags['/api/async/jobsf/'])
+
+    def test_job_list_if_modified_since(self):
+        full, _ = self.get('/api/jobsf/')
+        response, queries = self.get('/api/jobsf/', **{'If-Modified-Since': full['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 0)
+
+    def test_job_list_etag_changes_on_write(self):
+        first, _ = self.get('/api/jobsf/')
+        make_job(title='Brand new')
+        response, _ = self.get('/api/jobsf/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        # Edits and deletes count too, not just new rows
+        second = response
+        job = Job.objects.get(title='Job 3')
+        job.salary = 2000
+        job.save()
+        response, _ = self.get('/api/jobsf/', **{'If-None-Match': second['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+        third = response
+        Job.objects.filter(title='Job 0').delete()
+        response, _ = self.get('/api/jobsf/', **{'If-None-Match': third['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_job_list_etag_depends_on_query(self):
+        first, _ = self.get('/api/jobsf/?page=1')
+        response, _ = self.get('/api/jobsf/?page=2', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_not_modified(self):
+        full, _, cached_queries = self.assert_revalidates('/api/profile/')
+        self.assertEqual(cached_queries, 1)
+        self.assertIn('private', full['Cache-Control'])
+        self.assertIn('Authorization', full['Vary'])
+
+    def test_profile_changes_with_entries(self):
+        first, _ = self.get('/api/profile/')
+        WorkExperience.objects.create(profile=self.profile, job_title='Lead', company='Beta',
+                                      start_date=date(2023, 1, 1), description='Team lead')
+        response, _ = self.get('/api/profile/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+        second = response
+        Education.objects.filter(profile=self.profile).delete()
+        response, _ = self.get('/api/profile/', **{'If-None-Match': second['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_etag_is_per_user(self):
+        first, _ = self.get('/api/profile/')
+        other = User.objects.create_user(username='bob@example.com', email='bob@example.com')
+        Profile.objects.create(user=other)
+        self.client.force_authenticate(other)
+        response, _ = self.get('/api/profile/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_work_experience_not_modified(self):
+        _, _, cached_queries = self.assert_revalidates('/api/profile/work_experience/list/')
+        self.assertEqual(cached_queries, 1)
+
+    def test_missing_profile_is_not_validated(self):
+        self.client.force_authenticate(User.objects.create_user(username='nobody'))
+        response, _ = self.get('/api/profile/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=False)
+class JobSearchTests(TestCase):
+    """?search= goes through the FTS5 index, which triggers keep in step with app_job."""
+
+    def search(self, terms):
+        response = self.client.get('/api/jobsf/', {'search': terms})
+        self.assertEqual(response.status_code, 200)
+        return [job['title'] for job in response.json()['results']['results']]
+
+    def test_ranked_by_column_weight(self):
+        make_job(title='Accountant', description='Some Kotlin on the side')
+        make_job(title='Backend developer', company='Kotlin Labs', description='Go')
+        make_job(title='Kotlin developer', description='Android')
+        make_job(title='Designer', description='Figma')
+        # Title (10) over company (5) over description (1)
+        self.assertEqual(self.search('kotlin'), ['Kotlin developer', 'Backend developer', 'Accountant'])
+        # Every term has to match, as a prefix
+        self.assertEqual(self.search('kot andr'), ['Kotlin developer'])
+
+    def test_triggers_follow_bulk_writes(self):
+        Job.objects.bulk_create([
+            Job(title=f'Rust engineer {i}', company='Acme', location='Almaty', job_type='remote',
+                description='Systems', salary=1000, currency='Доллар')
+            for i in range(3)
+        ])
+        self.assertEqual(len(self.search('rust')), 3)
+
+        # queryset.update sends no signals, the update trigger still runs
+        Job.objects.filter(title='Rust engineer 0').update(title='Zig engineer')
+        self.assertEqual(self.search('zig'), ['Zig engineer'])
+        self.assertEqual(len(self.search('rust')), 2)
+
+        Job.objects.filter(title__startswith='Rust').delete()
+        self.assertEqual(self.search('rust'), [])
+        self.assertEqual(self.search('engineer'), ['Zig engineer'])
+
+    def test_diacritics_are_ignored(self):
+        make_job(title='Café manager', description='Crème brûlée')
+        self.assertEqual(self.search('cafe'), ['Café manager'])
+        self.assertEqual(self.search('creme brulee'), ['Café manager'])
+        self.assertEqual(self.search('CAFÉ'), ['Café manager'])
+
+    def test_migrate_restores_dropped_triggers(self):
+        make_job(title='Elixir developer')
+        # What a table rebuild during migrate does to app_job
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER app_job_fts_{suffix}')
+        make_job(title='Elixir lead')
+        self.assertEqual(self.search('elixir'), ['Elixir developer'])
+
+        call_command('migrate', verbosity=0)
+        # Rebuilt, so the row written without triggers is indexed too
+        self.assertEqual(sorted(self.search('elixir')), ['Elixir developer', 'Elixir lead'])
+        make_job(title='Elixir intern')
+        self.assertEqual(len(self.search('elixir')), 3)
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=False)
+class CursorPaginationTests(TestCase):
+    """?pagination=cursor pages by (created_at, id), so writes don't shift the pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(12):
+            make_job(title=f'Job {i}', salary=i)
+        # Ties on created_at are broken by id
+        Job.objects.filter(title__in=['Job 4', 'Job 5', 'Job 6']).update(created_at=Job.objects.get(title='Job 5').created_at)
+        cls.expected = list(Job.objects.order_by('-created_at', '-id').values_list('title', flat=True))
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [job['title'] for job in data['results']['results']], data
+
+    def test_pages_stay_put_when_jobs_are_added(self):
+        titles, data = self.get('/api/jobsf/?pagination=cursor&page_size=5')
+        self.assertIsNone(data['previous'])
+        seen = titles
+        while data['next']:
+            # Would push every offset page one row down
+            make_job(title=f'New {len(seen)}')
+            titles, data = self.get(data['next'])
+            seen += titles
+        self.assertEqual(seen, self.expected)
+
+        # Going back returns the page before, in the same order
+        Job.objects.filter(title__startswith='New').delete()
+        _, first = self.get('/api/jobsf/?pagination=cursor&page_size=5')
+        second, data = self.get(first['next'])
+        previous, _ = self.get(data['previous'])
+        self.assertEqual(previous, self.expected[:5])
+        self.assertEqual(second, self.expected[5:10])
+
+    def test_count_only_when_asked(self):
+        _, data = self.get('/api/jobsf/?pagination=cursor')
+        self.assertIsNone(data['results']['count'])
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get('/api/jobsf/?pagination=cursor&with_count=true&job_type=remote')
+        self.assertEqual(data['results']['count'], 12)
+        self.assertEqual(len(queries), 2)
+
+    def test_ordering_is_always_by_date(self):
+        titles, data = self.get('/api/jobsf/?pagination=cursor&ordering=salary&page_size=5')
+        self.assertEqual(titles, self.expected[:5])
+        titles, _ = self.get(data['next'])
+        self.assertEqual(titles, self.expected[5:10])
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-base64!', 'eHx5fHo='):
+            response = self.client.get('/api/jobsf/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=True)
+class JobListCacheTests(TestCase):
+    """Every kind of job write bumps the jobs cache version, so the next list read misses."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            make_job(title=f'Job {i}')
+
+    def setUp(self):
+        get_cache().clear()
+
+    def titles(self, url='/api/jobs/'):
+        response = self.client.get(url)
+        data = response.json()
+        if url.startswith('/api/jobsf/'):
+            data = data['results']['results']
+        return response['X-Cache'], sorted(job['title'] for job in data)
+
+    def test_per_process_cache_needs_eager_tasks(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                  'job_lists': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem, BACKGROUND_TASKS_EAGER=False):
+            self.assertEqual([error.id for error in check_shared_cache()], ['app.E001'])
+        with override_settings(CACHES=locmem, BACKGROUND_TASKS_EAGER=True):
+            self.assertEqual(check_shared_cache(), [])
+        self.assertEqual(check_shared_cache(), [])
+
+    def assert_invalidates(self, write, expected):
+        for url in ('/api/jobs/', '/api/jobsf/'):
+            self.titles(url)
+            self.assertEqual(self.titles(url)[0], 'HIT')
+        version = get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertNotEqual(get_version(), version)
+        for url in ('/api/jobs/', '/api/jobsf/'):
+            self.assertEqual(self.titles(url), ('MISS', expected), url)
+
+    def test_create(self):
+        self.assert_invalidates(lambda: make_job(title='Job 3'), ['Job 0', 'Job 1', 'Job 2', 'Job 3'])
+
+    def test_update(self):
+        def rename():
+            job = Job.objects.get(title='Job 1')
+            job.title = 'Renamed'
+            job.save()
+        self.assert_invalidates(rename, ['Job 0', 'Job 2', 'Renamed'])
+
+    def test_delete(self):
+        self.assert_invalidates(lambda: Job.objects.get(title='Job 0').delete(), ['Job 1', 'Job 2'])
+
+    def test_import(self):
+        rows = [(1, {'title': 'Imported', 'company': 'Acme', 'location': 'Almaty', 'job_type': 'remote',
+                     'description': 'x', 'salary': '10', 'currency': 'Доллар'}, None)]
+        self.assert_invalidates(lambda: import_jobs(rows), ['Imported', 'Job 0', 'Job 1', 'Job 2'])
+
+    def test_read_before_commit_is_not_kept(self):
+        self.titles()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_job(title='Job 3')
+            # Filled between the write and its commit (here it sees the row, another connection wouldn't)
+            self.assertEqual(self.titles()[0], 'MISS')
+            self.assertEqual(self.titles()[0], 'HIT')
+        self.assertEqual(self.titles()[0], 'MISS')
+
+
+STREAM_QUERIES = ['', 'job_type=remote', 'job_type=remote&job_type=hybrid', 'currency=Теңге', 'location=Astana',
+                 'min_salary=1000&max_salary=5000', 'search=python', 'ordering=-salary', 'publish_time=week}']
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=False, JOB_EXPORT_CHUNK_SIZE=2)
+class StreamingExportTests(TestCase):
+    """/api/jobs/?stream= writes the rows jobsf/ would list, a batch at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_job(job_type='remote', currency='Доллар', salary=500)
+        make_job(title='Go developer', job_type='remote', currency='Теңге', salary=2000, location='Astana')
+        make_job(title='Python lead', job_type='office', currency='Теңге', salary=7000)
+        make_job(title='Designer', job_type='hybrid', currency='Евро', salary=None, description='Figma')
+        make_job(title='Tester', job_type='hybrid', currency='Теңге', salary=1500)
+
+    def stream(self, query, stream_format):
+        response = self.client.get(f'/api/jobs/?stream={stream_format}&{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], STREAM_FORMATS[stream_format])
+        return list(response.streaming_content)
+
+    def listed(self, query):
+        return self.client.get(f'/api/jobsf/?page_size=100&{query}').json()['results']['results']
+
+    def test_ndjson(self):
+        chunks = self.stream('', 'ndjson')
+        # Five rows in batches of two
+        self.assertEqual(len(chunks), 3)
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.listed(''))
+
+    def test_json_array(self):
+        chunks = self.stream('', 'json')
+        self.assertEqual((chunks[0], chunks[-1]), (b'[', b']'))
+        self.assertEqual(json.loads(b''.join(chunks)), self.listed(''))
+        self.assertEqual(json.loads(b''.join(self.stream('location=Nowhere', 'json'))), [])
+
+    def test_same_filters_as_job_list(self):
+        for query in STREAM_QUERIES:
+            expected = self.listed(query)
+            lines = b''.join(self.stream(query, 'ndjson')).decode('utf-8').splitlines()
+            self.assertEqual([json.loads(line) for line in lines], expected, query)
+            self.assertEqual(json.loads(b''.join(self.stream(query, 'json'))), expected, query)
+
+    async def test_async_matches_sync(self):
+        client = AsyncClient()
+        for query in ('', 'job_type=remote&currency=Теңге', 'search=python'):
+            for stream_format in STREAM_FORMATS:
+                response = await client.get(f'/api/async/jobs/?stream={stream_format}&{query}')
+                self.assertEqual(response.status_code, 200)
+                content = b''.join([chunk async for chunk in response.streaming_content])
+                expected = await sync_to_async(self.stream)(query, stream_format)
+                self.assertEqual(content, b''.join(expected), (query, stream_format))
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/jobs/?stream=xml').status_code, 400)
+
+
+class SyncOnlyMiddleware:
+    # No sync_capable/async_capable: Django treats it as sync-only
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+
+class AsgiChainTests(TestCase):
+    """bench_async refuses a middleware chain that would run the async views in a thread."""
+
+    def test_chain_is_native(self):
+        check_async_chain(ASGIHandler())
+        with override_settings(MIDDLEWARE=settings.MIDDLEWARE + ['app.tests.SyncOnlyMiddleware']):
+            with self.assertRaisesMessage(CommandError, 'app.tests.SyncOnlyMiddleware'):
+                check_async_chain(ASGIHandler())
+
+
+class QueryPlanCheckTests(TestCase):
+    """check_query_plans passes on the seeded tables, with each list on the index it was built for."""
+
+    def setUp(self):
+        # Earlier tests cached users under the ids the command's users get
+        user_cache.clear()
+
+    def run_check(self, **options):
+        out = StringIO()
+        call_command('check_query_plans', jobs=2000, stdout=out, no_color=True, **options)
+        plans = {}
+        label = None
+        for line in out.getvalue().splitlines():
+            if line.startswith('['):
+                label = line[1:line.index(']')]
+            elif line.startswith('      '):
+                plans.setdefault(label, []).append(line.strip())
+        return out.getvalue(), plans
+
+    def test_expected_plans(self):
+        output, plans = self.run_check()
+        self.assertIn('No unexpected full scans.', output)
+        expected = {
+            'jobsf': 'SCAN app_job USING INDEX job_created_id_idx',
+            'jobsf job_type': 'SEARCH app_job USING INDEX job_type_created_idx (job_type=?)',
+            'jobsf salary ordering': 'USING INDEX job_salary_base_idx',
+            'jobsf search': 'VIRTUAL TABLE INDEX 0:M',
+            'jobsf cursor job_type': 'USING INDEX job_type_created_idx',
+            'saved-jobs': 'USING COVERING INDEX savedjob_user_saved_idx (user_id=?)',
+            'candidates search': 'VIRTUAL TABLE INDEX 0:M',
+        }
+        for label, step in expected.items():
+            self.assertTrue(any(step in detail for detail in plans[label]), (label, plans[label]))
+        # The seed data is rolled back
+        self.assertFalse(Job.objects.exists())
+
+    def test_unlisted_full_scan_fails(self):
+        with mock.patch.dict('app.management.commands.check_query_plans.FULL_SCAN_ALLOWED', clear=True):
+            with self.assertRaisesMessage(CommandError, 'queries fall back to a full scan'):
+                self.run_check()
+
+
+class JobReadSerializerTests(TestCase):
+    """JobReadSerializer's output matches JobSerializer's, field for field."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        variants = {'source': 'logos/acme.png', 'sizes': {
+            'thumb': {'src': 'logos/variants/acme-thumb.png', 'webp': 'logos/variants/acme-thumb.webp', 'width': 96, 'height': 48},
+            'card': {'src': 'logos/variants/acme-card.png', 'webp': 'logos/variants/acme-card.webp', 'width': 320, 'height': 160},
+        }}
+        ages = [timedelta(seconds=30), timedelta(minutes=5, seconds=30), timedelta(hours=3, minutes=1, seconds=30),
+                timedelta(days=6, hours=23, minutes=59, seconds=30), timedelta(days=8, hours=1),
+                timedelta(days=40, hours=13), timedelta(days=400), timedelta(days=800, hours=5)]
+        for i, age in enumerate(ages):
+            job = make_job(title=f'Job {i}', salary=[None, 1000, Decimal('1234.5')][i % 3],
+                           jdata=[None, {'skills': ['Python', 'SQL'], 'level': {'min': 1}}][i % 2],
+                           currency=['Теңге', 'Доллар'][i % 2],
+                           logo='logos/acme.png' if i % 2 else '', logo_variants=variants if i % 4 == 1 else None)
+            Job.objects.filter(pk=job.pk).update(created_at=now - age)
+
+    def assert_same(self, context):
+        jobs = Job.objects.order_by('-created_at', '-id')
+        expected = JobSerializer(jobs, many=True, context=context).data
+        fast = JobReadSerializer(JobReadSerializer.values(jobs), context=context).data
+        self.assertEqual(len(fast), len(expected))
+        for row, reference in zip(fast, expected):
+            self.assertEqual(list(row), list(reference))
+            for field in reference:
+                self.assertEqual(row[field], reference[field], (reference['title'], field))
+        # And the same bytes once rendered
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(expected))
+
+    def test_same_as_model_serializer(self):
+        self.assert_same({})
+
+    def test_same_urls_with_request(self):
+        self.assert_same({'request': Request(APIRequestFactory().get('/api/jobsf/'))})
+
+    def test_activity_rows(self):
+        user = User.objects.create_user(username='ann')
+        for job in Job.objects.all():
+            SavedJob.objects.create(user=user, job=job)
+        saved = SavedJob.objects.order_by('-saved_at', '-id')
+        self.assertEqual(SavedJobReadSerializer(SavedJobReadSerializer.values(saved)).data,
+                         SavedJobSerializer(saved, many=True).data)
+
+
+@override_settings(SAVED_JOBS_PAGE_SIZE=5, SAVED_JOBS_MAX_PAGE_SIZE=8, RECENT_JOBS_PAGE_SIZE=5, RECENT_JOBS_MAX_PAGE_SIZE=8)
+class JobActivityListTests(TestCase):
+    """Saved and recent jobs load in a fixed number of queries, however many rows there are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        jobs = [make_job(title=f'Job {i}') for i in range(20)]
+        cls.light = User.objects.create_user(username='light')
+        cls.heavy = User.objects.create_user(username='heavy')
+        for user, count in ((cls.light, 2), (cls.heavy, 20)):
+            for job in jobs[:count]:
+                SavedJob.objects.create(user=user, job=job)
+                RecentJob.objects.create(user=user, job=job)
+
+    def setUp(self):
+        user_cache.clear()
+        recent.flush()
+
+    def get(self, user, url):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        client.get(url)  # Cache the authenticated user
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_saved_jobs(self):
+        for prefix in ('/api/', '/api/async/'):
+            light, light_queries = self.get(self.light, f'{prefix}saved-jobs/')
+            heavy, heavy_queries = self.get(self.heavy, f'{prefix}saved-jobs/')
+            # COUNT plus one joined SELECT, no query per job
+            self.assertEqual((light_queries, heavy_queries), (2, 2), prefix)
+            self.assertEqual((light['count'], len(light['jobs'])), (2, 2))
+            self.assertEqual((heavy['count'], len(heavy['jobs'])), (20, 5))
+            self.assertEqual(set(heavy['jobs'][0]), {'id', 'job', 'saved_at'})
+            self.assertEqual(heavy['jobs'][0]['job']['title'], 'Job 19')
+
+    def test_saved_jobs_window(self):
+        data, _ = self.get(self.heavy, '/api/saved-jobs/?limit=3&offset=2')
+        self.assertEqual([row['job']['title'] for row in data['jobs']], ['Job 17', 'Job 16', 'Job 15'])
+        data, _ = self.get(self.heavy, '/api/saved-jobs/?limit=100')
+        self.assertEqual(len(data['jobs']), 8)
+
+    def test_recent_jobs(self):
+        for prefix in ('/api/', '/api/async/'):
+            light, light_queries = self.get(self.light, f'{prefix}recent-jobs/')
+            heavy, heavy_queries = self.get(self.heavy, f'{prefix}recent-jobs/')
+            self.assertEqual((light_queries, heavy_queries), (1, 1), prefix)
+            self.assertEqual((len(light), len(heavy)), (2, 5))
+            self.assertEqual(set(heavy[0]), {'id', 'job', 'viewed_at'})
+        data, _ = self.get(self.heavy, '/api/recent-jobs/?limit=100')
+        self.assertEqual(len(data), 8)
+
+
+def feed_row(**kwargs):
+    row = dict(title='Imported', company='Acme', location='Almaty', job_type='remote',
+               description='x', salary='10', currency='Теңге')
+    row.update(kwargs)
+    return json.dumps(row, ensure_ascii=False)
+
+
+class JobImportTests(TestCase):
+    """/api/jobs/bulk/ and import_jobs insert the good rows and report the bad ones."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', is_staff=True))
+        self.imported = []
+        receiver = lambda sender, job_ids, **kwargs: self.imported.append(list(job_ids))
+        jobs_imported.connect(receiver, sender=Job, weak=False)
+        self.addCleanup(jobs_imported.disconnect, receiver, sender=Job)
+
+    def post(self, body, content_type='application/x-ndjson', **settings):
+        with self.settings(**settings):
+            response = self.client.generic('POST', '/api/jobs/bulk/', body.encode('utf-8'), content_type)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_bad_rows_are_reported(self):
+        body = '\n'.join([feed_row(title='One'), '{not json', feed_row(title='Two', job_type=None),
+                          '', '[1, 2]', feed_row(title='Three')])
+        report = self.post(body, JOB_IMPORT_BATCH_SIZE=2)
+        self.assertEqual((report['total'], report['created'], report['failed']), (5, 2, 3))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3, 5])
+        self.assertIn('job_type', report['errors'][1]['errors'])
+        self.assertFalse(report['errors_truncated'])
+        self.assertEqual(sorted(Job.objects.values_list('title', flat=True)), ['One', 'Three'])
+        # One signal for the whole feed, with every new id
+        self.assertEqual(self.imported, [list(Job.objects.order_by('id').values_list('id', flat=True))])
+
+    def test_csv_upload(self):
+        content = 'title,company,location,job_type,description,salary,currency,jdata\n' \
+                  'CSV job,Acme,Almaty,remote,x,,Теңге,"{""skills"": [""Go""]}"\n' \
+                  'Bad json,Acme,Almaty,remote,x,5,Теңге,{oops\n'
+        response = self.client.post('/api/jobs/bulk/', {'file': SimpleUploadedFile('feed.csv', content.encode('utf-8'))})
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (1, 1))
+        self.assertIn('jdata', report['errors'][0]['errors'])
+        job = Job.objects.get()
+        self.assertEqual((job.salary, job.jdata), (None, {'skills': ['Go']}))
+
+    def test_database_error_falls_back_to_single_rows(self):
+        bulk_create = QuerySet.bulk_create
+
+        def flaky(queryset, objs, *args, **kwargs):
+            if any(job.title == 'boom' for job in objs):
+                raise IntegrityError('boom')
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        body = '\n'.join(feed_row(title=title) for title in ['a', 'b', 'boom', 'c', 'd'])
+        with mock.patch.object(QuerySet, 'bulk_create', autospec=True, side_effect=flaky) as patched:
+            report = self.post(body, JOB_IMPORT_BATCH_SIZE=3)
+        # The batch with the bad row is retried one row at a time, the other batch isn't
+        self.assertEqual(patched.call_count, 1 + 3 + 1)
+        self.assertEqual((report['created'], report['failed']), (4, 1))
+        self.assertEqual(report['errors'][0]['row'], 3)
+        self.assertEqual(sorted(Job.objects.values_list('title', flat=True)), ['a', 'b', 'c', 'd'])
+
+    def test_error_list_is_capped(self):
+        report = self.post('\n'.join(['{bad'] * 5 + [feed_row()]), JOB_IMPORT_MAX_ERRORS=2)
+        self.assertEqual((report['created'], report['failed'], len(report['errors'])), (1, 5, 2))
+        self.assertTrue(report['errors_truncated'])
+
+    def test_nothing_imported_sends_no_signal(self):
+        self.assertEqual(self.post('{bad')['created'], 0)
+        self.assertEqual(self.imported, [])
+
+    def test_admin_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='user'))
+        response = self.client.generic('POST', '/api/jobs/bulk/', feed_row().encode('utf-8'), 'application/x-ndjson')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+
+def image_bytes(size, mode='RGB', image_format='PNG', color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new(mode, size, color if mode == 'RGB' else color + (128,)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, IMAGE_VARIANT_SIZES={'thumb': 96, 'card': 320})
+class ImageVariantTests(TestCase):
+    """Logos and avatars get resized WebP and JPEG/PNG variants under content-hashed names."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+        cls.addClassCleanup(shutil.rmtree, cls.media, ignore_errors=True)
+
+    def make_job(self, content, name='logo.png'):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = make_job(logo=SimpleUploadedFile(name, content))
+        job.refresh_from_db()
+        return job
+
+    def test_variants_built_after_upload(self):
+        job = self.make_job(image_bytes((800, 400), mode='RGBA'))
+        sizes = job.logo_variants['sizes']
+        self.assertEqual(job.logo_variants['source'], job.logo.name)
+        self.assertEqual({label: (entry['width'], entry['height']) for label, entry in sizes.items()},
+                         {'thumb': (96, 48), 'card': (320, 160)})
+        # Transparency keeps a PNG fallback
+        self.assertTrue(sizes['thumb']['src'].endswith('.thumb-96.png'))
+        self.assertTrue(sizes['thumb']['webp'].endswith('.thumb-96.webp'))
+        for entry in sizes.values():
+            for key in ('src', 'webp'):
+                self.assertTrue(entry[key].startswith('job_logos/variants/'))
+                with default_storage.open(entry[key]) as variant, Image.open(variant) as image:
+                    self.assertEqual(image.size, (entry['width'], entry['height']))
+
+        data = JobSerializer(job).data
+        self.assertEqual(data['logo_variants']['card']['webp'], default_storage.url(sizes['card']['webp']))
+        self.assertEqual(set(data['logo_variants']['card']), {'src', 'webp', 'width', 'height'})
+
+    def test_small_jpeg_is_not_upscaled(self):
+        job = self.make_job(image_bytes((50, 40), image_format='JPEG'), name='logo.jpg')
+        card = job.logo_variants['sizes']['card']
+        self.assertEqual((card['width'], card['height']), (50, 40))
+        self.assertTrue(card['src'].endswith('.card-320.jpg'))
+
+    def test_names_follow_content(self):
+        first = self.make_job(image_bytes((300, 300)))
+        same = self.make_job(image_bytes((300, 300)))
+        other = self.make_job(image_bytes((300, 300), color=(0, 0, 255)))
+        self.assertNotEqual(first.logo.name, same.logo.name)
+        self.assertEqual(first.logo_variants['sizes'], same.logo_variants['sizes'])
+        self.assertNotEqual(first.logo_variants['sizes'], other.logo_variants['sizes'])
+
+    def test_replaced_and_removed_logo(self):
+        job = self.make_job(image_bytes((300, 300)))
+        old = job.logo_variants
+        with self.captureOnCommitCallbacks(execute=True):
+            job.logo = SimpleUploadedFile('new.png', image_bytes((300, 150)))
+            job.save()
+        job.refresh_from_db()
+        self.assertNotEqual(job.logo_variants, old)
+        self.assertEqual(job.logo_variants['sizes']['thumb']['height'], 48)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.logo = None
+            job.save()
+        job.refresh_from_db()
+        self.assertIsNone(job.logo_variants)
+
+    def test_avatar(self):
+        profile = Profile.objects.create(user=User.objects.create_user(username='ann'))
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.avatar = SimpleUploadedFile('me.jpg', image_bytes((640, 480), image_format='JPEG'))
+            profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.avatar_variants['sizes']['thumb']['width'], 96)
+        self.assertTrue(profile.avatar_variants['sizes']['thumb']['src'].startswith('profile_pics/variants/'))
+
+    def test_backfill_command(self):
+        name = default_storage.save('job_logos/old.png', ContentFile(image_bytes((200, 100))))
+        broken = default_storage.save('job_logos/broken.png', ContentFile(b'not an image'))
+        # Rows written before the pipeline existed
+        Job.objects.bulk_create([Job(title='old', logo=name, job_type='remote', salary=1),
+                                 Job(title='broken', logo=broken, job_type='remote', salary=1)])
+        out, err = StringIO(), StringIO()
+        with self.assertLogs('app.images', 'WARNING'):
+            call_command('build_image_variants', '--model', 'job', stdout=out, stderr=err)
+        self.assertEqual(out.getvalue().strip(), 'job: failed 1, generated 1')
+        self.assertIn('could not read job_logos/broken.png', err.getvalue())
+        self.assertEqual(Job.objects.get(title='old').logo_variants['sizes']['thumb']['height'], 48)
+
+        out = StringIO()
+        with self.assertLogs('app.images', 'WARNING'):
+            call_command('build_image_variants', '--model', 'job', stdout=out, stderr=StringIO())
+        self.assertEqual(out.getvalue().strip(), 'job: current 1, failed 1')
+
+
+class SeedTests(TestCase):
+    """Seeding is reproducible: the same seed and epoch give the same rows."""
+
+    def job_rows(self):
+        return list(Job.objects.order_by('id').values_list(
+            'title', 'company', 'salary', 'currency', 'jdata', 'created_at', 'updated_at', 'salary_base'))
+
+    def test_same_seed_same_rows(self):
+        seed.create_jobs(30, random.Random(7), batch_size=8)
+        first = self.job_rows()
+        Job.objects.all().delete()
+        seed.create_jobs(30, random.Random(7), batch_size=8)
+        self.assertEqual(self.job_rows(), first)
+        self.assertTrue(all(row[5] == row[6] <= seed.SEED_EPOCH for row in first))
+
+    def test_users_dated_from_epoch(self):
+        seed.create_users(3, random.Random(7), [], saved_per_user=0, recent_per_user=0)
+        for profile in Profile.objects.select_related('user'):
+            self.assertLessEqual(profile.user.date_joined, seed.SEED_EPOCH)
+            self.assertEqual(profile.updated_at, profile.user.date_joined)
+            self.assertEqual({entry.updated_at for entry in profile.work_experiences.all()}, {profile.updated_at})
+
+    def test_explicit_timestamps_restored_after_error(self):
+        field = Job._meta.get_field('created_at')
+        with self.assertRaises(ZeroDivisionError):
+            with seed.explicit_timestamps(Job, 'created_at'):
+                self.assertFalse(field.auto_now_add)
+                1 / 0
+        self.assertTrue(field.auto_now_add)
+
+    def test_seed_scale_force(self):
+        def run(*args):
+            call_command('seed_scale', '--jobs', '20', '--users', '4', '--batch-size', '10', *args, stdout=StringIO())
+
+        run()
+        emails = sorted(User.objects.values_list('email', flat=True))
+        with self.assertRaisesMessage(CommandError, 'already has data'):
+            run()
+        # The seeded users are replaced, not inserted again under the same unique emails
+        run('--force', '--epoch', '2024-06-01T00:00:00')
+        self.assertEqual(sorted(User.objects.values_list('email', flat=True)), emails)
+        self.assertEqual(Job.objects.count(), 40)
+        self.assertEqual(Job.objects.filter(created_at__lte=datetime(2024, 6, 1, tzinfo=dt_timezone.utc)).count(), 20)
+        with self.assertRaisesMessage(CommandError, '--epoch'):
+            run('--force', '--epoch', 'yesterday')
+
+
+class EmailDedupeMigrationTests(TestCase):
+    """Migration 0018 keeps every account: only the most recent one keeps a shared email."""
+
+    def test_duplicates_get_placeholders(self):
+        now = timezone.now()
+        # bulk_create skips the pre_save normalization, as the rows from before it did
+        old, *_ = User.objects.bulk_create([
+            User(username='old', email='Ann@Example.com', last_login=now - timedelta(days=30)),
+            User(username='active', email=' ann@example.com', last_login=now),
+            User(username='other', email='Bob@Example.com'),
+            User(username='blank', email=''),
+        ])
+        migration = import_module('app.migrations.0018_user_email_index')
+        migration.dedupe_emails(django_apps, SimpleNamespace(connection=connection))
+
+        emails = dict(User.objects.values_list('username', 'email'))
+        self.assertEqual(emails, {
+            'active': 'ann@example.com',
+            'old': f'dup-{old.pk}+Ann@Example.com',
+            'other': 'bob@example.com',
+            'blank': '',
+        })
+
+
+class ProfileBatchTests(TestCase):
+    """Work experience and education batches are validated up front and written in one transaction."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ann@example.com', email='ann@example.com')
+        cls.profile = Profile.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_experiences(self, count):
+        return [
+            WorkExperience.objects.create(profile=self.profile, job_title=f'Dev {i}', company='Acme',
+                                          start_date=date(2020, 1, 1), description='Backend')
+            for i in range(count)
+        ]
+
+    def experience_batch(self, size):
+        existing = self.make_experiences(size * 2)
+        return {
+            'experiences': [{'id': experience.id, 'company': 'Beta'} for experience in existing[:size]] + [
+                {'job_title': f'New {i}', 'company': 'Gamma', 'start_date': '2021-01-01', 'description': 'x'}
+                for i in range(size)
+            ],
+            'delete_ids': [experience.id for experience in existing[size:]],
+        }
+
+    def patch(self, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, format='json')
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        small, small_queries = self.patch('/api/profile/work_experience/', self.experience_batch(2))
+        large, large_queries = self.patch('/api/profile/work_experience/', self.experience_batch(40))
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(large.status_code, 200)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual((len(large.data['updated']), len(large.data['created']), large.data['deleted_count']), (40, 40, 40))
+        self.assertEqual(WorkExperience.objects.filter(company='Beta').count(), 42)
+
+    def test_invalid_item_writes_nothing(self):
+        experience, = self.make_experiences(1)
+        response, _ = self.patch('/api/profile/work_experience/', {
+            'experiences': [
+                {'id': experience.id, 'company': 'Beta'},
+                {'job_title': 'New', 'company': 'Gamma', 'description': 'no start date'},
+            ],
+            'delete_ids': [experience.id],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_date', response.data['detail'])
+        experience.refresh_from_db()
+        self.assertEqual(experience.company, 'Acme')
+        self.assertEqual(WorkExperience.objects.count(), 1)
+
+    def test_other_profiles_rows_are_not_found(self):
+        other = Profile.objects.create(user=User.objects.create_user(username='bob'))
+        theirs = WorkExperience.objects.create(profile=other, job_title='Dev', company='Acme',
+                                               start_date=date(2020, 1, 1), description='x')
+        response, _ = self.patch('/api/profile/work_experience/', {'experiences': [{'id': theirs.id, 'company': 'Mine'}]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['detail'], f'Work experience with ID {theirs.id} not found.')
+
+    def test_education_delete_removes_education(self):
+        education = Education.objects.create(profile=self.profile, level_of_education='BSc', university_name='KBTU',
+                                             field_of_study='CS', start_date=date(2016, 9, 1))
+        experience, = self.make_experiences(1)
+        # Same id in both tables: only the education row may go
+        WorkExperience.objects.filter(pk=experience.pk).update(id=education.id)
+        response, _ = self.patch('/api/profile/education/', {'educations': [], 'delete_ids': [education.id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted_count'], 1)
+        self.assertFalse(Education.objects.exists())
+        self.assertEqual(WorkExperience.objects.count(), 1)
+
+
+class ProfileReadTests(TestCase):
+    """get_profile reads in a fixed number of queries and serves a cached copy until something changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ann@example.com', email='ann@example.com', first_name='Ann')
+        cls.profile = Profile.objects.create(user=cls.user, skills=['python'])
+
+    def setUp(self):
+        get_cache().clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def add_entries(self, count):
+        WorkExperience.objects.bulk_create(
+            WorkExperience(profile=self.profile, job_title=f'Dev {i}', company='Acme',
+                           start_date=date(2015 + i % 5, 1, 1), description='Backend')
+            for i in range(count)
+        )
+        Education.objects.bulk_create(
+            Education(profile=self.profile, level_of_education='BSc', university_name='KBTU',
+                      field_of_study='CS', start_date=date(2010, 9, 1), end_date=date(2014 + i % 3, 6, 1))
+            for i in range(count)
+        )
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    @override_settings(PROFILE_CACHE_ENABLED=False)
+    def test_query_count_does_not_grow_with_entries(self):
+        self.get()  # Authenticated user cached from here on
+        self.add_entries(2)
+        _, few = self.get()
+        self.add_entries(30)
+        response, many = self.get()
+        # validators aggregate + profile/user + two prefetches
+        self.assertEqual((few, many), (4, 4))
+        self.assertEqual(len(response.data['work_experiences']), 32)
+        self.assertIn(' - Current (', response.data['work_experiences'][0]['duration'])
+
+    def test_cached_until_an_entry_changes(self):
+        self.add_entries(3)
+        first, _ = self.get()
+        self.assertEqual(first['X-Cache'], 'MISS')
+        second, queries = self.get()
+        self.assertEqual((second['X-Cache'], queries), ('HIT', 1))
+        self.assertEqual(second.data, first.data)
+
+        experience = WorkExperience.objects.filter(profile=self.profile).first()
+        experience.company = 'Beta'
+        experience.save()
+        third, _ = self.get()
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.data['work_experiences'][0]['company'], 'Beta')
+
+    def test_batch_writes_invalidate(self):
+        self.get()
+        response = self.client.patch('/api/profile/education/', {'educations': [{
+            'level_of_education': 'MSc', 'university_name': 'NU', 'field_of_study': 'CS', 'start_date': '2015-09-01',
+        }]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        after, _ = self.get()
+        self.assertEqual(after['X-Cache'], 'MISS')
+        self.assertEqual([education['university_name'] for education in after.data['educations']], ['NU'])
+
+    def test_name_change_invalidates(self):
+        self.get()
+        self.user.first_name = 'Anna'
+        self.user.save()
+        after, _ = self.get()
+        self.assertEqual(after.data['full_name'], 'Anna')
+
+
+@override_settings(JOB_FACET_SALARY_BUCKETS=[100_000, 1_000_000])
+class JobFacetTests(TestCase):
+    """jobsf/facets/ counts each facet under every filter except its own."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_job(job_type='remote', currency='Доллар', salary=500)
+        make_job(job_type='remote', currency='Теңге', salary=2000, location='Astana')
+        make_job(job_type='office', currency='Доллар', salary=7000)
+        make_job(job_type='hybrid', currency='Евро', salary=None)
+
+    def setUp(self):
+        get_cache().clear()
+
+    def get(self, query=''):
+        response = self.client.get(f'/api/jobsf/facets/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def counts(self, data, facet):
+        return {item['value']: item['count'] for item in data['facets'][facet]}
+
+    def test_counts_without_filters(self):
+        data = self.get().data
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(self.counts(data, 'job_type'), {'remote': 2, 'office': 1, 'hybrid': 1, 'full-time': 0})
+        self.assertEqual(self.counts(data, 'location'), {'Almaty': 3, 'Astana': 1})
+        self.assertEqual(data['facets']['salary'], [
+            {'min': 0, 'max': 100_000, 'count': 1},
+            {'min': 100_000, 'max': 1_000_000, 'count': 1},
+            {'min': 1_000_000, 'max': None, 'count': 1},
+        ])
+
+    def test_facet_ignores_its_own_filter(self):
+        data = self.get('?job_type=remote&currency=Доллар').data
+        self.assertEqual(data['count'], 1)
+        # Other job types under currency=Доллар, other currencies under job_type=remote
+        self.assertEqual(self.counts(data, 'job_type')['office'], 1)
+        self.assertEqual(self.counts(data, 'currency'), {'Доллар': 1, 'Теңге': 1, 'Евро': 0})
+        self.assertEqual(self.counts(data, 'location'), {'Almaty': 1})
+
+    def test_one_aggregate_per_facet(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get('?job_type=remote&min_salary=1000')
+        # No separate COUNT: the total comes from a facet that saw every filter
+        self.assertEqual(len([query for query in queries if 'GROUP BY' in query['sql']]), 4)
+        self.assertEqual(len([query for query in queries if 'app_job' in query['sql']]), 4)
+
+    def test_cached_across_paging_and_param_order(self):
+        self.assertEqual(self.get('?currency=Доллар&job_type=remote')['X-Cache'], 'MISS')
+        self.assertEqual(self.get('?job_type=remote&currency=Доллар&page=3')['X-Cache'], 'HIT')
+        make_job(job_type='remote', currency='Доллар')
+        response = self.get('?job_type=remote&currency=Доллар')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=False, BACKGROUND_TASKS_EAGER=True, SALARY_BASE_CURRENCY='Теңге')
+class SalaryBaseTests(TestCase):
+    """Salary filters and sorting compare amounts converted to the base currency."""
+
+    @classmethod
+    def setUpTestData(cls):
+        CurrencyRate.objects.update_or_create(currency='Доллар', defaults={'rate': 500})
+        CurrencyRate.objects.update_or_create(currency='Евро', defaults={'rate': 550})
+        cls.tenge = make_job(title='tenge', currency='Теңге', salary=400_000)
+        cls.dollar = make_job(title='dollar', currency='Доллар', salary=1000)
+        cls.euro = make_job(title='euro', currency='Евро', salary=2000)
+        cls.none = make_job(title='none', currency='Доллар', salary=None)
+
+    def titles(self, query):
+        response = self.client.get(f'/api/jobsf/{query}')
+        self.assertEqual(response.status_code, 200)
+        return [job['title'] for job in response.data['results']['results']]
+
+    def test_converted_on_save(self):
+        self.dollar.refresh_from_db()
+        self.assertEqual(self.dollar.salary_base, Decimal('500000.00'))
+        self.none.refresh_from_db()
+        self.assertIsNone(self.none.salary_base)
+
+    @override_settings(SALARY_DEFAULT_RATES={'Доллар': '450', 'Теңге': '2'})
+    def test_migration_uses_default_rates(self):
+        CurrencyRate.objects.all().delete()
+        Job.objects.update(salary_base=None)
+        migration = import_module('app.migrations.0017_salary_base')
+        migration.convert_salaries(django_apps, SimpleNamespace(connection=connection))
+        self.assertEqual(dict(CurrencyRate.objects.values_list('currency', 'rate')), {'Доллар': Decimal('450')})
+        # No rate for euros yet, so no base salary either
+        self.assertEqual(dict(Job.objects.values_list('title', 'salary_base')), {
+            'tenge': Decimal('400000.00'), 'dollar': Decimal('450000.00'), 'euro': None, 'none': None,
+        })
+
+    def test_range_filters_across_currencies(self):
+        self.assertEqual(sorted(self.titles('?min_salary=450000')), ['dollar', 'euro'])
+        self.assertEqual(sorted(self.titles('?min_salary=300000&max_salary=600000')), ['dollar', 'tenge'])
+        self.assertEqual(len(self.titles('?min_salary=abc')), 4)
+
+    def test_ordering(self):
+        self.assertEqual(self.titles('?ordering=-salary'), ['euro', 'dollar', 'tenge'])
+        self.assertEqual(self.titles('?ordering=salary&min_salary=450000'), ['dollar', 'euro'])
+
+    def test_rate_change_reconverts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rate = CurrencyRate.objects.get(currency='Доллар')
+            rate.rate = 300
+            rate.save()
+        self.dollar.refresh_from_db()
+        self.assertEqual(self.dollar.salary_base, Decimal('300000.00'))
+        self.assertEqual(self.titles('?ordering=salary'), ['dollar', 'tenge', 'euro'])
+
+    def test_import_converts(self):
+        rows = [(1, {'title': 'imported', 'company': 'Acme', 'location': 'Almaty', 'job_type': 'remote',
+                     'description': 'x', 'salary': '10', 'currency': 'Евро'}, None)]
+        self.assertEqual(import_jobs(rows)['created'], 1)
+        self.assertEqual(Job.objects.get(title='imported').salary_base, Decimal('5500.00'))
+
+
+@override_settings(METRICS_ENABLED=True, JOB_LIST_CACHE_ENABLED=False)
+class MetricsTests(TestCase):
+    """The metrics middleware records per-route timings that /metrics exposes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            make_job(title=f'Job {i}')
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def value(self, text, prefix):
+        return float(next(line for line in text.splitlines() if line.startswith(prefix)).rsplit(' ', 1)[1])
+
+    def test_records_per_route(self):
+        self.client.get('/api/jobsf/')
+        self.client.get('/api/jobsf/?page=2')
+        text = self.scrape()
+        self.assertIn('app_http_requests_total{route="api/jobsf/",method="GET",status="200"} 1', text)
+        self.assertIn('app_http_requests_total{route="api/jobsf/",method="GET",status="404"} 1', text)
+        self.assertIn('app_http_request_duration_seconds_bucket{route="api/jobsf/",le="+Inf"} 2', text)
+        self.assertGreater(self.value(text, 'app_db_queries_total{route="api/jobsf/"}'), 0)
+        self.assertGreater(self.value(text, 'app_serializer_seconds_total{route="api/jobsf/"}'), 0)
+        self.assertGreater(self.value(text, 'app_http_response_size_bytes_sum{route="api/jobsf/"}'), 0)
+
+    def test_model_serializers_are_timed(self):
+        user = User.objects.create_user(username='ann')
+        Profile.objects.create(user=user)
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.settings(PROFILE_CACHE_ENABLED=False):
+            self.assertEqual(client.get('/api/profile/').status_code, 200)  # ProfileSerializer, a ModelSerializer
+        self.assertGreater(self.value(self.scrape(), 'app_serializer_seconds_total{route="api/profile/"}'), 0)
+
+    async def test_async_requests(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(metrics.RequestMetricsMiddleware(get_response)))
+
+        self.assertEqual((await self.async_client.get('/api/async/jobsf/')).status_code, 200)
+        text = await sync_to_async(self.scrape)()
+        self.assertIn('app_http_requests_total{route="api/async/jobsf/",method="GET",status="200"} 1', text)
+        # The async ORM runs the queries in a thread, still counted
+        self.assertGreater(self.value(text, 'app_db_queries_total{route="api/async/jobsf/"}'), 0)
+
+        # A DRF view under the async handler still goes through process_template_response
+        self.assertEqual((await self.async_client.get('/api/jobsf/')).status_code, 200)
+        text = await sync_to_async(self.scrape)()
+        self.assertGreater(self.value(text, 'app_render_seconds_total{route="api/jobsf/"}'), 0)
+
+    def test_task_stats_reused_between_scrapes(self):
+        with CaptureQueriesContext(connection) as first:
+            self.scrape()
+        with CaptureQueriesContext(connection) as second:
+            self.scrape()
+        self.assertEqual((len(first), len(second)), (2, 0))
+        with override_settings(METRICS_TASK_STATS_TTL=0), CaptureQueriesContext(connection) as third:
+            self.scrape()
+        self.assertEqual(len(third), 2)
+
+    def test_only_served_locally(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_logs_slow_queries(self):
+        with self.assertLogs('app.metrics', 'WARNING') as logs:
+            self.client.get('/api/jobsf/')
+        self.assertIn('api/jobsf/', logs.output[0])
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.client.get('/api/jobsf/')
+        self.assertNotIn('route="api/jobsf/"', self.scrape())
+
+
+class AuthUserCacheTests(TestCase):
+    """JWT requests reuse the cached user and profile id until either one changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ann@example.com', email='ann@example.com', first_name='Ann')
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_hits_skip_the_user_query(self):
+        _, cold = self.get('/api/saved-jobs/')
+        response, warm = self.get('/api/saved-jobs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(warm, cold - 1)
+
+    def test_profile_id_needs_no_query(self):
+        profile = Profile.objects.create(user=self.user)
+        WorkExperience.objects.create(profile=profile, job_title='Dev', company='Acme',
+                                      start_date=date(2020, 1, 1), description='Backend')
+        self.get('/api/profile/work_experience/list/')
+        response, queries = self.get('/api/profile/work_experience/list/')
+        self.assertEqual(response.status_code, 200)
+        # Validators aggregate and the list itself
+        self.assertEqual(queries, 2)
+
+    def test_profile_created_later(self):
+        self.assertEqual(self.get('/api/profile/work_experience/list/')[0].status_code, 404)
+        Profile.objects.create(user=self.user)
+        self.assertEqual(self.get('/api/profile/work_experience/list/')[0].status_code, 200)
+
+    def test_user_changes_evict(self):
+        self.get('/api/saved-jobs/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get('/api/saved-jobs/')[0].status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_bounded(self):
+        for user_id in range(5):
+            user_cache.set(str(user_id), (), None, user_cache.generation)
+        self.assertEqual(list(user_cache.entries), ['3', '4'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(TestCase):
+    """Emails are matched case-insensitively through the auth_user email index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ann@example.com', email=' Ann@Example.com',
+                                            password='secret-pass', first_name='Ann')
+
+    def test_email_stored_normalized(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'ann@example.com')
+
+    def test_login_ignores_case(self):
+        response = self.client.post('/api/login/', {'email': 'ANN@example.COM', 'password': 'secret-pass'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+
+    def test_bad_credentials(self):
+        for email, password in (('ann@example.com', 'wrong'), ('nobody@example.com', 'secret-pass')):
+            response = self.client.post('/api/login/', {'email': email, 'password': password},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Invalid credentials.']})
+
+    def test_register_rejects_case_duplicate(self):
+        response = self.client.post('/api/register/', {'email': 'ANN@example.com', 'password': 'another-pass',
+                                                       'first_name': 'Ann'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    def test_lookup_uses_index(self):
+        plan = User.objects.filter(email='ann@example.com').explain()
+        self.assertIn('auth_user_email', plan)
+
+    async def test_async_login(self):
+        client = AsyncClient()
+        response = await client.post('/api/async/login/', {'email': 'Ann@example.com', 'password': 'secret-pass'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.json())
+        response = await client.post('/api/async/login/', {'email': 'ann@example.com', 'password': 'wrong'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((await client.get('/api/async/login/')).status_code, 405)
+
+
+PDF = b'%PDF-1.4\n' + b'resume text ' * 100
+
+
+class ResumeStorageTests(TestCase):
+    """Resumes are stored once per content and deleted with their last reference."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media, RESUME_MAX_SIZE=4096, BACKGROUND_TASKS_EAGER=True))
+        cls.addClassCleanup(shutil.rmtree, cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'u{i}@example.com', email=f'u{i}@example.com') for i in range(2)]
+        for user in cls.users:
+            Profile.objects.create(user=user)
+
+    def upload(self, content, name='cv.pdf', user=0):
+        client = APIClient()
+        client.force_authenticate(self.users[user])
+        return client.post('/api/upload_resume/', {'resume': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def stored_files(self):
+        return sorted(ResumeFile.objects.values_list('file', 'ref_count'))
+
+    def test_same_bytes_stored_once(self):
+        for user in (0, 0, 1):
+            self.assertEqual(self.upload(PDF, user=user).status_code, 200)
+        [(name, refs)] = self.stored_files()
+        self.assertEqual(refs, 2)
+        self.assertTrue(name.startswith('resumes/') and name.endswith('.pdf'))
+        self.assertEqual(default_storage.listdir(name.rsplit('/', 1)[0])[1], [name.rsplit('/', 1)[1]])
+        self.assertEqual(set(Profile.objects.values_list('resume', flat=True)), {name})
+
+    def test_replaced_file_is_deleted(self):
+        self.upload(PDF)
+        [(old, _)] = self.stored_files()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(PDF + b'v2')
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertFalse(default_storage.exists(old))
+
+    def test_profile_deleted(self):
+        self.upload(PDF)
+        [(name, _)] = self.stored_files()
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.filter(user=self.users[0]).delete()
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(default_storage.exists(name))
+
+    def test_limits(self):
+        self.assertEqual(self.upload(b'%PDF-' + b'x' * 5000).status_code, 413)
+        # Checked against the content, not the name
+        self.assertEqual(self.upload(b'MZ\x90\x00 not a pdf', name='cv.pdf').status_code, 415)
+        self.assertEqual(self.upload(b'tiny', name='cv.pdf').status_code, 415)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_compact_adopts_old_uploads(self):
+        for user in self.users:
+            # The old view stored every upload under its own random name
+            name = default_storage.save('resumes/IMG_0002.JPG', SimpleUploadedFile('IMG_0002.JPG', b'\xff\xd8\xff jpeg'))
+            Profile.objects.filter(user=user).update(resume=name)
+        default_storage.save('resumes/IMG_0002.JPG', SimpleUploadedFile('IMG_0002.JPG', b'\xff\xd8\xff jpeg'))
+        call_command('compact_resumes', '--delete-orphans', stdout=StringIO())
+        [(name, refs)] = self.stored_files()
+        self.assertEqual(refs, 2)
+        self.assertEqual(default_storage.listdir('resumes')[1], [])
+
+    def unattached_file(self, content, age):
+        name = default_storage.save('resumes/aa/unattached.pdf', SimpleUploadedFile('cv.pdf', content))
+        resume = ResumeFile.objects.create(sha256=name[-20:], file=name, size=len(content), content_type='application/pdf')
+        ResumeFile.objects.filter(pk=resume.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+        return name
+
+    def test_recount_keeps_new_unattached_files(self):
+        # store_resume has committed the row, attach_resume hasn't yet
+        name = self.unattached_file(PDF, age=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(resumes.recount(), [])
+        self.assertEqual(self.stored_files(), [(name, 0)])
+        self.assertTrue(default_storage.exists(name))
+
+    def test_recount_deletes_old_unattached_files(self):
+        name = self.unattached_file(PDF, age=7200)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(resumes.recount(), [name])
+        # The file goes only once the row's deletion has committed
+        self.assertTrue(default_storage.exists(name))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(default_storage.exists(name))
+
+
+def fake_ocr(data):
+    return 'Scanned: Django developer'
+
+
+def make_docx(*paragraphs):
+    namespace = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{namespace}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ResumeTextTests(TestCase):
+    """Resume text is extracted after upload, once per content, and searchable."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+        cls.addClassCleanup(shutil.rmtree, cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        make_job(jdata={'skills': ['python', 'django', 'machine learning']})
+        cls.users = [User.objects.create_user(username=f'r{i}@example.com', email=f'r{i}@example.com') for i in range(2)]
+        cls.profiles = [Profile.objects.create(user=user) for user in cls.users]
+        cls.staff = User.objects.create_user(username='staff@example.com', email='staff@example.com', is_staff=True)
+
+    def upload(self, content, name, user=0):
+        client = APIClient()
+        client.force_authenticate(self.users[user])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/upload_resume/', {'resume': SimpleUploadedFile(name, content)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def search(self, terms):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        return client.get('/api/candidates/', {'search': terms})
+
+    def test_extracted_and_searchable(self):
+        self.upload(make_docx('Backend developer', 'Python, Django and Machine  Learning'), 'cv.docx')
+        extracted = ResumeText.objects.get(profile=self.profiles[0])
+        self.assertEqual(extracted.text, 'Backend developer\nPython, Django and Machine Learning')
+        self.assertEqual(extracted.skills, ['django', 'machine learning', 'python'])
+
+        response = self.search('djang')
+        self.assertEqual(response.status_code, 200)
+        [candidate] = response.data['results']
+        self.assertEqual(candidate['id'], self.profiles[0].id)
+        self.assertIn('[Django]', candidate['snippet'])
+        self.assertEqual(self.search('kotlin').data['count'], 0)
+
+    def test_extracted_once_per_content(self):
+        pdf = b'%PDF-1.4\nstream\nBT (Python developer) Tj ET\nendstream\n'
+        self.upload(pdf, 'cv.pdf')
+        with mock.patch.object(resume_text, 'extract_text', wraps=resume_text.extract_text) as extract:
+            self.upload(pdf, 'cv.pdf', user=1)  # Same bytes, another profile: copied
+            self.assertEqual(resume_text.extract_profile_resume(self.profiles[0].pk), 'current')
+            self.upload(pdf + b'%changed', 'cv.pdf')
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(ResumeText.objects.get(profile=self.profiles[1]).skills, ['python'])
+
+    @override_settings(RESUME_TEXT_EXTRACTORS={'png': 'app.tests.fake_ocr'})
+    def test_pluggable_extractor(self):
+        self.upload(b'\x89PNG\r\n\x1a\n' + b'\x00' * 32, 'scan.png')
+        self.assertEqual(ResumeText.objects.get(profile=self.profiles[0]).skills, ['django'])
+
+    def test_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.get('/api/candidates/').status_code, 403)
+
+
+CALLS = []
+
+
+def record_call(value):
+    CALLS.append(value)
+
+
+def failing_task():
+    raise ValueError('boom')
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=False, TASK_RETRY_BACKOFF=0, PERIODIC_TASKS={})
+class TaskQueueTests(TestCase):
+    """The database task queue: ordering, retries, keys, schedules and metrics."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def work(self):
+        tasks.Worker(poll_interval=0).run(burst=True)
+
+    def test_priority_and_schedule(self):
+        tasks.enqueue(record_call, ['low'])
+        tasks.enqueue(record_call, ['high'], priority=5)
+        later = tasks.enqueue(record_call, ['later'], delay=60)
+        self.work()
+        self.assertEqual(CALLS, ['high', 'low'])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Task.PENDING)
+        self.assertEqual(TaskStat.objects.get(name='app.tests.record_call').succeeded, 2)
+
+    def test_retries_then_fails(self):
+        task = tasks.enqueue(failing_task, max_attempts=2)
+        with self.assertLogs('app.tasks', 'ERROR'):
+            self.work()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertIn('ValueError: boom', task.last_error)
+        stat = TaskStat.objects.get(name='app.tests.failing_task')
+        self.assertEqual((stat.retried, stat.failed), (1, 1))
+
+    def test_pending_duplicates_are_merged(self):
+        first = tasks.enqueue(record_call, ['a'], key='k')
+        self.assertEqual(tasks.enqueue(record_call, ['a'], key='k'), first)
+        run_in_background(record_call, 'b')
+        run_in_background(record_call, 'b')
+        self.assertEqual(Task.objects.count(), 2)
+        self.work()
+        self.assertEqual(CALLS, ['a', 'b'])
+        # Finished: the same key can be queued again
+        self.assertNotEqual(tasks.enqueue(record_call, ['a'], key='k'), first)
+
+    def test_long_arguments_keep_distinct_keys(self):
+        ids = list(range(1000))
+        run_in_background(record_call, ids)
+        run_in_background(record_call, ids + [1000])
+        run_in_background(record_call, ids)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        task = tasks.enqueue(record_call, ['again'])
+        Task.objects.filter(pk=task.pk).update(status=Task.RUNNING, locked_by='dead:1',
+                                               locked_until=timezone.now() - timedelta(seconds=1))
+        self.work()
+        self.assertEqual(CALLS, ['again'])
+
+    @override_settings(PERIODIC_TASKS={'tick': {'task': 'app.tests.record_call', 'args': ['tick'], 'every': 60}})
+    def test_periodic(self):
+        self.work()
+        self.work()
+        self.assertEqual(CALLS, ['tick'])
+        done = Task.objects.get(idempotency_key='periodic:tick', status=Task.DONE)
+        upcoming = Task.objects.get(idempotency_key='periodic:tick', status=Task.PENDING)
+        self.assertEqual(upcoming.run_at, done.finished_at + timedelta(seconds=60))
+
+    def test_signals_enqueue(self):
+        job = make_job()
+        self.assertTrue(Task.objects.filter(name='app.recommend.jobs_added', args=[[job.pk]]).exists())
+
+    def queued(self):
+        names = sorted(Task.objects.values_list('name', flat=True))
+        Task.objects.all().delete()
+        return names
+
+    def test_unchanged_fields_enqueue_nothing(self):
+        user = User.objects.create_user(username='t@example.com', email='t@example.com')
+        profile = Profile.objects.create(user=user, skills=['python'])
+        self.assertEqual(self.queued(), ['app.recommend.refresh_user'])
+
+        profile.about_me = 'Hi'
+        profile.save()
+        profile = Profile.objects.get(pk=profile.pk)
+        profile.job_title = 'Dev'
+        profile.save()
+        self.assertEqual(self.queued(), [])
+
+        resume = ResumeFile.objects.create(sha256='0' * 64, file='resumes/00/cv.pdf', size=1, content_type='application/pdf')
+        resumes.attach_resume(profile, resume)
+        self.assertEqual(self.queued(), ['app.resume_text.extract_profile_resume'])
+
+        profile.skills.append('django')
+        profile.save()
+        self.assertEqual(self.queued(), ['app.recommend.refresh_user'])
+
+        job = make_job()
+        self.queued()
+        job.title = 'Renamed'
+        job.save()
+        self.assertEqual(self.queued(), [])
+        job.logo = 'job_logos/new.png'
+        job.save()
+        self.assertEqual(self.queued(), ['app.images.generate_image_variants'])
+
+    @override_settings(METRICS_TASK_STATS_TTL=0)
+    def test_metrics(self):
+        tasks.enqueue(record_call, ['x'])
+        tasks.enqueue(record_call, ['y'], delay=60)
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('app_task_queue_depth{task="app.tests.record_call",state="ready"} 1', body)
+        self.assertIn('app_task_queue_depth{task="app.tests.record_call",state="scheduled"} 1', body)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, RECOMMENDATION_TOP_K=3)
+class RecommendationTests(TestCase):
+    """Precomputed top-k lists, kept current as jobs and skills change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ann@example.com', email='ann@example.com')
+        cls.profile = Profile.objects.create(user=cls.user, skills=['Python', 'Django '])
+        cls.django_job = make_job(title='Django dev', jdata={'skills': ['python', 'django']})
+        cls.python_job = make_job(title='Python dev', jdata={'skills': ['python', 'pandas']})
+        make_job(title='Designer', jdata={'skills': ['figma']})
+
+    def setUp(self):
+        recommend.reset_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def compute(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/jobs/recommended/')
+        self.assertEqual(response.status_code, 202)
+
+    def titles(self):
+        response = self.client.get('/api/jobs/recommended/')
+        self.assertEqual(response.status_code, 200)
+        return [item['job']['title'] for item in response.data['results']]
+
+    def test_first_visit_is_queued_then_served_by_lookup(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get('/api/jobs/recommended/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {'count': 0, 'results': [], 'pending': True})
+        self.assertFalse(RecommendedJobs.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.titles(), ['Django dev', 'Python dev'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/jobs/recommended/')
+        self.assertEqual(len(queries), 2)
+        first = response.data['results'][0]
+        self.assertEqual(first['matched_skills'], ['django', 'python'])
+        self.assertAlmostEqual(first['score'], 1.0, places=5)
+
+    def test_new_and_deleted_jobs_are_merged(self):
+        self.compute()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_job(title='Another Django dev', jdata={'skills': ['django', 'python']})
+        self.assertEqual(self.titles(), ['Another Django dev', 'Django dev', 'Python dev'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.django_job.delete()
+        self.assertEqual(self.titles(), ['Another Django dev', 'Python dev'])
+
+    def test_edit_that_drops_skills_leaves_the_lists(self):
+        self.compute()
+        job = Job.objects.get(pk=self.django_job.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            job.jdata = {'skills': ['figma']}
+            job.save()
+        self.assertEqual(self.titles(), ['Python dev'])
+
+    def test_edit_without_skill_change_queues_nothing(self):
+        job = Job.objects.get(pk=self.django_job.pk)
+        job.title = 'Senior Django dev'
+        job.jdata = {'skills': ['Django', 'python']}  # Same skills once normalized
+        with mock.patch('app.signals.run_in_background') as queued:
+            job.save()
+        self.assertNotIn(recommend.jobs_changed, [call.args[0] for call in queued.call_args_list])
+
+    def test_skill_change_recomputes(self):
+        self.compute()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.skills = ['Figma']
+            self.profile.save()
+        self.assertEqual(self.titles(), ['Designer'])
+        self.assertEqual(list(RecommendedSkill.objects.values_list('skill', flat=True)), ['figma'])
+
+    def test_lists_are_found_by_skill(self):
+        other = User.objects.create_user(username='bob@example.com', email='bob@example.com')
+        Profile.objects.create(user=other, skills=['Figma'])
+        recommend.refresh_user(self.user.pk)
+        recommend.refresh_user(other.pk)
+        self.assertEqual(list(recommend.lists_with_skills(['python']).values_list('user_id', flat=True)), [self.user.pk])
+        self.assertEqual(list(recommend.lists_with_skills(['figma']).values_list('user_id', flat=True)), [other.pk])
+
+    def test_index_is_patched_not_rebuilt(self):
+        index = recommend.get_index()
+        job = make_job(title='Go dev', jdata={'skills': ['go', 'python']})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIs(recommend.get_index(), index)
+        # One range over recently saved jobs, plus loading the new one
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertEqual(index.skills_of(job.pk), ['go', 'python'])
+        self.assertIn('go', index.vocabulary)
+
+    def test_job_deleted_elsewhere_is_dropped(self):
+        recommend.get_index()
+        with mock.patch('app.signals.run_in_background'):
+            Job.objects.filter(pk=self.django_job.pk).delete()
+        recommend.refresh_user(self.user.pk)
+        self.assertEqual(RecommendedJobs.objects.get(user=self.user).job_ids, [self.python_job.pk])
+
+    def test_patched_jobs_score_like_built_ones(self):
+        index = recommend.SkillIndex([1, 2], [['django', 'python'], ['python']])
+        index.update(3, ['django', 'python'])
+        index.update(2, None)
+        self.assertEqual(index.top_k(['python'])[0], [3, 1])
+        scores = index.top_k(['django', 'python'])[1]
+        self.assertAlmostEqual(scores[0], scores[1], places=5)
+        rebuilt = index.rebuilt()
+        self.assertEqual(rebuilt.size, 2)
+        self.assertEqual(rebuilt.top_k(['python'])[0], [3, 1])
+
+    def test_without_profile(self):
+        self.client.force_authenticate(User.objects.create_user(username='nobody'))
+        self.assertEqual(self.client.get('/api/jobs/recommended/').status_code, 404)
+
+
+@override_settings(RECENT_JOBS_FLUSH_INTERVAL=None, RECENT_JOBS_HISTORY_LIMIT=3)
+class RecentJobBufferTests(TestCase):
+    """Job views are buffered, de-duplicated and bulk-written; histories are capped."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ann@example.com', email='ann@example.com')
+        cls.jobs = [make_job(title=f'Job {i}') for i in range(5)]
+
+    def setUp(self):
+        recent.flush()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def view(self, job):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/recent-jobs/', {'job_id': job.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def history(self):
+        response = self.client.get('/api/recent-jobs/')
+        return [item['job']['title'] for item in response.data]
+
+    def test_views_are_buffered_and_deduplicated(self):
+        # Only the existence check, nothing is written yet
+        self.assertEqual([self.view(job) for job in (self.jobs[0], self.jobs[1], self.jobs[0])], [1, 1, 1])
+        self.assertFalse(RecentJob.objects.exists())
+        self.assertEqual(recent.pending_count(), 2)
+
+        self.assertEqual(self.history(), ['Job 0', 'Job 1'])
+        self.assertEqual(RecentJob.objects.count(), 2)
+        self.assertEqual(recent.pending_count(), 0)
+
+    def test_history_is_capped(self):
+        for job in self.jobs:
+            self.view(job)
+        self.assertEqual(self.history(), ['Job 4', 'Job 3', 'Job 2'])
+        self.assertEqual(RecentJob.objects.filter(user=self.user).count(), 3)
+
+    def test_job_deleted_before_flush_is_skipped(self):
+        self.view(self.jobs[0])
+        self.view(self.jobs[1])
+        self.jobs[0].delete()
+        self.assertEqual(self.history(), ['Job 1'])
+
+    def test_unknown_job(self):
+        response = self.client.post('/api/recent-jobs/', {'job_id': 999999}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(JOB_LIST_CACHE_ENABLED=False, READ_REPLICA_LAG=0)
+class DatabaseRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw12345678')
+        Job.objects.create(title='Job', company='Acme', location='Almaty', job_type='remote',
+                           description='...', salary=Decimal('100'), currency='Теңге')
+        self.routed = []
+
+        def spy(router, model, **hints):
+            # Record where reads would go outside the test's transaction, but run them on the test database
+            self.routed.append(db._read_alias.get() or 'default')
+            return 'default'
+
+        patches = [mock.patch.object(db.ReadReplicaRouter, 'db_for_read', spy),
+                   mock.patch.object(db, 'get_replica_alias', return_value='replica')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_public_lists_read_from_the_replica(self):
+        for path in ('/api/jobsf/', '/api/jobs/', '/api/async/jobsf/'):
+            self.routed.clear()
+            self.assertEqual(self.client.get(path).status_code, 200)
+            self.assertIn('replica', self.routed, path)
+            self.assertNotIn('default', self.routed, path)
+
+    @override_settings(READ_REPLICA_LAG=60)
+    def test_lists_read_from_the_primary_right_after_a_write(self):
+        # setUp's job was just written: the replica may not have it yet
+        self.assertEqual(self.client.get('/api/jobsf/').status_code, 200)
+        self.assertEqual(set(self.routed), {'default'})
+        with mock.patch.object(db.time, 'time', return_value=time.time() + 61):
+            self.routed.clear()
+            self.client.get('/api/jobsf/')
+        self.assertIn('replica', self.routed)
+
+    async def test_async_requests_stay_async(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(db.ReadReplicaMiddleware(get_response)))
+        self.assertEqual((await self.async_client.get('/api/async/jobsf/')).status_code, 200)
+        self.assertIn('replica', self.routed)
+        self.assertNotIn('default', self.routed)
+
+    def test_replica_needs_a_shared_cache(self):
+        self.assertEqual(db.check_replica_cache(), [])
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                  'job_lists': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([error.id for error in db.check_replica_cache()], ['app.E002'])
+
+    def test_other_requests_read_from_the_primary(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/saved-jobs/').status_code, 200)
+        client.post('/api/saved-jobs/', {'job_id': Job.objects.get().pk}, format='json')
+        self.assertTrue(self.routed)
+        self.assertEqual(set(self.routed), {'default'})
+        # Nothing leaks into code running after the request
+        self.assertIsNone(db._read_alias.get())
+
+    def test_writes_and_transactions_use_the_primary(self):
+        router = db.ReadReplicaRouter()
+        token = db._read_alias.set('replica')
+        try:
+            self.assertEqual(router.db_for_write(Job), 'default')
+            # TestCase wraps every test in a transaction on the primary
+            self.assertEqual(router.db_for_read(Job), 'default')
+        finally:
+            db._read_alias.reset(token)
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        wrapper = connections.create_connection('default')
+        try:
+            with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -1000}):
+                with wrapper.cursor() as cursor:
+                    self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 1234)
+                    self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -1000)
+                    self.assertEqual(cursor.execute('PRAGMA query_only').fetchone()[0], 0)
+        finally:
+            wrapper.close()
+
+    def test_replica_connections_are_read_only(self):
+        wrapper = connections.create_connection('default')
+        wrapper.alias = 'replica'
+        try:
+            with wrapper.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA query_only').fetchone()[0], 1)
+        finally:
+            wrapper.close()
@@ -2,12 +2,15 @@
 from django.urls import path
 from .views import register, CustomTokenObtainPairView,ResumeUploadView,JobListView
 from . import views
+from . import async_views
 
 urlpatterns = [
     path('register/', register, name='register'),
     path('login/', CustomTokenObtainPairView.as_view(), name='login'),
     path('jobs/', views.job_list, name='job-list'),
     path('jobs/create/', views.job_create, name='job-create'),
+    path('jobs/bulk/', views.job_bulk_create, name='job-bulk-create'),
+    path('jobs/recommended/', views.RecommendedJobView.as_view(), name='recommended-jobs'),
     path('saved-jobs/', views.SavedJobView.as_view(), name='saved-jobs'),
     path('recent-jobs/', views.RecentJobView.as_view(), name='recent-jobs'),
     path('saved-jobs/<int:job_id>/', views.SavedJobDetailView.as_view(), name='saved-job-detail'),
@@ -20,4 +23,14 @@ urlpatterns = [
     path('profile/skills/', views.save_skills, name='save_skills'),
     path('upload_resume/', ResumeUploadView.as_view(), name='upload_resume'),  # URL pattern for the FBV
     path('jobsf/', JobListView.as_view(), name='job-list'),
+    path('jobsf/facets/', views.JobFacetView.as_view(), name='job-facets'),
+    path('candidates/', views.CandidateSearchView.as_view(), name='candidate-search'),
+
+    # Async twins of the read endpoints above, for ASGI deployments
+    path('async/jobs/', async_views.job_list, name='async-job-list'),
+    path('async/jobsf/', async_views.job_list_filtered, name='async-job-list-filtered'),
+    path('async/saved-jobs/', async_views.saved_jobs, name='async-saved-jobs'),
+    path('async/recent-jobs/', async_views.recent_jobs, name='async-recent-jobs'),
+    path('async/profile/', async_views.get_profile, name='async-get-profile'),
+    path('async/login/', async_views.login, name='async-login'),
 ]
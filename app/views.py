@@ -12,17 +12,32 @@ from rest_framework.decorators import api_view
 from django.views.decorators.csrf import csrf_exempt
 from .models import *
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.filters import SearchFilter
+from .search import CandidateSearchFilter, JobSearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.pagination import PageNumberPagination
+from .pagination import JobPagination, JobCursorPagination, get_limit_offset
+from .cache import cached_response, profile_namespace
+from .conditional import (
+    conditional_response, job_list_validators, profile_state, profile_validators,
+    work_experience_state, work_experience_validators,
+)
+from .streaming import STREAM_FORMATS, streaming_response
+from .ingest import detect_format, import_jobs, parse_rows
+from .auth import get_profile_id
+from .batch import apply_profile_batch
+from .recommend import get_top_k, job_skills, refresh_user
+from .background import run_in_background
+from .recent import flush as flush_recent_views, record_view
+from .facets import compute_facets, without_params
+from .resumes import ResumeRejected, ResumeUploadHandler, check_content_length, upload_resume
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser
 from rest_framework.generics import ListAPIView
-from datetime import timedelta
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 from django_filters import rest_framework as filters
 
 from django.utils import timezone
-class JobPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
+from django.conf import settings
 
 
 class JobNameFilter(filters.FilterSet):
@@ -34,21 +49,40 @@ class JobNameFilter(filters.FilterSet):
         model = Job
         fields = ['title']
 
+SALARY_ORDERINGS = {
+    'salary': ('salary_base', 'id'),
+    '-salary': ('-salary_base', '-id'),
+}
+
+
+def parse_salary(value):
+    """A min_salary/max_salary value as a Decimal, None when missing or not a number."""
+    if not value:
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
 class JobListView(ListAPIView):
-    queryset = Job.objects.all()
+    queryset = Job.objects.order_by('-created_at', '-id')
     serializer_class = JobSerializer
     pagination_class = JobPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, JobSearchFilter]
     filterset_fields = ['job_type', 'location', 'salary','currency']
     search_fields = ['title', 'description', 'company']
 
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
-        print(self.request.query_params)
-        # Filter by minimum salary
-        min_salary = self.request.query_params.get('min_salary')
-        if min_salary:
-            queryset = queryset.filter(salary__gte=min_salary)
+        # Salary range, in the base currency so jobs in different currencies compare
+        min_salary = parse_salary(self.request.query_params.get('min_salary'))
+        if min_salary is not None:
+            queryset = queryset.filter(salary_base__gte=min_salary)
+        max_salary = parse_salary(self.request.query_params.get('max_salary'))
+        if max_salary is not None:
+            queryset = queryset.filter(salary_base__lte=max_salary)
 
         # Filter by published time (last n days)
         publish_time = self.request.query_params.get('publish_time')
@@ -69,35 +103,102 @@ class JobListView(ListAPIView):
         if job_type_param:
             queryset = queryset.filter(job_type__in=job_type_param)
 
+        # ?ordering=salary / -salary walks job_salary_base_idx; jobs without a
+        # comparable salary have no place in that order and are left out.
+        # Cursor pagination always pages by date.
+        ordering = self.request.query_params.get('ordering')
+        if ordering in SALARY_ORDERINGS:
+            queryset = queryset.filter(salary_base__isnull=False).order_by(*SALARY_ORDERINGS[ordering])
+
         return queryset
 
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or a ?cursor= link) switches to keyset paging,
+        # everything else keeps the page-number behaviour old clients expect
+        if not hasattr(self, '_paginator'):
+            if JobCursorPagination.is_requested(self.request):
+                self._paginator = JobCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get(self, request, *args, **kwargs):
-        # Get filtered queryset
-        queryset = self.filter_queryset(self.get_queryset())
+        # Polling clients get a 304 from the jobs cache version, without any SQL
+        return conditional_response(
+            request,
+            job_list_validators(request, 'jobsf'),
+            lambda: cached_response(request, 'jobsf', lambda: self.list(request, *args, **kwargs)),
+        )
+
+    def list(self, request, *args, **kwargs):
+        # Get filtered queryset, as plain rows for the fast read serializer
+        queryset = JobReadSerializer.values(self.filter_queryset(self.get_queryset()))
         
         # Get paginated data
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
+            serializer = JobReadSerializer(page, context=self.get_serializer_context())
             return self.get_paginated_response({
-                'count': queryset.count(),  # Include total count of filtered jobs
+                'count': self.paginator.get_count(),  # Reuse the paginator's count, if any
                 'results': serializer.data
             })
 
         # If pagination is not used, return full data
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = JobReadSerializer(queryset, context=self.get_serializer_context())
         return Response({
             'count': queryset.count(),  # Include total count of filtered jobs
             'results': serializer.data
         })
 
+def filter_jobs(request, queryset):
+    """Apply JobListView's filters (filterset fields, search, min_salary, ...) to ``queryset``."""
+    view = JobListView(request=request, format_kwarg=None, args=(), kwargs={})
+    return view.filter_queryset(queryset)
+
+
+# Paging parameters don't change the counts, so they are left out of the cache key
+PAGING_PARAMS = ['page', 'page_size', 'cursor', 'pagination', 'with_count', 'limit', 'offset']
+
+
+class JobFacetView(APIView):
+    """Counts per job_type, currency, location and salary bucket for the /jobsf/ filters in the query string."""
+
+    def get(self, request):
+        request = without_params(request, PAGING_PARAMS)
+        return cached_response(
+            request, 'jobsf-facets',
+            lambda: Response(compute_facets(request, lambda req: filter_jobs(req, Job.objects.all()))),
+        )
+
+
+class CandidateSearchView(ListAPIView):
+    """Profiles whose resume text matches ``?search=``, best match first (staff only).
+
+    The text is extracted in the background after each upload (app/resume_text.py).
+    """
+    permission_classes = [IsAdminUser]
+    queryset = (Profile.objects.filter(resume_text__isnull=False)
+                .select_related('user', 'resume_text').defer('resume_text__text')
+                .order_by('-resume_text__extracted_at', '-resume_text__profile_id'))
+    serializer_class = CandidateSerializer
+    pagination_class = JobPagination
+    filter_backends = [CandidateSearchFilter]
+    search_fields = ['resume_text__text']
+
+
 class SavedJobView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Query saved jobs for the authenticated user
-        saved_jobs = SavedJob.objects.filter(user=request.user)
-        serializer = SavedJobSerializer(saved_jobs, many=True)
+        # Query saved jobs for the authenticated user: one COUNT plus one joined
+        # SELECT for the requested window (?limit=&offset=)
+        saved_jobs = SavedJob.objects.filter(user=request.user).order_by('-saved_at', '-id')
+        limit, offset = get_limit_offset(
+            request, settings.SAVED_JOBS_PAGE_SIZE, settings.SAVED_JOBS_MAX_PAGE_SIZE
+        )
+        rows = SavedJobReadSerializer.values(saved_jobs)[offset:offset + limit]
+        serializer = SavedJobReadSerializer(rows)
         
         data = {
             "count": saved_jobs.count(),
@@ -120,6 +221,38 @@ class SavedJobView(APIView):
 
 
 
+class RecommendedJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # The list is precomputed (app/recommend.py): one lookup plus one SELECT for this page
+        recommended = RecommendedJobs.objects.filter(user=request.user).first()
+        if recommended is None:
+            if get_profile_id(request.user) is None:
+                return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+            # First visit: a worker computes the list, the client asks again later
+            run_in_background(refresh_user, request.user.pk)
+            return Response({"count": 0, "results": [], "pending": True}, status=status.HTTP_202_ACCEPTED)
+
+        limit, offset = get_limit_offset(request, settings.RECOMMENDED_JOBS_PAGE_SIZE, get_top_k())
+        page = list(zip(recommended.job_ids, recommended.scores))[offset:offset + limit]
+        jobs = Job.objects.filter(id__in=[job_id for job_id, _ in page])
+        rows = {row['id']: row for row in JobReadSerializer.values(jobs)}
+        serializer = JobReadSerializer()
+        profile_skills = set(recommended.skills)
+
+        results = [
+            {
+                "job": serializer.to_representation(rows[job_id]),
+                "score": score,
+                "matched_skills": [skill for skill in job_skills(rows[job_id]['jdata']) if skill in profile_skills],
+            }
+            for job_id, score in page
+            if job_id in rows  # deleted since the list was computed
+        ]
+        return Response({"count": len(recommended.job_ids), "results": results})
+
+
 class SavedJobDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -136,30 +269,54 @@ class RecentJobView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        # The user's own buffered views first, so a job they just opened is listed
+        flush_recent_views(request.user.pk)
+        # A single joined SELECT, newest first, capped at RECENT_JOBS_MAX_PAGE_SIZE rows
         recent_jobs = RecentJob.objects.filter(user=request.user)
-        serializer = RecentJobSerializer(recent_jobs, many=True)
+        limit, offset = get_limit_offset(
+            request, settings.RECENT_JOBS_PAGE_SIZE, settings.RECENT_JOBS_MAX_PAGE_SIZE
+        )
+        rows = RecentJobReadSerializer.values(recent_jobs)[offset:offset + limit]
+        serializer = RecentJobReadSerializer(rows)
         return Response(serializer.data)
 
     def post(self, request):
         job_id = request.data.get('job_id')
         try:
-            job = Job.objects.get(id=job_id)
-        except Job.DoesNotExist:
+            exists = job_id is not None and Job.objects.filter(id=job_id).exists()
+        except (TypeError, ValueError):
+            exists = False
+        if not exists:
             return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        recent_job, created = RecentJob.objects.update_or_create(
-            user=request.user, job=job,
-            defaults={'viewed_at': timezone.now()}
-        )
+        # Buffered and written in bulk later (app/recent.py): no write lock per view
+        record_view(request.user.pk, int(job_id), timezone.now())
         return Response({'message': 'Job added to recent jobs'}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 def job_list(request):
-    """View to list all jobs."""
-    jobs = Job.objects.all()
-    serializer = JobSerializer(jobs, many=True)
-    return Response(serializer.data)
+    """View to list all jobs.
+
+    ``?stream=ndjson`` or ``?stream=json`` streams the (filtered) table instead
+    of building the whole list in memory.
+    """
+    stream_format = request.query_params.get('stream')
+    if stream_format:
+        if stream_format not in STREAM_FORMATS:
+            return Response(
+                {"detail": f"Unsupported stream format. Use one of: {', '.join(STREAM_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        jobs = filter_jobs(request, Job.objects.order_by('-created_at', '-id'))
+        return streaming_response(jobs, stream_format)
+
+    def build_response():
+        jobs = JobReadSerializer.values(Job.objects.all())
+        serializer = JobReadSerializer(jobs)
+        return Response(serializer.data)
+
+    return cached_response(request, 'jobs', build_response)
 
 @api_view(['POST'])
 def job_create(request):
@@ -171,6 +328,29 @@ def job_create(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def job_bulk_create(request):
+    """Import many jobs at once from an NDJSON or CSV feed.
+
+    Send the feed as the raw body (application/x-ndjson or text/csv) or as a
+    multipart ``file``. Returns counts, rows per second and per-row errors.
+    """
+    content_type = request.content_type or ''
+    if content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+        data_format = detect_format(upload.content_type, upload.name)
+        lines = upload
+    else:
+        data_format = detect_format(content_type)
+        lines = request.stream or []
+
+    report = import_jobs(parse_rows(lines, data_format), batch_size=settings.JOB_IMPORT_BATCH_SIZE)
+    return Response(report, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 def register(request):
     if request.method == 'POST':
@@ -194,13 +374,30 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # Ensure the user is authenticated via token
 def get_profile(request):
-    try:
-        # Get the profile of the currently authenticated user
-        profile = Profile.objects.get(user=request.user)
-        serializer = ProfileSerializer(profile)
-        return Response(serializer.data)
-    except Profile.DoesNotExist:
-        return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+    state = profile_state(request.user)
+
+    def build_response():
+        try:
+            # Get the profile of the currently authenticated user
+            profile = profile_queryset().get(user=request.user)
+            serializer = ProfileSerializer(profile)
+            return Response(serializer.data)
+        except Profile.DoesNotExist:
+            return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    def cached_build():
+        if state is None:
+            return build_response()
+        # Open-ended durations are relative to today, so is the cached copy
+        return cached_response(request, f'profile:{date.today()}', build_response, namespace=profile_namespace(state['id']))
+
+    validators = profile_validators(request, 'profile', state)
+    return conditional_response(request, validators, cached_build, private=True)
+
+
+def profile_queryset():
+    # Profile, user and both entry lists in three queries however many entries there are
+    return Profile.objects.select_related('user').prefetch_related('work_experiences', 'educations')
 
 
 
@@ -247,34 +444,10 @@ def update_or_create_work_experience(request):
         )
 
     try:
-        updated_experiences = []
-        created_experiences = []
-        
-        # Handle updates and creations
-        for experience_data in experiences:
-            if 'id' in experience_data:
-                experience_id = experience_data.pop('id')
-                try:
-                    experience = WorkExperience.objects.get(id=experience_id, profile=profile)
-                except WorkExperience.DoesNotExist:
-                    return Response({"detail": f"Work experience with ID {experience_id} not found."}, status=status.HTTP_404_NOT_FOUND)
-                
-                serializer = WorkExperiencePostSerializer(experience, data=experience_data, partial=True)
-                if serializer.is_valid():
-                    updated_experiences.append(serializer.save())
-                else:
-                    return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                experience_data['profile'] = profile.id
-                serializer = WorkExperiencePostWithOutIDSerializer(data=experience_data)
-                if serializer.is_valid():
-                    created_experiences.append(serializer.save())
-                else:
-                    return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Handle deletions
-        if delete_ids:
-            deleted_count, _ = WorkExperience.objects.filter(id__in=delete_ids, profile=profile).delete()
+        # One transaction, a fixed number of queries whatever the batch size
+        updated_experiences, created_experiences, deleted_count = apply_profile_batch(
+            WorkExperience, profile, experiences, delete_ids, WorkExperienceBatchSerializer, "Work experience",
+        )
 
         response_data = {}
         if updated_experiences:
@@ -286,33 +459,37 @@ def update_or_create_work_experience(request):
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+    except APIException:
+        raise
     except Exception as e:
         return Response({"detail": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated]) 
 def get_work_experience(request):
-    try:
-        # Get the profile of the currently authenticated user
-        profile = Profile.objects.get(user=request.user)
-        
+    def build_response():
+        # The authenticated user carries their profile id, no need to load the profile
+        profile_id = get_profile_id(request.user)
+        if profile_id is None:
+            return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
         # Serialize the work_experiences only
-        work_experience_serializer = WorkExperienceSerializer(profile.work_experiences.all(), many=True)
+        work_experience_serializer = WorkExperienceSerializer(WorkExperience.objects.filter(profile_id=profile_id), many=True)
         return Response(work_experience_serializer.data)
-    except Profile.DoesNotExist:
-        return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    validators = work_experience_validators(request, 'work_experience', work_experience_state(request.user))
+    return conditional_response(request, validators, build_response, private=True)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated]) 
 def get_education_list(request):
-    try:
-        profile = Profile.objects.get(user=request.user)
-
-        educations = EducationSerializer(profile.educations.all(), many=True)
-        return Response(educations.data)
-    except Profile.DoesNotExist:
+    profile_id = get_profile_id(request.user)
+    if profile_id is None:
         return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    educations = EducationSerializer(Education.objects.filter(profile_id=profile_id), many=True)
+    return Response(educations.data)
+
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])  # Ensure the user is authenticated via token
 def save_education(request):
@@ -331,29 +508,9 @@ def save_education(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
     try:
-        updated_experiences = []
-        created_experiences = []
-        for experience_data in experiences:
-            
-            if 'id' in experience_data:
-                experience_id = experience_data.pop('id')
-                experience = Education.objects.get(id=experience_id, profile=profile)
-                serializer = EducationPostSerializer(experience, data=experience_data, partial=True)
-                if serializer.is_valid():
-                    updated_experiences.append(serializer.save())
-                else:
-                    return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                print(experience_data)
-                experience_data['profile'] = profile.id
-                serializer = EducationPostWithoutIdSerializer(data=experience_data)
-                if serializer.is_valid():
-                    created_experiences.append(serializer.save())
-                else:
-                    return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if delete_ids:
-            deleted_count, _ = WorkExperience.objects.filter(id__in=delete_ids, profile=profile).delete()
+        updated_experiences, created_experiences, deleted_count = apply_profile_batch(
+            Education, profile, experiences, delete_ids, EducationBatchSerializer, "Education",
+        )
 
         response_data = {}
         if updated_experiences:
@@ -365,10 +522,8 @@ def save_education(request):
             
         return Response(response_data, status=status.HTTP_200_OK)
 
-    except WorkExperience.DoesNotExist:
-        return Response({"detail": f"Work experience with ID {experience_id} not found or does not belong to the user."}, status=status.HTTP_404_NOT_FOUND)
-    except KeyError:
-        return Response({"detail": "Missing 'id' in experience data (for updates)."}, status=status.HTTP_400_BAD_REQUEST)
+    except APIException:
+        raise
     except Exception as e:
         return Response({"detail": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -397,14 +552,22 @@ class ResumeUploadView(APIView):
     def post(self, request, *args, **kwargs):
         try:
             profile = Profile.objects.get(user_id=request.user)  # Get the profile by user ID
-
-            if 'resume' in request.FILES:
-                profile.resume = request.FILES['resume']  # Assign the uploaded file to the resume field
-                profile.save()
-
-                return Response({"message": "Resume uploaded successfully"}, status=status.HTTP_200_OK)
-            else:
-                return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
-
         except Profile.DoesNotExist:
-            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Streamed to disk and hashed while it arrives, see app/resumes.py
+        handler = ResumeUploadHandler(request._request)
+        try:
+            check_content_length(request)
+            request._request.upload_handlers = [handler]
+            upload = request.FILES.get('resume')
+            if handler.error is not None:
+                raise handler.error
+        except ResumeRejected as exc:
+            return Response({"error": str(exc)}, status=exc.status)
+
+        if upload is None:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        resume, _ = upload_resume(profile, upload)
+        return Response({"message": "Resume uploaded successfully", "resume": request.build_absolute_uri(resume.file.url)},
+                        status=status.HTTP_200_OK)
\ No newline at end of file
@@ -34,11 +34,13 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'app.metrics.RequestMetricsMiddleware',  # First, so its timings cover the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.db.ReadReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  #
@@ -48,7 +50,8 @@ ROOT_URLCONF = 'job_finder.urls'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication plus a per-process user cache (app/auth.py)
+        'app.auth.CachedJWTAuthentication',
     ],
 }
 CORS_ALLOW_ALL_ORIGINS = True
@@ -83,9 +86,170 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections between requests, so the PRAGMAs below run once per connection
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 5,
+            # Take the write lock when a transaction starts: a deferred one that
+            # writes after reading can't wait for the lock, it fails at once
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replica for the public list views (app/db.py): another SQLite file kept
+# in sync from the primary (e.g. by litestream), or another backend
+if os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DB_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['app.db.ReadReplicaRouter']
+READ_REPLICA_ALIAS = 'replica'  # Used only when DATABASES has it
+READ_REPLICA_VIEWS = ['job-list', 'job-facets', 'async-job-list', 'async-job-list-filtered', 'candidate-search']
+# Seconds after a job write during which those views still read the primary, so
+# a lagging replica's page isn't cached under the new version; keep it above the replica's lag
+READ_REPLICA_LAG = int(os.environ.get('DB_REPLICA_LAG', 5))
+
+# Applied to every new SQLite connection (app/db.py)
+SQLITE_PRAGMAS = {
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,  # KiB
+    'temp_store': 'memory',
+    'mmap_size': 128 * 1024 * 1024,
+}
+# The journal mode is stored in the database file, so WAL is opt-in (DB_WAL=1 where the
+# database is deployed): otherwise any manage.py command would convert the checked-in db.sqlite3
+if os.environ.get('DB_WAL') == '1':
+    SQLITE_PRAGMAS['journal_mode'] = 'wal'
+
+# Cache backends
+# The job_lists cache holds the list and profile responses and their versions (see app/cache.py).
+# Every web process and the run_tasks workers must share it: a job edit in one of them has to
+# invalidate the entries cached by the others. locmem is per-process, so the system checks
+# only accept it with BACKGROUND_TASKS_EAGER (a single process, e.g. tests or a dev server).
+JOB_LIST_CACHE_BACKEND = os.environ.get('JOB_LIST_CACHE_BACKEND', 'file')
+JOB_LIST_CACHE_ENABLED = True
+JOB_LIST_CACHE_TIMEOUT = 300
+
+# Cache each user's rendered /api/profile/ until the profile or one of its entries changes
+PROFILE_CACHE_ENABLED = True
+
+# Job list ETags also change every this many seconds, since relative_created_at does (app/conditional.py)
+JOB_LIST_ETAG_WINDOW = 300
+
+# Rows per ORM fetch and per serializer batch for /api/jobs/?stream=ndjson|json
+JOB_EXPORT_CHUNK_SIZE = 500
+
+# Rows validated and inserted per transaction by /api/jobs/bulk/ and manage.py import_jobs
+JOB_IMPORT_BATCH_SIZE = 1000
+# Row errors listed in an import report (the rest are only counted)
+JOB_IMPORT_MAX_ERRORS = 1000
+
+# Default and maximum ?limit= for /api/saved-jobs/ and /api/recent-jobs/
+SAVED_JOBS_PAGE_SIZE = 50
+SAVED_JOBS_MAX_PAGE_SIZE = 200
+RECENT_JOBS_PAGE_SIZE = 20
+RECENT_JOBS_MAX_PAGE_SIZE = 100
+
+# POST /api/recent-jobs/ buffers views in memory and bulk-writes them (app/recent.py):
+# every FLUSH_INTERVAL seconds or FLUSH_SIZE pending views, keeping HISTORY_LIMIT rows per user
+RECENT_JOBS_BUFFER_ENABLED = True
+RECENT_JOBS_FLUSH_INTERVAL = 5
+RECENT_JOBS_FLUSH_SIZE = 500
+RECENT_JOBS_HISTORY_LIMIT = 100
+
+# Jobs kept per user in RecommendedJobs (also the max ?limit= of /api/jobs/recommended/)
+RECOMMENDATION_TOP_K = 50
+RECOMMENDED_JOBS_PAGE_SIZE = 20
+# Jobs saved this recently are re-checked when a process uses its skill index
+# (commits can land a little after updated_at), see app/recommend.py
+RECOMMENDATION_SYNC_MARGIN = 60
+# Share of the index patched in before it is rebuilt (at least 1000 jobs)
+RECOMMENDATION_REBUILD_RATIO = 0.05
+
+# Authenticated users (and their profile ids) kept per process by
+# app.auth.CachedJWTAuthentication; other workers see user changes within the TTL
+AUTH_USER_CACHE_ENABLED = True
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_SIZE = 10000
+
+# Threads hashing passwords for the async login view (app/login.py); None = one per CPU
+LOGIN_HASH_WORKERS = None
+
+# Per-route latency, SQL and serializer metrics served at /metrics (app/metrics.py).
+# Disabled, the middleware drops out at startup and costs nothing.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+SLOW_QUERY_THRESHOLD_MS = 200
+# Seconds a /metrics scrape reuses the task queue numbers (two queries) for
+METRICS_TASK_STATS_TTL = 10
+
+# Currency of Job.salary_base; the others are converted with the CurrencyRate table (app/salary.py)
+SALARY_BASE_CURRENCY = 'Теңге'
+# Rough rates stored by the migration that added CurrencyRate, for a fresh
+# database; set real ones with `manage.py set_currency_rate`
+SALARY_DEFAULT_RATES = {'Доллар': '500', 'Евро': '540'}
+
+# Upper bounds, in SALARY_BASE_CURRENCY, of the salary buckets counted by
+# /api/jobsf/facets/ (the last bucket is open-ended)
+JOB_FACET_SALARY_BUCKETS = [250_000, 500_000, 750_000, 1_000_000, 1_500_000, 2_500_000]
+
+# Bounding boxes (px) of the thumbnails built for Job.logo and Profile.avatar, see app/images.py
+IMAGE_VARIANT_SIZES = {'thumb': 96, 'card': 320}
+IMAGE_VARIANT_QUALITY = 80
+
+# Largest accepted resume upload; the allowed types are app.resumes.DEFAULT_TYPES
+# unless RESUME_TYPES is set (extension -> (content type, leading bytes))
+RESUME_MAX_SIZE = 5 * 1024 * 1024
+# Seconds a stored resume no profile points at is kept by the recount
+# (manage.py compact_resumes, the recount-resumes task), see app/resumes.py
+RESUME_ORPHAN_GRACE = 3600
+
+# Text kept per resume for candidate search, and extractors by extension
+# added to (or replacing) app.resume_text.DEFAULT_EXTRACTORS, e.g. an OCR
+# function for 'jpg' and 'png'
+RESUME_TEXT_MAX_CHARS = 100_000
+RESUME_TEXT_EXTRACTORS = {}
+
+# Work deferred with app.background.run_in_background / app.tasks.enqueue is
+# queued in the Task table and run by `manage.py run_tasks`; eager runs it inline.
+# Without a run_tasks worker (or eager on) nothing is run: no image variants,
+# salary recomputes after a rate change, resume text or recommendations
+BACKGROUND_TASKS_EAGER = os.environ.get('BACKGROUND_TASKS_EAGER', '0') == '1'
+TASK_WORKER_PROCESSES = 2
+TASK_POLL_INTERVAL = 1.0
+TASK_LEASE_SECONDS = 600  # A task still running after this is handed to another worker
+TASK_MAX_ATTEMPTS = 3
+TASK_RETRY_BACKOFF = 10  # Seconds before the first retry, doubled for each one after
+TASK_KEEP_FINISHED = 86400
+
+# label -> {'task': dotted path, 'every': seconds, optional 'args', 'kwargs', 'priority'}
+PERIODIC_TASKS = {
+    'purge-tasks': {'task': 'app.tasks.purge_finished', 'every': 3600},
+    'recount-resumes': {'task': 'app.resumes.recount', 'every': 86400},
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'job_lists': {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'job-lists',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache', 'job_lists'),
+        },
+    }[JOB_LIST_CACHE_BACKEND],
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -3,10 +3,12 @@ from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
+from app.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('app.urls')),  # Include your app's URLs
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target, see app/metrics.py
 ]
 
 if settings.DEBUG: